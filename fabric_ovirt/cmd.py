@@ -3,7 +3,15 @@ from os import path
 
 from fabric.main import main as fabric_main
 
+from fabric_ovirt.lib.fingerprints import commit_pending
+
 
 def main():
     ovirt_fabfile = path.join(path.dirname(__file__), 'fabfile.py')
-    fabric_main(fabfile_locations=[ovirt_fabfile])
+    try:
+        fabric_main(fabfile_locations=[ovirt_fabfile])
+    except SystemExit as e:
+        # fabric exits with 0 only if all the tasks ended successfully
+        if not e.code:
+            commit_pending()
+        raise
@@ -18,6 +18,7 @@ if have_ovirt_sdk:
     import vm  # noqa
     import template  # noqa
     import vmpool  # noqa
+    import mirror  # noqa
 
     from imp import new_module
     from functools import partial
@@ -38,10 +39,14 @@ if have_ovirt_sdk:
         :param str show: A colon (:) separated list of fields to show, the same
                          field could be shown multiple times and the ordering
                          is significant.
-                         Supported fields are: {ootype_fields}
+                         Supported fields are: {ootype_fields} and nested
+                         fields like status.state
                          Default value is: {ootype_default_fields}
         :param str headers: 'yes' to show column headers (The default),
                             anything else to hide them.
+        :param int limit:   The most objects to show, all by default
+        :param str source:  'mirror' to answer from the local mirror made by
+                            do.ovirt.mirror.sync instead of asking the engine
         """.format(
             ootypename=ootypename,
             ootype_fields=', '.join(ootype.fields),
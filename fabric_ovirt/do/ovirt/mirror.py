@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# encoding: utf-8
+#
+from fabric.api import task, env
+from fabric.utils import abort
+
+from fabric_ovirt.lib.ovirt import (
+    ovirt_task,
+    oVirtObjectType,
+    id_loader,
+    newest_event_id,
+    EVENT_REFS,
+)
+from fabric_ovirt.lib.ovirt_mirror import Mirror
+from fabric_ovirt.lib.ovirt_query import get_obj_attr
+from fabric_ovirt.lib.utils import puts
+
+__all__ = ['sync']
+
+#: The most events to read when syncing changes, if there are more objects
+#: are fetched fully instead
+MAX_EVENTS = 10000
+
+
+@task
+@ovirt_task
+def sync(types=None, full='no', ovirt=None):
+    """
+    Mirror the oVirt inventory into a local database, so the query tasks can
+    answer from it when given source=mirror
+
+    :param str types: A colon (:) separated list of object types to mirror,
+                      all types by default
+    :param str full:  'yes' to fetch all the objects again. Otherwise only
+                      objects that events were logged for since the last sync
+                      are fetched again, except for disks and VM pools which
+                      events do not refer to
+    :param ovirtsdk.api.API ovirt: An open oVirt API connection
+    """
+    types = types.split(':') if types else sorted(oVirtObjectType.all_types)
+    unknown = [t for t in types if t not in oVirtObjectType.all_types]
+    if unknown:
+        abort("Invalid oVirt object types: {0}".format(', '.join(unknown)))
+    mirror = Mirror(env.ovirt_connection_params['url'])
+    try:
+        # Take the newest event before fetching, so changes made while we
+        # fetch are fetched again next time
+        newest_id = newest_event_id(ovirt)
+        events = {}
+        for ootype in types:
+            since = mirror.get_state('event_id.' + ootype)
+            changed = None
+            if full != 'yes' and since is not None and ootype in EVENT_REFS:
+                if since not in events:
+                    events[since] = _events_since(ovirt, since)
+                changed = _changed_ids(events[since], EVENT_REFS[ootype])
+            if changed is None:
+                count = _sync_all(ovirt, mirror, ootype)
+                how = 'all'
+            else:
+                count = _sync_changed(ovirt, mirror, ootype, changed)
+                how = 'changed'
+            mirror.set_state('event_id.' + ootype, newest_id)
+            puts('{0} {1} {2} objects mirrored'.format(count, how, ootype))
+    finally:
+        mirror.close()
+
+
+def _events_since(ovirt, event_id):
+    """
+    Get the events logged after a given event, or None if there are too many
+    """
+    events = ovirt.events.list(from_event_id=event_id, max=MAX_EVENTS)
+    if len(events) >= MAX_EVENTS:
+        return None
+    return events
+
+
+def _changed_ids(events, ref_attr):
+    """
+    Get the IDs of the objects that events refer to with a given attribute,
+    or None if the events are unknown
+    """
+    if events is None:
+        return None
+    changed = set()
+    for event in events:
+        ref = get_obj_attr(event, ref_attr)
+        if ref is not None and ref.id:
+            changed.add(ref.id)
+    return changed
+
+
+def _sync_all(ovirt, mirror, ootype):
+    type_obj = oVirtObjectType.all_types[ootype]
+    objs = type_obj.iter_query(ovirt, '')
+    return mirror.store(
+        ootype, (type_obj.mirror_record(obj) for obj in objs), replace=True
+    )
+
+
+def _sync_changed(ovirt, mirror, ootype, changed):
+    type_obj = oVirtObjectType.all_types[ootype]
+    changed = sorted(changed)
+    objs = id_loader(getattr(ovirt, type_obj.plural)).load_many(changed)
+    mirror.delete(
+        ootype, (oid for oid, obj in zip(changed, objs) if obj is None)
+    )
+    return mirror.store(
+        ootype,
+        (type_obj.mirror_record(obj) for obj in objs if obj is not None),
+    )
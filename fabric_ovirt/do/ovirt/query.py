@@ -1,15 +1,29 @@
 #!/usr/bin/env python
 # encoding: utf-8
 #
+from itertools import islice
+
 from fabric.api import task
 from fabric.utils import abort
 
-from fabric_ovirt.lib.ovirt import ovirt_task, oVirtObjectType
+from fabric_ovirt.lib.ovirt import (
+    ovirt_engines_task,
+    oVirtObjectType,
+    get_from_env_or_input,
+)
+from fabric_ovirt.lib.ovirt_mirror import Mirror
+from fabric_ovirt.lib.ovirt_query import (
+    EngineObject,
+    engine_name,
+    iter_federated,
+)
 
 
 @task
-@ovirt_task
-def query(ootype, oquery='', show=None, headers='yes', ovirt=None):
+def query(
+    ootype, oquery='', show=None, headers='yes', limit=None, source='engine',
+    **kwargs
+):
     """
     Query oVirt for objects
 
@@ -22,15 +36,77 @@ def query(ootype, oquery='', show=None, headers='yes', ovirt=None):
                     significant.
     :param str headers: 'yes' to show column headers (The default), anything
                         else to hide them.
+    :param int limit:   The most objects to show, all by default
+    :param str source:  'mirror' to answer from the local mirror made by
+                        do.ovirt.mirror.sync instead of asking the engine.
+                        Mirror queries support 'field=value' and
+                        'field!=value' conditions joined with 'and' and 'or'
+
+    Objects are fetched a page at a time and shown as soon as their page
+    arrives. To query many engines at the same time, pass a pipe (|)
+    separated list of engine URLs as 'ovirt_engine', the engine of each
+    object is shown in the 'engine' column.
     """
     type_obj = oVirtObjectType.all_types.get(ootype)
     if type_obj is None:
         abort("Invalid oVirt object type specified")
 
-    obj_list = type_obj.query(ovirt, oquery)
+    if source == 'engine':
+        objs, engines = _engine_query(type_obj, oquery, limit, **kwargs)
+    elif source == 'mirror':
+        objs, engines = _mirror_query(type_obj, oquery, limit, **kwargs)
+    else:
+        abort("Invalid source specified, use 'engine' or 'mirror'")
+    if engines > 1:
+        show = show or 'engine:' + type_obj.default_fields
+    obj_list = []
+
+    def collect():
+        for obj in objs:
+            obj_list.append(obj)
+            yield obj
+
     type_obj.print_table(
-        obj_list=obj_list,
+        obj_list=collect(),
         show=show,
         headers=headers
     )
     return obj_list
+
+
+@ovirt_engines_task
+def _engine_query(type_obj, oquery, limit, ovirts=None):
+    if len(ovirts) == 1:
+        return type_obj.iter_query(ovirts.values()[0], oquery, limit), 1
+    return iter_federated(
+        ((engine_name(url), api) for url, api in ovirts.iteritems()),
+        lambda api: type_obj.iter_query(api, oquery, limit),
+        limit,
+    ), len(ovirts)
+
+
+def _mirror_query(type_obj, oquery, limit, ovirt_engine=None, **kwargs):
+    urls = (ovirt_engine or get_from_env_or_input(
+        key='OVIRT_ENGINE',
+        prompt='oVirt engine URL: ',
+        err_msg='Please provide OVIRT_ENGINE inside the febricrc file.'
+    )).split('|')
+    objs = []
+    for url in urls:
+        mirror = Mirror(url)
+        try:
+            if mirror.get_state('event_id.' + type_obj.name) is None:
+                abort(
+                    "No {0} objects were mirrored from {1} yet, run "
+                    "do.ovirt.mirror.sync".format(type_obj.name, url)
+                )
+            try:
+                found = list(mirror.search(type_obj.name, oquery, limit))
+            except ValueError as e:
+                abort(str(e))
+        finally:
+            mirror.close()
+        if len(urls) > 1:
+            found = [EngineObject(obj, engine_name(url)) for obj in found]
+        objs.extend(found)
+    return list(islice(objs, limit and int(limit))), len(urls)
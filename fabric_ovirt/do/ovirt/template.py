@@ -1,15 +1,19 @@
 #!/usr/bin/env python
 # encoding: utf-8
 #
-from time import sleep
 from ovirtsdk.xml import params as oVirtParams
 from ovirtsdk.infrastructure import errors as oVirtErrors
-from fabric.api import task
+from fabric.api import task, env
 from fabric.utils import error
 from fabric.context_managers import hide
 
-from fabric_ovirt.lib.ovirt import ovirt_task, oVirtObjectType
-from fabric_ovirt.lib.utils import puts
+from fabric_ovirt.lib.ovirt import (
+    ovirt_task,
+    oVirtObjectType,
+    state_waiter,
+    event_tracker,
+)
+from fabric_ovirt.lib.utils import puts, is_true
 from fabric_ovirt.lib.units import GiB
 
 from .vm import create_from_disk as _create_vm_from_disk
@@ -20,38 +24,50 @@ __all__ = ['create_from_vm', 'create_from_disk', 'delete']
 
 def _delete_vms(vms, attempts=300, delay=10, ovirt=None):
     """
-    Delete oVirt VMs while waiting for disks to be unlocked
+    Delete oVirt VMs once they are down, while waiting for disks to be
+    unlocked
 
     :param list vms:       The list of vms to delete
-    :param int attempts:   How many attepmts to make to delete a VM
-    :param int delay:      How many seconds to wait between attempts to delete
+    :param int attempts:   How many times as long as 'delay' to wait for the
+                           VMs to be deleted
+    :param int delay:      The most seconds to wait between checking the VMs,
+                           they are checked more often while their states
+                           change. Unless env.ovirt_wait_events is false, the
+                           VMs are only checked when engine events are logged
+                           for them
     :param ovirtsdk.api.API ovirt: An open oVirt API connection
     """
-    for attepmt in xrange(0, attempts):
-        remaining_vms = []
-        for vm in vms:
-            if ovirt.vms.get(id=vm.id).status.state != 'down':
-                remaining_vms.append(vm)
-                continue
-            try:
-                vm.delete(oVirtParams.Action(async=False))
-            except oVirtErrors.RequestError as e:
-                if (
-                    e.status == 409 and e.reason == 'Conflict' and
-                    e.message.find('disks are locked') >= 0
-                ):
-                    remaining_vms.append(vm)
-                elif e.status == 404:
-                    pass
-                else:
-                    raise
-        if not remaining_vms:
+    vms_by_id = dict((vm.id, vm) for vm in vms)
+    if is_true(str(env.get('ovirt_wait_events', True))):
+        tracker = event_tracker(ovirt)
+    else:
+        tracker = None
+    waiter = state_waiter(ovirt.vms, max_delay=delay, tracker=tracker)
+
+    def delete_vm(handle):
+        if handle.state is None:
+            # Already deleted
             return
-        sleep(delay)
-        vms = remaining_vms
-    error("Timed out trying to delete the following VMs: {0}".format(
-        ', '.join(vm.name for vm in vms)
-    ))
+        try:
+            vms_by_id[handle.key].delete(oVirtParams.Action(async=False))
+        except oVirtErrors.RequestError as e:
+            if (
+                e.status == 409 and e.reason == 'Conflict' and
+                e.message.find('disks are locked') >= 0
+            ):
+                waiter.add(handle.key, ('down', None), delete_vm)
+            elif e.status == 404:
+                pass
+            else:
+                raise
+
+    for vm in vms:
+        waiter.add(vm.id, ('down', None), delete_vm)
+    not_deleted = waiter.wait(timeout=attempts * delay)
+    if not_deleted:
+        error("Timed out trying to delete the following VMs: {0}".format(
+            ', '.join(vms_by_id[handle.key].name for handle in not_deleted)
+        ))
 
 
 def _create_from_vms(
@@ -65,6 +81,7 @@ def _create_from_vms(
     for vm in vms:
         templ = ovirt.templates.add(oVirtParams.Template(vm=vm, name=vm.name))
         templates.append(templ)
+    env.ovirt_cache.invalidate('templates')
     if delete_vms == 'yes':
         _delete_vms(vms=vms, ovirt=ovirt)
     oVirtObjectType.all_types['template'].print_table(
@@ -159,7 +176,14 @@ def delete(oquery, ovirt=None):
     :rtype: int
     """
     templates = ovirt.templates.list(query=oquery)
-    for template in templates:
-        template.delete(async=False)
+    try:
+        env.ovirt_pool.map(
+            lambda api, template: api.templates.get(id=template.id).delete(
+                async=False
+            ),
+            templates,
+        )
+    finally:
+        env.ovirt_cache.invalidate('templates')
     puts('{0} templates deleted'.format(len(templates)))
     return len(templates)
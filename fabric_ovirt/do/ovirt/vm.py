@@ -6,11 +6,11 @@ from itertools import count
 
 from ovirtsdk.xml import params as oVirtParams
 from ovirtsdk.infrastructure import errors as oVirtErrors
-from fabric.api import task, run
+from fabric.api import task, run, env
 from fabric.utils import abort, warn
 from fabric.context_managers import hide
 
-from fabric_ovirt.lib.ovirt import ovirt_task, oVirtObjectType
+from fabric_ovirt.lib.ovirt import ovirt_task, oVirtObjectType, id_loader
 from fabric_ovirt.lib.utils import puts
 from fabric_ovirt.lib.units import GiB
 
@@ -278,15 +278,19 @@ def create(
     if cluster_query is None:
         # get the 2 top clusters so we'll issue a warning if there is more then
         # one and the user didn't specify an explicit selection query
-        clusters = ovirt.clusters.list(max=2)
+        clusters = env.ovirt_cache.list('clusters', ovirt.clusters, max=2)
     else:
-        clusters = ovirt.clusters.list(query=cluster_query)
+        clusters = env.ovirt_cache.list(
+            'clusters', ovirt.clusters, query=cluster_query
+        )
     if not clusters:
         abort("No cluster found by given query")
     if len(clusters) > 1:
         warn("More then one cluster found, will use the first")
     cluster = clusters[0]
-    templates = ovirt.templates.list(query=template_query)
+    templates = env.ovirt_cache.list(
+        'templates', ovirt.templates, query=template_query
+    )
     if not templates:
         abort("No template found by given query")
     if len(templates) > 1:
@@ -309,7 +313,10 @@ def create(
     if networks is not None:
         nic_name = ('nic{0}'.format(i) for i in count())
         for network_name in networks.split('|'):
-            network = cluster.networks.get(name=network_name)
+            network = env.ovirt_cache.get(
+                'networks', cluster.networks, scope=cluster.id,
+                name=network_name,
+            )
             if network is None:
                 continue
             vm.nics.add(nic=oVirtParams.NIC(
@@ -351,19 +358,27 @@ def create_from_disk(
     :rtype: list
     """
     disks = ovirt.disks.list(query=disk_query)
+    if cluster_query is None:
+        # Look up the storage domains of all the disks together
+        sd_loader = id_loader(ovirt.storagedomains)
+        disk_sds = [
+            sd_loader.load(
+                disk.get_storage_domains().get_storage_domain()[0].id
+            )
+            for disk in disks
+        ]
     vms = []
-    for disk in disks:
-        if cluster_query is None:
+    for i, disk in enumerate(disks):
+        disk_cluster_query = cluster_query
+        if disk_cluster_query is None:
             # If cluster is not specified, ensure we choose a cluster that is
             # attached to the storage domain that hosts the disk
-            disk_sd = disk.get_storage_domains().get_storage_domain()[0]
-            disk_sd = ovirt.storagedomains.get(id=disk_sd.id)
-            cluster_query = "Storage={0}".format(disk_sd.name)
+            disk_cluster_query = "Storage={0}".format(disk_sds[i].get().name)
         with hide('user'):
             try:
                 vm = create(
                     name=disk.name,
-                    cluster_query=cluster_query,
+                    cluster_query=disk_cluster_query,
                     template_query=template_query,
                     memory=memory,
                     vcpus=vcpus,
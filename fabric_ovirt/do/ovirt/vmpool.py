@@ -7,7 +7,7 @@ from ovirtsdk.infrastructure import brokers as oVirtObjects
 from fabric.utils import abort, warn, error
 from fabric.context_managers import hide
 
-from fabric.api import task
+from fabric.api import task, env
 
 from fabric_ovirt.lib.ovirt import ovirt_task, oVirtObjectType
 from .template import (
@@ -35,7 +35,9 @@ def _cluster_from_query(cluster_query, ovirt):
     :returns: A cluster object that matches the query
     :rtype: oVirtObjects.Cluster
     """
-    clusters = ovirt.clusters.list(query=cluster_query)
+    clusters = env.ovirt_cache.list(
+        'clusters', ovirt.clusters, query=cluster_query
+    )
     if not clusters:
         abort("No cluster found by given query")
     if len(clusters) > 1:
@@ -120,8 +122,9 @@ def _create_one(
             abort(
                 "Cannot find cluster of template and not cluster query given"
             )
-        clusters = ovirt.clusters.list(id=tmpl_clstr.id)
-        cluster = clusters[0]
+        cluster = env.ovirt_cache.get(
+            'clusters', ovirt.clusters, id=tmpl_clstr.id
+        )
     vmpool = ovirt.vmpools.add(vmpool=oVirtParams.VmPool(
         cluster=cluster,
         template=template,
@@ -156,7 +159,7 @@ def _create(
     cluster = None
     if templates:
         if cluster_query:
-            cluster = _cluster_from_query(cluster_query)
+            cluster = _cluster_from_query(cluster_query, ovirt)
     vmpools = [
         _create_one(
             template=template,
@@ -2,6 +2,7 @@
 # encoding: utf-8
 
 from . import (  # noqa
+    distro,
     hostname,
     net,
     ntp,
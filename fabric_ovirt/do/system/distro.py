@@ -6,10 +6,21 @@ Tasks to retrieve distro information from the hosts
 
 from fabric.api import task, run
 
+from fabric_ovirt.lib.facts import facts_of
+
 
 @task(default=True)
 def get():
     """
     Get the remote distro, really dummy right now
+
+    If the facts of the host were loaded (see on.foreman.facts), they are
+    used instead of checking on the host
     """
+    facts = facts_of()
+    if 'operatingsystem' in facts:
+        return '%s release %s' % (
+            facts['operatingsystem'],
+            facts.get('operatingsystemrelease', 'unknown'),
+        )
     return run("cat /etc/redhat-release || echo unknown")
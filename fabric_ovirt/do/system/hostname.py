@@ -7,7 +7,6 @@ Tasks to manage the hostname of a machine
 from fabric.api import (
     task,
     run,
-    execute,
 )
 
 
@@ -21,8 +20,10 @@ def hset(hostname, old_hostname=None):
     :param old_hostname:
         Old hostname to clean up when setting the new, deafult = None
     """
+    # Imported here so fabric won't list the distro tasks under this module
+    from fabric_ovirt.do.system.distro import get as get_distro
     run("hostname %s" % hostname)
-    if 'Fedora' in execute('system.distro.get'):
+    if 'Fedora' in get_distro():
         run("echo '%s' > /etc/hostname" % hostname)
     else:
         run("sed -i '/HOSTNAME=.*/d' /etc/sysconfig/network")
@@ -21,6 +21,14 @@ from fabric_ovirt import (  # noqa
     do,
 )
 from fabric_ovirt.lib.parallel import monkey_patch
+from fabric_ovirt.lib.host_set import monkey_patch as monkey_patch_hosts
+from fabric_ovirt.lib.timing import instrument as instrument_timing
+from fabric_ovirt.lib.fingerprints import (
+    monkey_patch as monkey_patch_fingerprints,
+)
 
 
 monkey_patch(fabric)
+monkey_patch_hosts(fabric)
+monkey_patch_fingerprints(fabric)
+instrument_timing()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+"""batch_loader.py - Coalesce lookups of many objects into few searches
+
+Code that needs many objects can ask for them one by one with load, getting
+back a pending lookup for each. Once the value of any pending lookup is
+needed, all the lookups asked for so far are done together, with one search
+per batch of keys:
+
+    pending = [loader.load(vm.id) for vm in vms]
+    states = [p.get().status.state for p in pending]
+"""
+from operator import attrgetter
+from threading import Lock
+
+#: How many keys to look up with one search by default
+BATCH_SIZE = 50
+
+
+class BatchLoader(object):
+    """Look up objects by key, many at a time
+    """
+    def __init__(
+        self, search, fallback=None, key=attrgetter('id'),
+        batch_size=BATCH_SIZE
+    ):
+        """
+        :param callable search:   Called with a list of keys, returns the
+                                  objects found for them in any order
+        :param callable fallback: Called with a key that search did not find
+                                  an object for, returns the object or None.
+                                  By default such keys are not found
+        :param callable key:      Called with an object to get its key
+        :param int batch_size:    The most keys to pass to search at once
+        """
+        self._search = search
+        self._fallback = fallback
+        self._key = key
+        self._batch_size = batch_size
+        self._queue = []
+        self._queued = set()
+        self._results = {}
+        self._lock = Lock()
+
+    def load(self, key):
+        """Ask for an object
+
+        :param key: The object key
+        :returns: The pending lookup, call its get method to get the object
+                  or None if it was not found
+        :rtype: PendingLookup
+        """
+        with self._lock:
+            if key not in self._results and key not in self._queued:
+                self._queue.append(key)
+                self._queued.add(key)
+        return PendingLookup(self, key)
+
+    def load_many(self, keys):
+        """Look up many objects at once
+
+        :param Iterable keys: The object keys
+        :returns: The objects (or None for ones not found) in the order of
+                  the keys
+        :rtype: list
+        """
+        return [pending.get() for pending in map(self.load, keys)]
+
+    def dispatch(self):
+        """Do all the lookups asked for so far
+        """
+        with self._lock:
+            queue, self._queue = self._queue, []
+            self._queued = set()
+        for start in xrange(0, len(queue), self._batch_size):
+            batch = queue[start:start + self._batch_size]
+            found = dict(
+                (self._key(obj), obj) for obj in self._search(batch)
+            )
+            for key in batch:
+                if key not in found and self._fallback is not None:
+                    found[key] = self._fallback(key)
+                with self._lock:
+                    self._results[key] = found.get(key)
+
+    def clear(self):
+        """Forget the objects found so far so they are looked up again
+        """
+        with self._lock:
+            self._results.clear()
+
+    def _result(self, key):
+        with self._lock:
+            if key in self._results:
+                return True, self._results[key]
+            return False, None
+
+
+class PendingLookup(object):
+    """A lookup asked for from a BatchLoader
+    """
+    def __init__(self, loader, key):
+        self._loader = loader
+        self.key = key
+
+    def get(self):
+        """Get the object, doing all the lookups asked for so far if it was
+        not looked up yet
+
+        :returns: The object or None if it was not found
+        """
+        done, value = self._loader._result(self.key)
+        if not done:
+            # Queue the key again in case it was cleared or is being looked up
+            # by another thread right now
+            self._loader.load(self.key)
+            self._loader.dispatch()
+            done, value = self._loader._result(self.key)
+        return value
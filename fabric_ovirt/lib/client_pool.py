@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+"""client_pool.py - Share a few API clients between threads
+
+API clients like the oVirt SDK one can only send one request at a time, so to
+send many independent requests concurrently we need a few of them. Clients
+are created on demand up to the pool size, and every thread takes a client
+out of the pool for as long as it uses it.
+"""
+from contextlib import contextmanager
+from multiprocessing.pool import ThreadPool
+from Queue import Queue, Empty
+from threading import Lock
+
+
+class ClientPool(object):
+    """A pool of API clients
+    """
+    def __init__(self, factory, size):
+        """
+        :param callable factory: Called without arguments to create a client
+        :param int size:         The most clients to create
+        """
+        self.size = max(1, int(size))
+        self._factory = factory
+        self._idle = Queue()
+        self._clients = []
+        self._lock = Lock()
+
+    @contextmanager
+    def client(self):
+        """Take a client out of the pool for the length of a with block,
+        waiting for one to be returned to the pool if all are in use
+        """
+        client = self._checkout()
+        try:
+            yield client
+        finally:
+            self._idle.put(client)
+
+    def _checkout(self):
+        try:
+            return self._idle.get_nowait()
+        except Empty:
+            pass
+        client = self._create(self.size)
+        if client is None:
+            return self._idle.get()
+        return client
+
+    def _create(self, count):
+        """Create a client if there are fewer than count clients, returns None
+        otherwise
+        """
+        with self._lock:
+            if len(self._clients) >= count:
+                return None
+            # Keep the place while the client is being created
+            self._clients.append(None)
+        try:
+            client = self._factory()
+        except Exception:
+            with self._lock:
+                self._clients.remove(None)
+            raise
+        with self._lock:
+            self._clients[self._clients.index(None)] = client
+        return client
+
+    def map(self, func, items):
+        """Call a function for many items concurrently, each call gets its own
+        client
+
+        The function should raise normal exceptions rather then call
+        fabric's abort, the first exception raised is raised again here.
+
+        :param callable func:  Called with a client and an item
+        :param Iterable items: The items
+        :returns: The values returned by func, in the order of the items
+        :rtype: list
+        """
+        items = list(items)
+        if len(items) <= 1 or self.size == 1:
+            with self.client() as client:
+                return [func(client, item) for item in items]
+
+        def call(item):
+            with self.client() as client:
+                return func(client, item)
+
+        workers = min(self.size, len(items))
+        # Create the clients the threads need here, since factories like the
+        # oVirt connect() are better called from one thread at a time
+        for _ in xrange(workers):
+            client = self._create(workers)
+            if client is None:
+                break
+            self._idle.put(client)
+        pool = ThreadPool(workers)
+        try:
+            return pool.map(call, items)
+        finally:
+            pool.terminate()
+
+    def clients(self):
+        """Get the clients created so far
+
+        :rtype: list
+        """
+        with self._lock:
+            return [client for client in self._clients if client is not None]
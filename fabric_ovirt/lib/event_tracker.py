@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+"""event_tracker.py - Follow an events feed to find out what changed
+
+Asking for the events logged since the last one we saw is a single cheap
+request no matter how many objects we care about, so StateWaiter can use an
+EventTracker to poll object states only when events say something happened
+to them.
+"""
+
+
+class EventTracker(object):
+    """Follow an events feed from the last seen event
+    """
+    def __init__(self, fetch, refs):
+        """
+        :param callable fetch: Called with the ID of the last seen event, or
+                               None to get just the newest event, returns a
+                               list of events newer than it. Events must have
+                               an 'id' attribute
+        :param callable refs:  Called with an event, returns the keys of the
+                               objects it refers to
+        """
+        self._fetch = fetch
+        self._refs = refs
+        self._last_event_id = None
+        self.available = True
+
+    def start(self):
+        """Start following the feed from the newest event
+
+        :returns: False if events are unavailable
+        :rtype: bool
+        """
+        events = self._events(None)
+        if events is None:
+            return False
+        self._last_event_id = max(
+            [int(event.id) for event in events] or [0]
+        )
+        return True
+
+    def changed(self):
+        """Get the objects that events were logged for since the last call,
+        or since start was called
+
+        :returns: The keys of the objects, or None if events are unavailable
+        :rtype: set
+        """
+        if self._last_event_id is None and not self.start():
+            return None
+        events = self._events(self._last_event_id)
+        if events is None:
+            return None
+        changed = set()
+        for event in events:
+            self._last_event_id = max(self._last_event_id, int(event.id))
+            changed.update(self._refs(event))
+        return changed
+
+    def _events(self, last_event_id):
+        if not self.available:
+            return None
+        try:
+            return self._fetch(last_event_id)
+        except Exception:
+            # The events feed does not work for us, callers should fall back
+            # to polling
+            self.available = False
+            return None
@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+"""facts.py - Facts about the target hosts that were collected in advance
+
+Facts are loaded once for the whole target set (for example from Foreman by
+on.foreman.facts), so tasks can look at them instead of connecting to every
+host just to find them out.
+"""
+from fabric.network import parse_host_string
+from fabric.state import env
+
+
+def add_facts(host_facts):
+    """Store facts about hosts
+
+    :param dict host_facts: A dict mapping host names to dicts of their facts
+    """
+    store = env.get('host_facts')
+    if store is None:
+        store = env.host_facts = {}
+    for host, facts in host_facts.iteritems():
+        store.setdefault(host, {}).update(facts)
+
+
+def facts_of(host_string=None):
+    """Get the stored facts of a host
+
+    :param str host_string: A host name or a fabric host string, the current
+                            host if not given
+    :returns: The facts of the host, empty if there are none
+    :rtype: dict
+    """
+    host_string = host_string or env.host_string
+    if not host_string:
+        return {}
+    host = parse_host_string(host_string)['host']
+    return (env.get('host_facts') or {}).get(host, {})
@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+"""fingerprints.py - Remember what hosts looked like when tasks last ran on
+them successfully
+
+A host fingerprint is a hash of things that are cheap to check, like its
+facts or the modification times of some files. Fingerprints are recorded per
+list of tasks (with their arguments) after a successful run, so the next run
+of the same tasks can skip hosts that did not change since.
+
+Hosts that tasks failed on are not recorded, even if fabric went on and
+ended successfully (with skip_bad_hosts, or in parallel with warn_only).
+"""
+import os
+import json
+from hashlib import sha1
+from functools import wraps
+from pipes import quote
+
+from fabric.api import run, hide
+from fabric.state import env
+
+from fabric_ovirt.lib.utils import cache_path
+
+#: The hosts that something failed on in the current run
+FAILED_HOSTS = set()
+
+
+def facts_fingerprint(facts, names=None):
+    """Get the fingerprint of a host's facts
+
+    :param dict facts:     The facts of the host
+    :param Iterable names: The names of the facts to use, all by default
+    :returns: The fingerprint or None if there are no facts
+    :rtype: str
+    """
+    if names is not None:
+        facts = dict(
+            (name, facts[name]) for name in names if name in facts
+        )
+    if not facts:
+        return None
+    return sha1(json.dumps(facts, sort_keys=True)).hexdigest()
+
+
+def remote_mtimes(paths):
+    """Get the modification times of files on the current host
+
+    Meant to be called with fabric's execute for many hosts at once.
+
+    :param Iterable paths: The file paths, missing files are skipped
+    :returns: The 'stat' output listing the files and their modification
+              times
+    :rtype: str
+    """
+    with hide('running', 'stdout'):
+        return run(
+            "stat -c '%n %Y' {0} 2>/dev/null; true".format(
+                ' '.join(quote(path) for path in paths)
+            ),
+            warn_only=True,
+        )
+
+
+def combine(parts):
+    """Combine fingerprints of different things about a host into one
+
+    :param Iterable parts: The fingerprints, None means unknown
+    :returns: The combined fingerprint or None if all parts are unknown
+    :rtype: str
+    """
+    parts = [str(part) for part in parts if part is not None]
+    if not parts:
+        return None
+    return sha1('\0'.join(parts)).hexdigest()
+
+
+def run_key(tasks):
+    """Get a key identifying a list of tasks and their arguments
+
+    :param Iterable tasks: The tasks, as given on the command line
+    :rtype: str
+    """
+    return sha1('\0'.join(tasks)).hexdigest()
+
+
+class FingerprintStore(object):
+    """The recorded host fingerprints of a list of tasks
+    """
+    def __init__(self, key):
+        """
+        :param str key: The key of the task list, see run_key
+        """
+        self._path = cache_path('changed', key + '.json')
+
+    def load(self):
+        """Load the recorded fingerprints
+
+        :returns: A dict mapping hosts to their fingerprints
+        :rtype: dict
+        """
+        try:
+            with open(self._path) as store_file:
+                return json.load(store_file)
+        except (IOError, ValueError):
+            return {}
+
+    def save(self, fingerprints):
+        """Record fingerprints, keeping the ones of other hosts
+
+        :param dict fingerprints: A dict mapping hosts to their fingerprints
+        """
+        recorded = self.load()
+        recorded.update(fingerprints)
+        tmp_path = '{0}.{1}.tmp'.format(self._path, os.getpid())
+        with open(tmp_path, 'w') as store_file:
+            json.dump(recorded, store_file)
+        os.rename(tmp_path, self._path)
+
+
+def changed_hosts(fingerprints, recorded):
+    """Find the hosts that changed since their fingerprints were recorded
+
+    :param dict fingerprints: The current host fingerprints, hosts with a
+                              None fingerprint are always considered changed
+    :param dict recorded:     The recorded host fingerprints
+    :rtype: list
+    """
+    return [
+        host for host, fingerprint in fingerprints.iteritems()
+        if fingerprint is None or recorded.get(host) != fingerprint
+    ]
+
+
+def set_pending(key, fingerprints):
+    """Set fingerprints to be recorded if the current run succeeds
+
+    :param str key:           The key of the task list, see run_key
+    :param dict fingerprints: A dict mapping hosts to their fingerprints
+    """
+    env.pending_fingerprints = (key, dict(
+        (host, fingerprint)
+        for host, fingerprint in fingerprints.iteritems()
+        if fingerprint is not None
+    ))
+
+
+def commit_pending():
+    """Record the fingerprints set by set_pending, except the ones of the
+    hosts in FAILED_HOSTS
+
+    Called by the ofab command once all the tasks ran successfully, when
+    using the tasks from another fabfile this needs to be called explicitly.
+    """
+    pending = env.get('pending_fingerprints')
+    if pending:
+        key, fingerprints = pending
+        FingerprintStore(key).save(dict(
+            (host, fingerprint)
+            for host, fingerprint in fingerprints.iteritems()
+            if host not in FAILED_HOSTS
+        ))
+        env.pending_fingerprints = None
+
+
+def _failed_on_host_arg(func):
+    @wraps(func)
+    def new_func(task, host, *args, **kwargs):
+        try:
+            return func(task, host, *args, **kwargs)
+        except BaseException:
+            FAILED_HOSTS.add(host)
+            raise
+    new_func.tracks_failures = True
+    return new_func
+
+
+def monkey_patch(mod):
+    """Add the hosts that fabric fails to run a task on serially to
+    FAILED_HOSTS, even when skip_bad_hosts makes it go on
+
+    Remote operations that fail under warn_only are not counted, those are
+    often expected, like probing if a package is installed. Parallel jobs
+    are covered by the parallel module.
+    """
+    execute = mod.tasks._execute
+    if not getattr(execute, 'tracks_failures', False):
+        mod.tasks._execute = _failed_on_host_arg(execute)
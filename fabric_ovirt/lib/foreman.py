@@ -6,10 +6,31 @@ foreman.py
 various methods used by fabric tasks that interact with foreman
 """
 
+import os
+import json
+import time
 from functools import wraps
 from fabric.api import env
 from getpass import getpass
-from fabric_ovirt.lib.utils import check_param
+from inspect import getargspec
+from hashlib import sha1
+from collections import OrderedDict
+from weakref import WeakKeyDictionary
+from multiprocessing.pool import ThreadPool
+from fabric_ovirt.lib.utils import check_param, cache_path, absolute_import
+
+#: How many results to ask for in every page of a foreman index call
+PER_PAGE = 250
+#: How many pages to fetch at the same time
+PAGE_WORKERS = 8
+#: How many 'or' conditions to put in a single query
+QUERY_CHUNK = 50
+#: How long (in seconds) to remember the version of a foreman server, short
+#: since nothing notices if the server is upgraded meanwhile
+VERSION_TTL = 15 * 60
+
+# The clients created so far, by server, auth and api version
+_CLIENTS = {}
 
 
 def foreman_defaults(func):
@@ -20,21 +41,85 @@ def foreman_defaults(func):
     arguments will be respected
     """
 
+    arg_names = getargspec(func).args
+
     @wraps(func)
     def newfunc(*args, **kwargs):
         """
         Wrapper to add the foerman parameters to the task
         """
-        check_param('FOREMAN_URL', 'foreman', kwargs)
-        check_param('FOREMAN_USER', 'user', kwargs)
-        check_param('FOREMAN_PASSWORD', 'passwd', kwargs, input_func=getpass)
-        kwargs['foreman'] = kwargs.get('foreman', env.FOREMAN_URL)
-        kwargs['user'] = kwargs.get('user', env.FOREMAN_USER)
-        kwargs['passwd'] = kwargs.get('passwd', env.FOREMAN_PASSWORD)
+        for env_name, param_name, input_func in (
+            ('FOREMAN_URL', 'foreman', raw_input),
+            ('FOREMAN_USER', 'user', raw_input),
+            ('FOREMAN_PASSWORD', 'passwd', getpass),
+        ):
+            if param_name in arg_names[:len(args)]:
+                continue
+            check_param(env_name, param_name, kwargs, input_func=input_func)
+            kwargs[param_name] = kwargs.get(param_name, env[env_name])
         return func(*args, **kwargs)
     return newfunc
 
 
+def foreman_client(url, auth=None, api_version=2):
+    """
+    Get a foreman client, reusing the one created before for the same server,
+    auth and api version if there is one
+
+    Creating a client asks the server for its version before anything else,
+    so the version is also remembered on disk for VERSION_TTL seconds (and
+    the client keeps the api definitions of every version on disk too).
+
+    :param url:         The foreman server url, like 'http://localhost:3000'
+    :param auth:        A (user, password) tuple or None to not authenticate
+    :param api_version: The foreman api version to use
+    :rtype: foreman.client.Foreman
+    """
+    key = (url, auth, api_version)
+    if key not in _CLIENTS:
+        version_file = cache_path('foreman', 'version-{0}.json'.format(
+            sha1(url.encode('utf-8')).hexdigest()
+        ))
+        version = _read_version(version_file)
+        client = _foreman_class()(
+            url, auth, version=version, api_version=api_version
+        )
+        if version is None and getattr(client, 'version', None):
+            _write_version(version_file, client.version)
+        _CLIENTS[key] = client
+    return _CLIENTS[key]
+
+
+def _foreman_class():
+    # To avoid collisions with this module
+    frm_cli = absolute_import('foreman.client', ['Foreman'])
+    try:
+        # Hide ugly warning about no ssl cert verification
+        frm_cli.requests.packages.urllib3.disable_warnings()
+    except AttributeError:
+        pass
+    return frm_cli.Foreman
+
+
+def _read_version(version_file):
+    try:
+        with open(version_file) as cache_file:
+            entry = json.load(cache_file)
+    except (IOError, ValueError):
+        return None
+    if time.time() - entry['fetched'] > VERSION_TTL:
+        return None
+    return entry['version']
+
+
+def _write_version(version_file, version):
+    # Write to a temporary file first so readers never see a partial file
+    tmp_path = '{0}.{1}.tmp'.format(version_file, os.getpid())
+    with open(tmp_path, 'w') as cache_file:
+        json.dump(dict(fetched=time.time(), version=version), cache_file)
+    os.rename(tmp_path, version_file)
+
+
 def add_hosts_to_query(query='', hosts=None):
     """
     Add the env.hosts or the given hosts to the given foreman query.
@@ -49,6 +134,30 @@ def add_hosts_to_query(query='', hosts=None):
     return query
 
 
+def split_or_query(conds, base='', chunk_size=QUERY_CHUNK):
+    """
+    Split a long list of conditions to be 'or'ed into queries of bounded size
+
+    :param conds:      The conditions to 'or'
+    :param base:       A condition to 'and' every query with
+    :param chunk_size: The maximal amount of conditions in a query
+    :return: the queries, their results together are the results of the
+             whole 'or' query
+    :rtype: list
+    """
+    conds = list(conds)
+    chunks = [
+        conds[i:i + chunk_size] for i in xrange(0, len(conds), chunk_size)
+    ] or [[]]
+    queries = []
+    for chunk in chunks:
+        query = ' or '.join(chunk)
+        if base:
+            query = '%s and ( %s )' % (base, query) if query else base
+        queries.append(query)
+    return queries
+
+
 def get_hg_by_name(frm_client, hg_name):
     """
     get_hg_by_name
@@ -59,12 +168,7 @@ def get_hg_by_name(frm_client, hg_name):
     :return: hostgroup metadata dictonary
     :rtype: dict
     """
-    hostgroup = frm_client.index_hostgroups(search='name = %s' % hg_name)
-    res = hostgroup.get('results', [])
-    if len(res) != 1:
-        raise LookupError(('hostgroup {0} does not exists or more than one'
-                           ' hostgroup was found').format(hg_name))
-    return res[0]
+    return _lookup(frm_client, 'hostgroup').get(hg_name)
 
 
 def get_host_by_name(frm_client, host_name):
@@ -77,9 +181,284 @@ def get_host_by_name(frm_client, host_name):
     :return: hostname metadata dictonary
     :rtype: dict
     """
-    host = frm_client.index_hosts(search='name = {0}'.format(host_name))
-    res = host.get('results', [])
-    if len(res) != 1:
-        raise LookupError(('host {0} does not exist or more than one'
-                           ' host was found').format(host_name))
-    return res[0]
+    return _lookup(frm_client, 'host').get(host_name)
+
+
+def _name_key(name):
+    return name.lower()
+
+
+def _quote(value):
+    # Escape what would end or escape a double quoted search value
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+class NameLookup(object):
+    """
+    Look up foreman records by name, batching many names into a few searches
+    and remembering what was found
+
+    Only names that matched exactly one record are remembered, so names that
+    are missing or ambiguous are searched for again every time. Like foreman
+    name searches, names are matched regardless of case.
+    """
+    def __init__(self, index_func, what, ttl=0, cache_file=None):
+        """
+        :param index_func: A foreman client index method, like
+                           frm_client.index_hostgroups
+        :param what:       What kind of records are looked up, used in error
+                           messages
+        :param ttl:        How long (in seconds) found records are kept in
+                           cache_file
+        :param cache_file: A file to keep found records in between runs, not
+                           used if not given or if ttl is 0
+        """
+        self._index_func = index_func
+        self._what = what
+        self._ttl = ttl
+        self._cache_file = cache_file if ttl else None
+        self._records = {}
+        self._load()
+
+    def prefetch(self, names):
+        """
+        Search for all the given names that were not found yet
+
+        :param names: The names to search for
+        """
+        missing = dict(
+            (_name_key(name), name) for name in names
+            if _name_key(name) not in self._records
+        )
+        if not missing:
+            return
+        found = dict((key, {}) for key in missing)
+        queries = split_or_query(
+            'name = "%s"' % _quote(name) for name in missing.itervalues()
+        )
+        for page in _iter_query_pages(self._index_func, queries, PAGE_WORKERS):
+            for record in page.get('results', []):
+                key = _name_key(record.get('name') or '')
+                if key in found:
+                    found[key][record.get('id')] = record
+        found = dict(
+            (name, records.values()[0])
+            for name, records in found.iteritems() if len(records) == 1
+        )
+        self._records.update(found)
+        self._save(found)
+
+    def get(self, name):
+        """
+        Get the record of a name
+
+        :param name: The name to look up
+        :raises LookupError: if there is no record or more then one record
+            with the given name
+        :rtype: dict
+        """
+        self.prefetch([name])
+        if _name_key(name) not in self._records:
+            raise LookupError((
+                '{what} {name} does not exist or more than one {what} was'
+                ' found'
+            ).format(what=self._what, name=name))
+        return self._records[_name_key(name)]
+
+    def get_many(self, names):
+        """
+        Get the records of many names
+
+        :param names: The names to look up
+        :raises LookupError: like get, for the first name that fails
+        :rtype: collections.OrderedDict
+        """
+        names = list(names)
+        self.prefetch(names)
+        return OrderedDict((name, self.get(name)) for name in names)
+
+    def _load(self):
+        if not self._cache_file:
+            return
+        self._records.update(
+            (_name_key(name), entry['record'])
+            for name, entry in self._read_cache().iteritems()
+        )
+
+    def _read_cache(self):
+        try:
+            with open(self._cache_file) as cache_file:
+                entries = json.load(cache_file)
+        except (IOError, ValueError):
+            return {}
+        oldest = time.time() - self._ttl
+        return dict(
+            (name, entry) for name, entry in entries.iteritems()
+            if entry['fetched'] > oldest
+        )
+
+    def _save(self, found):
+        if not self._cache_file or not found:
+            return
+        entries = self._read_cache()
+        now = time.time()
+        entries.update(
+            (name, dict(fetched=now, record=record))
+            for name, record in found.iteritems()
+        )
+        tmp_path = '{0}.{1}.tmp'.format(self._cache_file, os.getpid())
+        with open(tmp_path, 'w') as cache_file:
+            json.dump(entries, cache_file)
+        os.rename(tmp_path, self._cache_file)
+
+
+# The lookups of every foreman client we were given
+_LOOKUPS = WeakKeyDictionary()
+
+
+def _lookup(frm_client, what):
+    lookups = _LOOKUPS.setdefault(frm_client, {})
+    if what not in lookups:
+        ttl = int(env.get('foreman_lookup_ttl', 0))
+        cache_file = None
+        if ttl:
+            key = sha1(u'{0}\0{1}'.format(
+                getattr(frm_client, 'url', ''), what
+            ).encode('utf-8'))
+            cache_file = cache_path(
+                'foreman', 'lookup-{0}.json'.format(key.hexdigest())
+            )
+        lookups[what] = NameLookup(
+            getattr(frm_client, 'index_{0}s'.format(what)), what, ttl,
+            cache_file,
+        )
+    return lookups[what]
+
+
+def iter_pages(index_func, per_page=PER_PAGE, workers=PAGE_WORKERS,
+               **params):
+    """
+    Generate all the result pages of a foreman index call
+
+    The first page is fetched to find out how many results there are, and the
+    rest are then fetched concurrently, they are still generated in order.
+
+    :param index_func: A foreman client index method, like
+                       frm_client.index_hosts
+    :param per_page:   How many results to ask for in every page
+    :param workers:    How many pages to fetch at the same time
+    :param params:     Parameters for the index method, like 'search'
+    :return: generator of the returned pages
+    """
+    first = index_func(page=1, per_page=per_page, **params)
+    yield first
+    # Foreman may return less results per page then asked for
+    per_page = int(first.get('per_page') or per_page)
+    total = int(first.get('subtotal', first.get('total')) or 0)
+    pages = (total + per_page - 1) // per_page
+    if pages <= 1:
+        return
+    pool = ThreadPool(min(workers, pages - 1))
+    try:
+        for page in pool.imap(
+            lambda page: index_func(page=page, per_page=per_page, **params),
+            xrange(2, pages + 1),
+        ):
+            yield page
+    finally:
+        pool.terminate()
+
+
+def iter_results(index_func, **kwargs):
+    """
+    Generate all the results of a foreman index call, see iter_pages for the
+    parameters
+
+    :return: generator of the result records
+    """
+    for page in iter_pages(index_func, **kwargs):
+        for result in page.get('results', []):
+            yield result
+
+
+def iter_search(index_func, conds, base='', key='name',
+                chunk_size=QUERY_CHUNK, workers=PAGE_WORKERS, **params):
+    """
+    Generate the results of 'or'ing many conditions in a foreman search
+
+    The conditions are split with split_or_query and the resulting queries
+    are run concurrently. Records returned by more then one of them are only
+    generated once.
+
+    :param index_func: A foreman client index method, like
+                       frm_client.index_hosts
+    :param conds:      The conditions to 'or'
+    :param base:       A condition to 'and' all the conditions with
+    :param key:        The field identifying the result records
+    :param chunk_size: The maximal amount of conditions in a query
+    :param workers:    How many queries or pages to fetch at the same time
+    :param params:     More parameters for the index method
+    :return: generator of the result records
+    """
+    seen = set()
+    for page in _iter_query_pages(
+        index_func, split_or_query(conds, base, chunk_size), workers, **params
+    ):
+        for result in page.get('results', []):
+            if result[key] not in seen:
+                seen.add(result[key])
+                yield result
+
+
+def get_facts(index_func, hosts, facts=None, chunk_size=QUERY_CHUNK,
+              workers=PAGE_WORKERS, per_page=1000):
+    """
+    Get the facts foreman has about many hosts in bulk
+
+    :param index_func: The foreman client fact values index method
+                       (frm_client.index_fact_values)
+    :param hosts:      The names of the hosts to get the facts of
+    :param facts:      The names of the facts to get, all of them if not
+                       given
+    :param chunk_size: The maximal amount of hosts in a query
+    :param workers:    How many queries or pages to fetch at the same time
+    :param per_page:   How many fact values to ask for in every page
+    :return: A dict mapping host names to dicts of their facts
+    :rtype: dict
+    """
+    base = ''
+    if facts:
+        base = '( %s )' % ' or '.join('fact = %s' % fact for fact in facts)
+    host_facts = {}
+    for page in _iter_query_pages(
+        index_func,
+        split_or_query(('host = %s' % host for host in hosts), base,
+                       chunk_size),
+        workers,
+        per_page=per_page,
+    ):
+        for host, values in (page.get('results') or {}).iteritems():
+            host_facts.setdefault(host, {}).update(values)
+    return host_facts
+
+
+def _iter_query_pages(index_func, queries, workers, **params):
+    if len(queries) == 1:
+        # Fetch the pages concurrently instead
+        for page in iter_pages(
+            index_func, search=queries[0], workers=workers, **params
+        ):
+            yield page
+        return
+    pool = ThreadPool(min(workers, len(queries)))
+    try:
+        for pages in pool.imap(
+            lambda query: list(iter_pages(
+                index_func, search=query, workers=1, **params
+            )),
+            queries,
+        ):
+            for page in pages:
+                yield page
+    finally:
+        pool.terminate()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+"""foreman_cache.py - Keep the results of Foreman host searches on disk
+
+Searches are answered from the cache while it is fresh. Once it gets stale
+it is refreshed by asking Foreman only for the names of the hosts that match
+the search and for the records of the hosts that were updated since, which is
+much cheaper then fetching all the records again.
+"""
+import os
+import json
+import stat
+import time
+from hashlib import sha1
+from collections import OrderedDict
+
+from fabric_ovirt.lib.foreman import iter_search
+from fabric_ovirt.lib.utils import cache_path
+
+#: How long (in seconds) cached results are used without asking Foreman
+DEFAULT_TTL = 300
+#: 'yes' uses fresh cached results, 'refresh' always checks with Foreman and
+#: 'offline' only uses cached results, no matter how old they are
+MODES = ('yes', 'refresh', 'offline')
+
+
+class ForemanCache(object):
+    """Cached host search results of a single Foreman server and user
+
+    Users may be allowed to see different hosts, so every user gets results
+    of their own, in files only readable by their owner.
+    """
+    def __init__(self, url, user=None, ttl=DEFAULT_TTL):
+        """
+        :param str url:  The Foreman server url
+        :param str user: The user searching Foreman, None when not
+                         authenticating
+        :param int ttl:  How long (in seconds) cached results are used
+                         without asking Foreman
+        """
+        self._url = url
+        self._user = user or ''
+        self._ttl = ttl
+
+    def path(self, search):
+        """Get the path of the cache file of a search
+
+        :param search: The search string or a list of conditions to 'or'
+        :rtype: str
+        """
+        search = _search_string(search)
+        key = sha1(u'{0}\0{1}\0{2}'.format(
+            self._url, self._user, search
+        ).encode('utf-8'))
+        return cache_path('foreman', key.hexdigest() + '.json')
+
+    def load(self, search):
+        """Load the cached results of a search
+
+        :param search: The search string or a list of conditions to 'or'
+        :returns: The cache entry, a dict with the host records under 'hosts'
+                  and the time they were fetched at under 'fetched', or None
+                  if the search was not cached
+        :rtype: dict
+        """
+        try:
+            with open(self.path(search)) as cache_file:
+                return json.load(cache_file)
+        except (IOError, ValueError):
+            return None
+
+    def save(self, search, hosts):
+        """Cache the results of a search
+
+        :param search:     The search string or a list of conditions to 'or'
+        :param list hosts: The host records Foreman returned
+        :returns: The new cache entry, see load
+        :rtype: dict
+        """
+        entry = dict(
+            url=self._url, search=_search_string(search), fetched=time.time(),
+            hosts=hosts,
+        )
+        path = self.path(search)
+        # Write to a temporary file first so readers never see a partial file
+        tmp_path = '{0}.{1}.tmp'.format(path, os.getpid())
+        fd = os.open(
+            tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+            stat.S_IRUSR | stat.S_IWUSR,
+        )
+        with os.fdopen(fd, 'w') as cache_file:
+            json.dump(entry, cache_file)
+        os.rename(tmp_path, path)
+        return entry
+
+    def search(self, search, get_client, mode='yes'):
+        """Get the host records matching a search
+
+        :param search:              The search string or a list of
+                                    conditions to 'or', long lists are split
+                                    into queries that run concurrently
+        :param callable get_client: Called with no arguments to get a Foreman
+                                    client, only if Foreman needs to be asked
+        :param str mode:            One of MODES
+        :raises LookupError: If in offline mode and the search is not cached
+        :returns: The host records
+        :rtype: list
+        """
+        if mode not in MODES:
+            raise ValueError('Foreman cache mode must be one of: {0}'.format(
+                ', '.join(MODES)
+            ))
+        entry = self.load(search)
+        if mode == 'offline':
+            if entry is None:
+                raise LookupError(
+                    'No cached results for Foreman search: {0}'.format(
+                        _search_string(search)
+                    )
+                )
+            return entry['hosts']
+        if (
+            entry is not None and mode == 'yes'
+            and time.time() - entry['fetched'] < self._ttl
+        ):
+            return entry['hosts']
+        client = get_client()
+        if entry is None:
+            hosts = self._fetch(client, search)
+        else:
+            hosts = self._refresh(client, search, entry['hosts'])
+        return self.save(search, hosts)['hosts']
+
+    def _fetch(self, client, search):
+        return list(iter_search(client.index_hosts, _search_conds(search)))
+
+    def _refresh(self, client, search, hosts):
+        since = max(host.get('updated_at') or '' for host in hosts) \
+            if hosts else ''
+        if not since:
+            return self._fetch(client, search)
+        conds = _search_conds(search)
+        try:
+            names = set(
+                host['name'] for host in
+                iter_search(client.index_hosts, conds, thin=True)
+            )
+            updated = OrderedDict(
+                (host['name'], host) for host in iter_search(
+                    client.index_hosts, conds,
+                    base='updated_at >= "{0}"'.format(since),
+                )
+            )
+        except Exception:
+            # Older Foreman versions may not support the parameters or
+            # search fields used above
+            return self._fetch(client, search)
+        known = set(host['name'] for host in hosts) | set(updated)
+        if not names <= known:
+            # Hosts that started matching without being updated themselves
+            # (e.g. by their facts changing), we can't get them cheaply
+            return self._fetch(client, search)
+        refreshed = [
+            updated.pop(host['name'], host)
+            for host in hosts if host['name'] in names
+        ]
+        refreshed.extend(
+            host for host in updated.itervalues() if host['name'] in names
+        )
+        return refreshed
+
+
+def _search_conds(search):
+    if isinstance(search, basestring):
+        return [search] if search else []
+    return list(search)
+
+
+def _search_string(search):
+    if isinstance(search, basestring):
+        return search
+    return ' or '.join(search)
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+"""host_groups.py - Group hosts and limit how many hosts of each group are
+worked on at the same time
+"""
+from collections import OrderedDict, Counter, deque
+
+from fabric.network import parse_host_string
+from fabric.state import env
+
+from fabric_ovirt.lib.utils import matches_glob
+
+
+def host_groups():
+    """Get the host groups of the current run, creating them if needed
+
+    :rtype: HostGroups
+    """
+    groups = env.get('host_groups')
+    if groups is None:
+        groups = env.host_groups = HostGroups()
+    return groups
+
+
+class HostGroups(object):
+    """Map hosts to groups and keep the concurrency limit of every group
+
+    Hosts can be assigned to groups explicitly (e.g. by the oVirt cluster or
+    Foreman host group they were selected from) or by name patterns. Explicit
+    assignments win, and patterns are checked in the order they were added.
+    """
+    def __init__(self):
+        self._hosts = {}
+        self._patterns = []
+        self._limits = {}
+
+    def add_hosts(self, group, hosts, limit=None):
+        """Assign hosts to a group
+
+        :param str group:      The group name
+        :param Iterable hosts: Host names to add to the group
+        :param int limit:      If given, how many of the group hosts can be
+                               worked on at the same time
+        """
+        for host in hosts:
+            self._hosts[host] = group
+        if limit is not None:
+            self.set_limit(group, limit)
+
+    def add_patterns(self, group, patterns, limit=None):
+        """Assign hosts with names matching glob patterns to a group
+
+        :param str group:         The group name
+        :param Iterable patterns: Glob patterns of host names
+        :param int limit:         Same as for add_hosts
+        """
+        self._patterns.extend((pattern, group) for pattern in patterns)
+        if limit is not None:
+            self.set_limit(group, limit)
+
+    def set_limit(self, group, limit):
+        """Set how many of the group hosts can be worked on at the same time
+
+        :param str group: The group name
+        :param int limit: The concurrency limit
+        """
+        self._limits[group] = max(1, int(limit))
+
+    def limit_of(self, group):
+        """Get the concurrency limit of a group
+
+        :param str group: The group name
+        :returns: The limit or None if the group is not limited
+        :rtype: int
+        """
+        return self._limits.get(group)
+
+    def group_of(self, host_string):
+        """Find the group of a host
+
+        :param str host_string: A host name or a fabric host string
+        :returns: The group name or None if the host is not in any group
+        :rtype: str
+        """
+        host = parse_host_string(host_string)['host']
+        if host in self._hosts:
+            return self._hosts[host]
+        for pattern, group in self._patterns:
+            if matches_glob(host, pattern):
+                return group
+        return None
+
+
+class GroupScheduler(object):
+    """A queue of parallel jobs that only hands out jobs of groups that are
+    below their concurrency limit
+
+    Jobs are taken from the groups in a round-robin fashion, and in the order
+    fabric would have run them within every group.
+    """
+    def __init__(self, jobs, groups=None):
+        """
+        :param list jobs:         The queued jobs, fabric pops them from the
+                                  end of the list
+        :param HostGroups groups: The host groups, if not given jobs are not
+                                  limited
+        """
+        self._groups = groups
+        self._queues = OrderedDict()
+        self._running = Counter()
+        self._len = 0
+        for job in reversed(jobs):
+            self._queues.setdefault(self._group(job), deque()).append(job)
+            self._len += 1
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        for queue in self._queues.itervalues():
+            for job in queue:
+                yield job
+
+    def ready(self):
+        """Check if there is a job that can be started now"""
+        return any(self._has_room(group) for group in self._queues)
+
+    def pop(self):
+        """Get the next job that can be started
+
+        :raises IndexError: if no job can be started now
+        :rtype: multiprocessing.Process
+        """
+        for group in self._queues:
+            if self._has_room(group):
+                break
+        else:
+            raise IndexError('No job can be started now')
+        queue = self._queues.pop(group)
+        job = queue.popleft()
+        if queue:
+            # Put the group at the back of the line
+            self._queues[group] = queue
+        self._running[group] += 1
+        self._len -= 1
+        return job
+
+    def done(self, job):
+        """Let the scheduler know a job it handed out had finished
+
+        :param multiprocessing.Process job: The finished job
+        """
+        self._running[self._group(job)] -= 1
+
+    def _group(self, job):
+        if self._groups is None:
+            return None
+        return self._groups.group_of(job.name)
+
+    def _has_room(self, group):
+        if group is None:
+            return True
+        limit = self._groups.limit_of(group)
+        return limit is None or self._running[group] < limit
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+"""host_logs.py - Keep the full output of every parallel job in its own file
+"""
+import os
+import re
+import json
+import datetime
+from hashlib import sha1
+from tempfile import mkdtemp
+
+from fabric_ovirt.lib.output_mux import redirect_job
+
+#: Buffering of the job log files, line buffered since the job processes
+#: (and the commands they run locally) also write to the files through their
+#: stdout and stderr fds, so output written both ways stays in order
+LOG_BUFFER = 1
+#: The name of the file mapping hosts to logs and outcomes in a run directory
+INDEX_FILE = 'index.json'
+
+
+def log_file_name(name):
+    """Convert a job (host string) name into a safe log file name
+
+    Names that had to be changed get a short hash of the original name added,
+    so names like 'a/b' and 'a_b' do not end up sharing a file
+
+    :param str name: The job name
+
+    :rtype: str
+    """
+    safe_name = re.sub(r'[^\w@.:-]', '_', name)
+    if safe_name != name:
+        if isinstance(name, unicode):
+            name = name.encode('utf-8')
+        safe_name += '-' + sha1(name).hexdigest()[:8]
+    return safe_name + '.log'
+
+
+class RunLogDir(object):
+    """A directory holding the logs of all the jobs of a single parallel run
+    """
+    def __init__(self, base_dir, command=None):
+        """
+        :param str base_dir: The directory to create the run directory in, it
+                             is created if it does not exist
+        :param str command:  The name of the task being run, used to name the
+                             run directory
+        """
+        base_dir = os.path.expanduser(base_dir)
+        if not os.path.isdir(base_dir):
+            os.makedirs(base_dir)
+        self._command = command or 'run'
+        self._started = datetime.datetime.now()
+        self._path = mkdtemp(
+            prefix='{0}-{1}-'.format(
+                re.sub(r'[^\w.-]', '_', self._command),
+                self._started.strftime('%Y%m%d-%H%M%S'),
+            ),
+            dir=base_dir,
+        )
+
+    @property
+    def path(self):
+        return self._path
+
+    def log_path(self, name):
+        """Get the path of the log file for a given job
+
+        :param str name: The job name
+        :rtype: str
+        """
+        return os.path.join(self._path, log_file_name(name))
+
+    def start(self, job):
+        """Start a multiprocessing job that writes its output to its log file
+
+        :param multiprocessing.Process job: A job that was not started yet
+        """
+        log_path = self.log_path(job.name)
+        redirect_job(
+            job, open_stream=lambda: open(log_path, 'w', LOG_BUFFER)
+        )
+        job.start()
+
+    def write_index(self, results):
+        """Write the index file mapping hosts to their logs and outcomes
+
+        :param dict results: The job results as returned by JobQueue.run
+
+        :returns: The path of the index file
+        :rtype: str
+        """
+        hosts = {}
+        for name, result in results.iteritems():
+            failed = (
+                result['exit_code'] != 0
+                or isinstance(result['results'], BaseException)
+            )
+            hosts[name] = dict(
+                log=os.path.basename(self.log_path(name)),
+                exit_code=result['exit_code'],
+                status=failed and 'failed' or 'ok',
+            )
+            if isinstance(result['results'], BaseException):
+                hosts[name]['error'] = repr(result['results'])
+        index_path = os.path.join(self._path, INDEX_FILE)
+        with open(index_path, 'w') as index:
+            json.dump(
+                dict(
+                    command=self._command,
+                    started=self._started.isoformat(),
+                    hosts=hosts,
+                ),
+                index, indent=2, sort_keys=True,
+            )
+        return index_path
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+"""host_set.py - An ordered, deduplicated list of target hosts
+
+The host selection tasks add hosts to env.hosts one by one as they get them,
+so with large target sets looking for duplicates must not mean scanning the
+whole list.
+"""
+from itertools import chain
+
+from fabric.state import env
+from fabric.utils import abort, indent
+
+
+def target_hosts():
+    """Get env.hosts as a HostSet, converting it if needed
+
+    If env.dedupe_hosts is off, env.hosts is kept a plain list instead so
+    duplicate hosts stay in it.
+
+    :rtype: HostSet
+    """
+    hosts = env.get('hosts')
+    if not env.get('dedupe_hosts', True):
+        if not isinstance(hosts, list):
+            hosts = env.hosts = list(hosts or ())
+        return hosts
+    if not isinstance(hosts, HostSet):
+        hosts = env.hosts = HostSet(hosts or ())
+    return hosts
+
+
+def _intern(host):
+    host = host.strip()
+    try:
+        return intern(str(host))
+    except UnicodeEncodeError:
+        return host
+
+
+class HostSet(list):
+    """A list of host strings that keeps the order the hosts were added in
+    and silently skips hosts it already has
+
+    Host strings are stripped and interned, so a host that shows up in many
+    places (host groups, job names, results) is only kept in memory once.
+    """
+    def __init__(self, hosts=()):
+        """
+        :param Iterable hosts: The initial hosts, can be a generator
+        """
+        super(HostSet, self).__init__()
+        self._seen = set()
+        self.extend(hosts)
+
+    def __contains__(self, host):
+        return host in self._seen
+
+    def append(self, host):
+        host = _intern(host)
+        if host not in self._seen:
+            self._seen.add(host)
+            super(HostSet, self).append(host)
+
+    def extend(self, hosts):
+        """Add hosts from an iterable, without building it in memory first
+
+        :param Iterable hosts: The hosts to add
+        """
+        for host in hosts:
+            self.append(host)
+
+    def __iadd__(self, hosts):
+        self.extend(hosts)
+        return self
+
+    def __add__(self, hosts):
+        return HostSet(chain(self, hosts))
+
+    def __reduce__(self):
+        # The hosts seen are not kept in the list items, so copying and
+        # pickling has to go through __init__
+        return HostSet, (list(self),)
+
+    def insert(self, index, host):
+        host = _intern(host)
+        if host not in self._seen:
+            self._seen.add(host)
+            super(HostSet, self).insert(index, host)
+
+    def remove(self, host):
+        super(HostSet, self).remove(host)
+        self._seen.discard(host)
+
+    def pop(self, index=-1):
+        host = super(HostSet, self).pop(index)
+        self._seen.discard(host)
+        return host
+
+    def __setitem__(self, index, value):
+        # Replacing items may bring in duplicates, so rebuild from scratch
+        hosts = list(self)
+        hosts[index] = value
+        self._reset(hosts)
+
+    def __delitem__(self, index):
+        super(HostSet, self).__delitem__(index)
+        self._seen = set(self)
+
+    # Python 2 uses these for simple slices instead of the methods above
+    def __setslice__(self, start, stop, value):
+        self.__setitem__(slice(start, stop), value)
+
+    def __delslice__(self, start, stop):
+        self.__delitem__(slice(start, stop))
+
+    def _reset(self, hosts):
+        super(HostSet, self).__delslice__(0, len(self))
+        self._seen = set()
+        self.extend(hosts)
+
+
+def merge(hosts, roles, exclude, roledefs):
+    """A replacement for fabric.task_utils.merge that dedupes hosts in linear
+    time (the original checks every host against all the hosts before it)
+    """
+    bad_roles = [x for x in roles if x not in roledefs]
+    if bad_roles:
+        abort("The following specified roles do not exist:\n%s" % (
+            indent(bad_roles)
+        ))
+    if isinstance(hosts, basestring):
+        hosts = [hosts]
+    role_hosts = []
+    for role in roles:
+        value = roledefs[role]
+        if isinstance(value, dict):
+            value = value['hosts']
+        if callable(value):
+            value = value()
+        role_hosts += value
+    if (
+        isinstance(hosts, HostSet) and not role_hosts and not exclude
+        and env.dedupe_hosts
+    ):
+        # Already stripped and deduped
+        return list(hosts)
+    cleaned_hosts = [x.strip() for x in list(hosts) + list(role_hosts)]
+    if not env.dedupe_hosts:
+        return cleaned_hosts
+    seen = set(exclude)
+    deduped_hosts = []
+    for host in cleaned_hosts:
+        if host not in seen:
+            seen.add(host)
+            deduped_hosts.append(host)
+    return deduped_hosts
+
+
+def monkey_patch(mod):
+    mod.task_utils.merge = merge
+    mod.tasks.merge = merge
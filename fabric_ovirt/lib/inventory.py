@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+"""inventory.py - Named sets of hosts that can be combined with set algebra
+
+The host selection tasks can put the hosts they select into a named set
+instead of the target hosts. The sets are only fetched when an expression
+using them is evaluated, and all the sets an expression needs are fetched
+concurrently, for example:
+
+    web & prod - maintenance
+
+Operators are evaluated from left to right, use parenthesis to change that:
+
+    '|' - union, '&' - intersection, '-' - difference
+"""
+import re
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
+
+from fabric.state import env
+
+from fabric_ovirt.lib.host_set import HostSet
+
+#: How many sets to fetch at the same time
+FETCH_WORKERS = 8
+
+TOKEN_RE = re.compile(r'\s*(?:(?P<name>\w+)|(?P<op>[|&()-]))')
+
+
+def inventory():
+    """Get the inventory of the current run, creating it if needed
+
+    :rtype: Inventory
+    """
+    inv = env.get('inventory')
+    if inv is None:
+        inv = env.inventory = Inventory()
+    return inv
+
+
+class Inventory(object):
+    """A collection of named host sets that are fetched lazily
+    """
+    def __init__(self):
+        self._sources = OrderedDict()
+        self._sets = {}
+
+    def define(self, name, source):
+        """Define a host set
+
+        :param str name:        The set name
+        :param callable source: Called with no arguments when the set is first
+                                needed, should return an iterable of host
+                                names
+        """
+        self._sources[name] = source
+        self._sets.pop(name, None)
+
+    def define_expression(self, name, expression):
+        """Define a host set as a combination of other sets
+
+        :param str name:       The set name
+        :param str expression: The set expression, see the module
+                               documentation
+        """
+        tree = parse_expression(expression)
+        self.define(name, lambda: self._evaluate(tree))
+
+    @property
+    def names(self):
+        """The names of the defined sets"""
+        return self._sources.keys()
+
+    def get(self, name):
+        """Get a host set, fetching it if needed
+
+        :param str name: The set name
+        :raises LookupError: If no set was defined with the given name
+        :rtype: HostSet
+        """
+        self.fetch([name])
+        return self._sets[name]
+
+    def fetch(self, names, workers=FETCH_WORKERS):
+        """Fetch the given sets concurrently, if they were not fetched yet
+
+        :param Iterable names: The set names
+        :param int workers:    How many sets to fetch at the same time
+        :raises LookupError: If any of the sets was not defined
+        """
+        missing = [name for name in names if name not in self._sources]
+        if missing:
+            raise LookupError(
+                'No host sets named: {0}'.format(', '.join(missing))
+            )
+        pending = [
+            name for name in OrderedDict.fromkeys(names)
+            if name not in self._sets
+        ]
+        if len(pending) > 1:
+            pool = ThreadPool(min(workers, len(pending)))
+            try:
+                host_sets = pool.map(
+                    lambda name: HostSet(self._sources[name]()), pending
+                )
+            finally:
+                pool.terminate()
+        else:
+            host_sets = [HostSet(self._sources[name]()) for name in pending]
+        self._sets.update(zip(pending, host_sets))
+
+    def evaluate(self, expression):
+        """Evaluate a set expression
+
+        :param str expression: The set expression, see the module
+                               documentation
+        :raises ValueError: If the expression is malformed
+        :raises LookupError: If the expression uses undefined sets
+        :rtype: HostSet
+        """
+        return self._evaluate(parse_expression(expression))
+
+    def _evaluate(self, tree):
+        self.fetch(_tree_names(tree))
+        return self._evaluate_tree(tree)
+
+    def _evaluate_tree(self, tree):
+        if isinstance(tree, basestring):
+            return self._sets[tree]
+        op, left, right = tree
+        left = self._evaluate_tree(left)
+        right = self._evaluate_tree(right)
+        if op == '|':
+            result = HostSet(left)
+            result.extend(right)
+            return result
+        elif op == '&':
+            return HostSet(host for host in left if host in right)
+        else:
+            return HostSet(host for host in left if host not in right)
+
+
+def parse_expression(expression):
+    """Parse a set expression
+
+    :param str expression: The set expression, see the module documentation
+    :raises ValueError: If the expression is malformed
+    :returns: A set name or a nested (operator, left, right) tuple
+    """
+    tokens = _tokenize(expression)
+    tree = _parse_operand(tokens, expression)
+    while tokens:
+        op = tokens.pop(0)
+        if op in ('|', '&', '-'):
+            tree = (op, tree, _parse_operand(tokens, expression))
+        else:
+            raise ValueError(
+                "Unexpected '{0}' in host set expression: {1}".format(
+                    op, expression
+                )
+            )
+    return tree
+
+
+def _tokenize(expression):
+    tokens = []
+    pos = 0
+    expression = expression.rstrip()
+    while pos < len(expression):
+        match = TOKEN_RE.match(expression, pos)
+        if not match:
+            raise ValueError('Bad host set expression: {0}'.format(expression))
+        tokens.append(match.group('name') or match.group('op'))
+        pos = match.end()
+    return tokens
+
+
+def _parse_operand(tokens, expression):
+    if not tokens:
+        raise ValueError(
+            'Incomplete host set expression: {0}'.format(expression)
+        )
+    token = tokens.pop(0)
+    if token != '(':
+        if token in ('|', '&', '-', ')'):
+            raise ValueError(
+                "Unexpected '{0}' in host set expression: {1}".format(
+                    token, expression
+                )
+            )
+        return token
+    depth = 1
+    for i, sub_token in enumerate(tokens):
+        if sub_token == '(':
+            depth += 1
+        elif sub_token == ')':
+            depth -= 1
+            if depth == 0:
+                break
+    else:
+        raise ValueError(
+            "Missing ')' in host set expression: {0}".format(expression)
+        )
+    sub_tokens = tokens[:i]
+    del tokens[:i + 1]
+    return parse_expression(' '.join(sub_tokens))
+
+
+def _tree_names(tree):
+    if isinstance(tree, basestring):
+        return [tree]
+    return _tree_names(tree[1]) + _tree_names(tree[2])
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""object_cache.py - Remember the results of API lookups for the length of a
+run
+
+Objects like clusters, storage domains and templates rarely change while we
+work, but tasks that provision many VMs look them up again and again. Lookups
+are remembered per object kind and lookup parameters, and objects found by
+listing are also remembered by their ID. Code that changes objects of a kind
+should invalidate it.
+"""
+from threading import Lock
+
+
+class ObjectCache(object):
+    """Lookup results of API collections, keyed by object kind
+    """
+    def __init__(self):
+        self._kinds = {}
+        self._lock = Lock()
+
+    def list(self, kind, collection, scope=None, **params):
+        """Get the result of collection.list(**params)
+
+        :param str kind:          The kind of objects in the collection
+        :param object collection: The API collection
+        :param scope:             Something identifying the collection if
+                                  there are many of the same kind, like the
+                                  ID of the cluster of a cluster networks
+                                  collection
+        :param params:            Parameters for the list method
+        :rtype: list
+        """
+        objs = self._lookup(
+            kind, (scope, 'list', _params_key(params)),
+            lambda: collection.list(**params),
+        )
+        with self._lock:
+            entries = self._kinds.setdefault(kind, {})
+            for obj in objs:
+                entries.setdefault(
+                    (scope, 'get', _params_key(dict(id=obj.id))), obj
+                )
+        return objs
+
+    def get(self, kind, collection, scope=None, **params):
+        """Get the result of collection.get(**params)
+
+        See list for the parameters.
+
+        :returns: The object or None if there is none
+        """
+        return self._lookup(
+            kind, (scope, 'get', _params_key(params)),
+            lambda: collection.get(**params),
+        )
+
+    def invalidate(self, *kinds):
+        """Forget lookups of some object kinds
+
+        :param str kinds: The object kinds, all kinds if none are given
+        """
+        with self._lock:
+            if kinds:
+                for kind in kinds:
+                    self._kinds.pop(kind, None)
+            else:
+                self._kinds.clear()
+
+    def _lookup(self, kind, key, fetch):
+        with self._lock:
+            entries = self._kinds.get(kind, {})
+            if key in entries:
+                return entries[key]
+        # Fetch without holding the lock, at worst we look up the same
+        # thing twice
+        value = fetch()
+        with self._lock:
+            return self._kinds.setdefault(kind, {}).setdefault(key, value)
+
+
+def _params_key(params):
+    return tuple(sorted(params.iteritems()))
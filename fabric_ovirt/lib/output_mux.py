@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+"""output_mux.py - Funnel the output of parallel jobs through a single writer
+"""
+import os
+import sys
+import time
+import errno
+import select
+
+#: How much data to read from a job pipe in one go
+READ_SIZE = 64 * 1024
+
+
+def redirect_job(job, open_stream, close_fds=()):
+    """Make a job send its stdout and stderr to a stream of its own
+
+    :param multiprocessing.Process job: A job that was not started yet
+    :param Callable open_stream:        Called inside the job to open the
+                                        file object to write output to
+    :param Iterable close_fds:          File descriptors inherited from the
+                                        parent that the job should not hold
+                                        open
+    """
+    target = job._target
+    close_fds = tuple(close_fds)
+
+    def new_target(*args, **kwargs):
+        sys.stdout.flush()
+        sys.stderr.flush()
+        stream = open_stream()
+        for fd in close_fds:
+            os.close(fd)
+        os.dup2(stream.fileno(), 1)
+        os.dup2(stream.fileno(), 2)
+        # sys.stdout and sys.stderr may have been replaced with objects that
+        # do not write to fds 1 and 2, so make sure output goes to the stream
+        sys.stdout = sys.stderr = stream
+        return target(*args, **kwargs)
+
+    job._target = new_target
+
+
+class OutputMux(object):
+    """Collect the output of parallel jobs over pipes and write it out as
+    whole, host-prefixed lines
+
+    Jobs write to their own pipe, so their output never interleaves mid-line.
+    The parent reads all the pipes, keeps partial lines per job, and writes
+    complete lines out in batches.
+    """
+    def __init__(self, stream=None, batch_size=64 * 1024):
+        """
+        :param file stream:    Where to write the output to, sys.stdout (at
+                               the time of writing) by default
+        :param int batch_size: Flush the output once that many bytes are
+                               waiting to be written
+        """
+        self._stream = stream
+        self._batch_size = batch_size
+        self._sources = {}
+        self._partial = {}
+        self._batch = []
+        self._batch_len = 0
+
+    @property
+    def active(self):
+        """True if there are job pipes that were not closed yet"""
+        return bool(self._sources)
+
+    def start(self, job):
+        """Start a multiprocessing job with its output routed through the mux
+
+        :param multiprocessing.Process job: A job that was not started yet,
+                                            its name is used as the line
+                                            prefix
+        """
+        rfd, wfd = os.pipe()
+        redirect_job(
+            job,
+            open_stream=lambda: os.fdopen(wfd, 'w', 1),
+            close_fds=list(self._sources) + [rfd],
+        )
+        self._sources[rfd] = job.name
+        self._partial.setdefault(job.name, '')
+        try:
+            job.start()
+        finally:
+            os.close(wfd)
+
+    def poll(self, timeout=0):
+        """Read whatever output the jobs have produced
+
+        :param float timeout: How long to wait for output to show up, this
+                              also serves as a sleep when there is nothing to
+                              read
+        """
+        if not self._sources:
+            if timeout:
+                time.sleep(timeout)
+            return
+        try:
+            readable = select.select(list(self._sources), [], [], timeout)[0]
+        except select.error as e:
+            if e.args[0] == errno.EINTR:
+                return
+            raise
+        for fd in readable:
+            self._read(fd)
+
+    def feed(self, name, data):
+        """Add output data that came from a job
+
+        :param str name: The job name
+        :param str data: The output data, not necessarily whole lines
+        """
+        lines = (self._partial.get(name, '') + data).split('\n')
+        self._partial[name] = lines.pop()
+        for line in lines:
+            self._add_line(name, line)
+
+    def flush(self):
+        """Write out all the complete lines collected so far"""
+        if not self._batch:
+            return
+        stream = self._stream or sys.stdout
+        stream.write(''.join(self._batch))
+        stream.flush()
+        self._batch = []
+        self._batch_len = 0
+
+    def close(self):
+        """Read all job pipes to their end and write out what is left"""
+        while self._sources:
+            self.poll(timeout=None)
+        for name in list(self._partial):
+            self._end(name)
+        self.flush()
+
+    def _read(self, fd):
+        name = self._sources[fd]
+        data = os.read(fd, READ_SIZE)
+        if data:
+            self.feed(name, data)
+        else:
+            os.close(fd)
+            del self._sources[fd]
+            self._end(name)
+
+    def _end(self, name):
+        """Write out the last partial line of a job that ended"""
+        partial = self._partial.pop(name, '')
+        if partial:
+            self._add_line(name, partial)
+
+    def _add_line(self, name, line):
+        prefix = '[{0}] '.format(name)
+        if not line.startswith(prefix):
+            line = prefix + line
+        self._batch.append(line + '\n')
+        self._batch_len += len(line) + 1
+        if self._batch_len >= self._batch_size:
+            self.flush()
@@ -1,13 +1,52 @@
 #!/usr/bin/env python
 #
-from functools import wraps
+from collections import OrderedDict
+from functools import wraps, partial
+from threading import Lock
 
+import pycurl
+import ovirtsdk.api
 from ovirtsdk.api import API as oVirtApi
+from ovirtsdk.infrastructure.connectionspool import ConnectionsPool
+from ovirtsdk.infrastructure.context import context as ovirt_context
 from ovirtsdk.infrastructure.errors import RequestError as oVirtReqErr
 
 from fabric.api import env
 from fabric.utils import abort
 from fabric_ovirt.lib.utils import TTY, puts
+from fabric_ovirt.lib.session_cache import SessionCache, DEFAULT_TTL
+from fabric_ovirt.lib.client_pool import ClientPool
+from fabric_ovirt.lib.object_cache import ObjectCache
+from fabric_ovirt.lib.batch_loader import BatchLoader
+from fabric_ovirt.lib.state_waiter import StateWaiter
+from fabric_ovirt.lib.event_tracker import EventTracker
+from fabric_ovirt.lib.ovirt_query import (
+    iter_query,
+    PAGE_SIZE,
+    get_obj_attr,
+    get_field,
+    table_format,
+    table_rows,
+)
+
+#: How many oVirt API clients env.ovirt_pool creates by default
+POOL_SIZE = 4
+
+#: The width of the engine column of tables of objects from many engines
+ENGINE_FIELD_WIDTH = 30
+
+# Held while creating oVirt API objects, see _new_api
+_NEW_API_LOCK = Lock()
+
+#: The oVirt object types that events refer to, and the event attributes that
+#: refer to them
+EVENT_REFS = dict(
+    vm='vm',
+    template='template',
+    host='host',
+    cluster='cluster',
+    storagedomain='storage_domain',
+)
 
 
 def input_if_tty(prompt, err_msg):
@@ -95,6 +134,16 @@ def ovirt_task(func):
     The resulting function will accept 4 named parameters for specifying
     connection details and will also fill in those arguments with default
     values from the environemnt.
+
+    env.ovirt_pool is also set to a ClientPool of up to env.ovirt_pool_size
+    (4 by default) more API objects connected with the same details, for
+    sending many independent requests concurrently. Objects returned by one
+    API object should not be used with another, get them again by ID instead.
+
+    env.ovirt_cache is set to an ObjectCache shared by all the tasks using the
+    same connection, for remembering clusters, storage domains, templates and
+    networks that were looked up. Code that changes such objects should
+    invalidate their kind.
     """
     @wraps(func)
     def newfunc(*args, **kwargs):
@@ -104,24 +153,242 @@ def ovirt_task(func):
             password=kwargs.pop('ovirt_pass'),
             insecure=kwargs.pop('ovirt_insecure'),
         )
+        if '|' in api_params['url']:
+            abort("This task can only work with one oVirt engine at a time")
         if (
             'ovirt_connection' not in env or
             env.ovirt_connection_params != api_params
         ):
             try:
-                env.ovirt_connection = oVirtApi(**api_params)
+                env.ovirt_connection = connect(**api_params)
             except oVirtReqErr as e:
                 abort(
                     "Failed to connect to oVirt\nstatus={0}\nreason={1}"
                     .format(e.status, e.reason)
                 )
             env.ovirt_connection_params = api_params
+            env.ovirt_pool = ClientPool(
+                partial(connect, **api_params),
+                int(env.get('ovirt_pool_size', POOL_SIZE)),
+            )
+            env.ovirt_cache = ObjectCache()
         kwargs['ovirt'] = env.ovirt_connection
         return func(*args, **kwargs)
 
     return ovirt_defaults(newfunc)
 
 
+def ovirt_engines_task(func):
+    """
+    Decorator like ovirt_task for tasks that can work with many oVirt engines
+
+    The engine URL can be a pipe (|) separated list of engine URLs, which are
+    all connected to with the same credentials. The decorated function will
+    be passed 1 parameter called 'ovirts' that will contain an OrderedDict
+    mapping the engine URLs to connected oVirt API objects.
+    """
+    @wraps(func)
+    def newfunc(*args, **kwargs):
+        urls = kwargs.pop('ovirt_engine').split('|')
+        api_params = dict(
+            username=kwargs.pop('ovirt_user'),
+            password=kwargs.pop('ovirt_pass'),
+            insecure=kwargs.pop('ovirt_insecure'),
+        )
+        try:
+            kwargs['ovirts'] = engine_connections(urls, **api_params)
+        except oVirtReqErr as e:
+            abort(
+                "Failed to connect to oVirt\nstatus={0}\nreason={1}"
+                .format(e.status, e.reason)
+            )
+        return func(*args, **kwargs)
+
+    return ovirt_defaults(newfunc)
+
+
+def engine_connections(urls, **api_params):
+    """
+    Connect to many oVirt engines
+
+    Connections are kept in env.ovirt_connections and reused by later calls.
+    They are made one at a time since connect() serialises creating API
+    objects anyway.
+
+    :param list urls:  The engine URLs
+    :param api_params: More parameters for connect, like the credentials
+    :returns: A mapping of the URLs to connected oVirt API objects
+    :rtype: OrderedDict
+    """
+    connections = env.setdefault('ovirt_connections', {})
+    keys = [
+        (url,) + tuple(sorted(api_params.iteritems())) for url in urls
+    ]
+    for key in keys:
+        if key not in connections:
+            connections[key] = connect(url=key[0], **api_params)
+    return OrderedDict((key[0], connections[key]) for key in keys)
+
+
+def connect(url, username, password, **kwargs):
+    """
+    Connect to oVirt, reusing the session of an earlier connection with the
+    same URL, user and password if it is still valid, even if it was made by
+    another process
+
+    Sessions are used for env.ovirt_session_ttl seconds (20 minutes by
+    default) since they were last used to connect, which should be shorter
+    then the engine session timeout. If the engine rejects a cached session
+    when connecting, we forget it and log in again. A session that expires
+    after connecting is not renewed, the engine only drops sessions that are
+    not used for longer then its timeout.
+
+    :param str url:      The oVirt engine API URL
+    :param str username: The user name
+    :param str password: The password
+    :param kwargs:       More parameters for the oVirt API object
+    :rtype: oVirtApi
+    """
+    cache = SessionCache(
+        url, username, password,
+        int(env.get('ovirt_session_ttl', DEFAULT_TTL)),
+    )
+    api_params = dict(
+        url=url, username=username, password=password, **kwargs
+    )
+    api = None
+    cookie = cache.load()
+    if cookie:
+        try:
+            api = _new_api(api_params, cookie)
+        except oVirtReqErr as e:
+            if e.status != 401:
+                raise
+            cache.forget()
+    if api is None:
+        api = _new_api(api_params)
+    cookie = _session_cookie(api)
+    if cookie:
+        cache.save(cookie)
+    return api
+
+
+def _new_api(api_params, cookie=None):
+    """
+    Create an oVirt API object, optionally with a session cookie
+
+    The cookie is injected by having the SDK create its connections pool with
+    a function of ours. The SDK looks up the pool class in its module when
+    creating the API object, which also sends the first request, so API
+    objects are only created by one thread at a time, otherwise one could get
+    the cookie meant for another.
+    """
+    def make_pool(**kwargs):
+        pool = ConnectionsPool(**kwargs)
+        # With a session cookie the SDK stops sending the credentials
+        pool._ConnectionsPool__curl.setopt(pycurl.COOKIELIST, cookie)
+        return pool
+
+    with _NEW_API_LOCK:
+        if cookie is None:
+            return oVirtApi(**api_params)
+        ovirtsdk.api.ConnectionsPool = make_pool
+        try:
+            return oVirtApi(**api_params)
+        finally:
+            ovirtsdk.api.ConnectionsPool = ConnectionsPool
+
+
+def _session_cookie(api):
+    try:
+        curl = ovirt_context.manager[api.id].get('proxy')._Proxy__pool \
+            ._ConnectionsPool__curl
+    except AttributeError:
+        # Not the SDK version we know how to get the session from
+        return None
+    for cookie in curl.getinfo(pycurl.INFO_COOKIELIST):
+        if cookie.split('\t')[5] == 'JSESSIONID':
+            return cookie
+    return None
+
+
+def id_loader(collection):
+    """
+    Get a BatchLoader for looking up objects of an oVirt API collection by ID
+
+    Objects are looked up with one 'id=a or id=b or ...' search per batch of
+    IDs, objects the search does not find are looked up by ID one by one.
+
+    :param collection: An oVirt API collection, like ovirt.vms
+    :rtype: BatchLoader
+    """
+    return BatchLoader(
+        search=lambda ids: collection.list(
+            query=' or '.join('id={0}'.format(id) for id in ids),
+            max=len(ids),
+        ),
+        fallback=lambda id: collection.get(id=id),
+    )
+
+
+def state_waiter(collection, **kwargs):
+    """
+    Get a StateWaiter for objects of an oVirt API collection
+
+    The objects are waited for by ID, and the states of all of them are
+    polled with one batched search, see id_loader. Objects that are not found
+    have the state None.
+
+    :param collection: An oVirt API collection, like ovirt.vms
+    :param kwargs:     More parameters for StateWaiter, like max_delay or a
+                       tracker made with event_tracker
+    :rtype: StateWaiter
+    """
+    def poll(ids):
+        objs = id_loader(collection).load_many(ids)
+        return dict(
+            (id, get_field(obj, 'status.state', {}))
+            for id, obj in zip(ids, objs) if obj is not None
+        )
+
+    return StateWaiter(poll, **kwargs)
+
+
+def newest_event_id(ovirt):
+    """
+    Get the ID of the newest event logged by an oVirt engine
+
+    :param oVirtApi ovirt: a connected oVirt API object
+    :returns: The event ID, 0 if there are no events
+    :rtype: int
+    """
+    events = ovirt.events.list(max=1)
+    return int(events[0].id) if events else 0
+
+
+def event_tracker(ovirt):
+    """
+    Get an EventTracker following the events of an oVirt engine, events are
+    considered to refer to the IDs of the objects in their EVENT_REFS
+    attributes
+
+    :param oVirtApi ovirt: a connected oVirt API object
+    :rtype: EventTracker
+    """
+    def fetch(last_event_id):
+        if last_event_id is None:
+            return ovirt.events.list(max=1)
+        return ovirt.events.list(from_event_id=last_event_id)
+
+    def refs(event):
+        for attr in EVENT_REFS.itervalues():
+            ref = get_obj_attr(event, attr)
+            if ref is not None and ref.id:
+                yield ref.id
+
+    return EventTracker(fetch, refs)
+
+
 class oVirtObjectType(object):
     """Class for desbribing oVirt object types and performing generic operations
     on them
@@ -160,35 +427,49 @@ class oVirtObjectType(object):
         """
         Print a table of oVirt objects of the type from the passed list
 
-        :param iterable obj_list: The list of objects to print as a talbe
+        :param iterable obj_list: The list of objects to print as a talbe, can
+                                  be a generator, each row is printed as soon
+                                  as its object is generated
         :param str show: A colon (:) separated list of object fields to show,
-                         will fallback to self.default_fields if unspecified
+                         will fallback to self.default_fields if unspecified.
+                         Nested fields like 'status.state' can also be
+                         shown, as well as 'engine' for objects from many
+                         engines
 
         See the 'query' task for description of other parameters
         """
         show = show or self.default_fields
-        format_str = ' '.join(
-            '{{{0}:{1}}}'.format(field, max(self.fields[field], len(field)))
-            for field in show.split(':')
-            if field in self.fields
+        format_str, columns = table_format(
+            dict(self.fields, engine=ENGINE_FIELD_WIDTH), show
         )
         if headers == 'yes':
             puts(format_str.format(
-                **dict((field, field.upper()) for field in self.fields)
-            ).rstrip())
-        for obj in obj_list:
-            puts(format_str.format(
-                **dict((field, getattr(obj, field)) for field in self.fields)
+                *(field.upper() for field in columns)
             ).rstrip())
+        for row in table_rows(obj_list, format_str, columns):
+            puts(row)
+
+    def mirror_record(self, obj):
+        """
+        Get the fields of an oVirt object of the type to keep in the local
+        mirror, see lib.ovirt_mirror
+
+        :param obj: The oVirt object
+
+        :returns: A dict mapping field paths to values
+        :rtype: dict
+        """
+        memo = {}
+        return dict(
+            (field, get_field(obj, field, memo))
+            for field in list(self.fields) + ['status.state']
+        )
 
     def _get_obj_attr(self, obj, field):
         """
         Get an attribute of an oVirt object
         """
-        if hasattr(obj, field):
-            return getattr(obj, field)
-        elif hasattr(obj, 'get_' + field):
-            return getattr(obj, 'get_' + field)()
+        return get_obj_attr(obj, field)
 
     def query(self, ovirt, oquery):
         """
@@ -200,8 +481,23 @@ class oVirtObjectType(object):
         :returns: a List of oVirt obejcts matching the query
         :rtype: list
         """
-        obj_api = getattr(ovirt, self.plural)
-        return obj_api.list(oquery)
+        return list(self.iter_query(ovirt, oquery))
+
+    def iter_query(self, ovirt, oquery, limit=None):
+        """
+        Query oVirt for objects of the type, fetching them a page of
+        env.ovirt_page_size (100 by default) objects at a time
+
+        :param oVirtApi ovirt: a connected oVirt API object
+        :param str oquery: a query string to pass to oVirt
+        :param int limit: the most objects to fetch, all if None
+
+        :returns: generator of the oVirt obejcts matching the query
+        """
+        return iter_query(
+            getattr(ovirt, self.plural).list, oquery,
+            page_size=env.get('ovirt_page_size', PAGE_SIZE), limit=limit,
+        )
 
 
 oVirtObjectType(
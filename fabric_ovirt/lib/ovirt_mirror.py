@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+"""ovirt_mirror.py - A local SQLite copy of the oVirt inventory
+
+Objects are stored with the fields we know how to show for their type, and
+can be searched with a subset of the engine search syntax, for example:
+
+    name=web* and status=up or memory=2147483648
+
+Conditions compare a field to a value with '=' or '!=', where '*' in the
+value matches anything. Conditions are combined with 'and' and 'or', where
+'and' binds tighter. Like in the engine, matching ignores case.
+"""
+import re
+import json
+import sqlite3
+from hashlib import sha1
+
+from fabric_ovirt.lib.utils import cache_path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    type TEXT NOT NULL,
+    id TEXT NOT NULL,
+    name TEXT COLLATE NOCASE,
+    data TEXT NOT NULL,
+    PRIMARY KEY (type, id)
+);
+CREATE TABLE IF NOT EXISTS fields (
+    type TEXT NOT NULL,
+    id TEXT NOT NULL,
+    field TEXT NOT NULL,
+    value TEXT COLLATE NOCASE,
+    PRIMARY KEY (type, id, field)
+);
+CREATE INDEX IF NOT EXISTS fields_value ON fields (type, field, value);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+#: Search field names that are stored under another name
+FIELD_ALIASES = {'status': 'status.state'}
+
+CONDITION_RE = re.compile(r'^([\w.]+)\s*(!=|=)\s*(.*)$')
+JOINER_RE = re.compile(r'\s+(and|or)\s+', re.IGNORECASE)
+
+
+class MirroredObject(object):
+    """An object read from the mirror, with its fields as attributes
+    """
+    def __init__(self, data):
+        """
+        :param dict data: The object fields, nested dicts become nested
+                          objects
+        """
+        for field, value in data.iteritems():
+            if isinstance(value, dict):
+                value = MirroredObject(value)
+            setattr(self, field, value)
+
+
+class Mirror(object):
+    """The mirrored inventory of an oVirt engine
+    """
+    def __init__(self, url, path=None):
+        """
+        :param str url:  The engine URL
+        :param str path: The database file, by default it is kept in the
+                         cache directory
+        """
+        self.path = path or cache_path(
+            'mirror', sha1(url).hexdigest() + '.sqlite'
+        )
+        self._db = sqlite3.connect(self.path)
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    def store(self, ootype, records, replace=False):
+        """Store objects in the mirror
+
+        :param str ootype:       The object type
+        :param Iterable records: Dicts mapping field paths like 'name' or
+                                 'status.state' to values, must include 'id'
+        :param bool replace:     If True, remove the mirrored objects of the
+                                 type that are not in 'records'
+        :returns: How many objects were stored
+        :rtype: int
+        """
+        stored = 0
+        with self._db:
+            if replace:
+                self._db.execute(
+                    'CREATE TEMP TABLE IF NOT EXISTS seen (id TEXT)'
+                )
+                self._db.execute('DELETE FROM seen')
+            for record in records:
+                oid = str(record['id'])
+                self._delete(ootype, [oid])
+                self._db.execute(
+                    'INSERT INTO objects (type, id, name, data) '
+                    'VALUES (?, ?, ?, ?)',
+                    (ootype, oid, record.get('name'), json.dumps(
+                        _nest(record), default=unicode
+                    )),
+                )
+                self._db.executemany(
+                    'INSERT INTO fields (type, id, field, value) '
+                    'VALUES (?, ?, ?, ?)',
+                    (
+                        (ootype, oid, field, unicode(value))
+                        for field, value in record.iteritems()
+                        if value is not None
+                    ),
+                )
+                if replace:
+                    self._db.execute('INSERT INTO seen VALUES (?)', (oid,))
+                stored += 1
+            if replace:
+                for table in ('objects', 'fields'):
+                    self._db.execute(
+                        'DELETE FROM {0} WHERE type = ? AND id NOT IN '
+                        '(SELECT id FROM seen)'.format(table),
+                        (ootype,),
+                    )
+        return stored
+
+    def delete(self, ootype, ids):
+        """Remove objects from the mirror
+
+        :param str ootype:    The object type
+        :param Iterable ids: The IDs of the objects
+        """
+        with self._db:
+            self._delete(ootype, [str(oid) for oid in ids])
+
+    def _delete(self, ootype, ids):
+        for table in ('objects', 'fields'):
+            self._db.executemany(
+                'DELETE FROM {0} WHERE type = ? AND id = ?'.format(table),
+                ((ootype, oid) for oid in ids),
+            )
+
+    def get_state(self, key, default=None):
+        """Get a value remembered with set_state
+        """
+        row = self._db.execute(
+            'SELECT value FROM state WHERE key = ?', (key,)
+        ).fetchone()
+        return default if row is None else json.loads(row[0])
+
+    def set_state(self, key, value):
+        """Remember a value in the mirror, like when it was last synced
+
+        :param str key: The value name
+        :param value:   A value that can be stored as JSON
+        """
+        with self._db:
+            self._db.execute(
+                'INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)',
+                (key, json.dumps(value)),
+            )
+
+    def search(self, ootype, oquery='', limit=None):
+        """Search for mirrored objects
+
+        :param str ootype: The object type
+        :param str oquery: The search query, see the module documentation
+        :param int limit:  The most objects to return, all if None
+        :raises ValueError: If the query cannot be parsed
+        :returns: generator of MirroredObject objects, ordered by name
+        """
+        where, params = parse_query(ootype, oquery)
+        sql = 'SELECT data FROM objects WHERE type = ?'
+        if where:
+            sql += ' AND ({0})'.format(where)
+        sql += ' ORDER BY name, id'
+        if limit is not None:
+            sql += ' LIMIT {0:d}'.format(int(limit))
+        return (
+            MirroredObject(json.loads(row[0]))
+            for row in self._db.execute(sql, [ootype] + params)
+        )
+
+
+def parse_query(ootype, oquery):
+    """Translate a search query to an SQL condition on the objects table
+
+    :param str ootype: The object type
+    :param str oquery: The search query, see the module documentation
+    :raises ValueError: If the query cannot be parsed
+    :returns: The SQL condition (empty for an empty query) and its parameters
+    :rtype: tuple
+    """
+    oquery = (oquery or '').strip()
+    if not oquery:
+        return '', []
+    parts = JOINER_RE.split(oquery)
+    sql = []
+    params = []
+    for i, part in enumerate(parts):
+        if i % 2:
+            sql.append(part.upper())
+            continue
+        match = CONDITION_RE.match(part.strip())
+        if not match:
+            raise ValueError(
+                "Unsupported condition in mirror query: '{0}'".format(part)
+            )
+        field, operator, value = match.groups()
+        field = field.lower()
+        value = value.strip().strip('"')
+        sql.append(
+            'id {0} (SELECT id FROM fields WHERE type = ? AND field = ? '
+            "AND value LIKE ? ESCAPE '\\')".format(
+                'NOT IN' if operator == '!=' else 'IN'
+            )
+        )
+        params.extend((
+            ootype, FIELD_ALIASES.get(field, field), _like_pattern(value)
+        ))
+    return ' '.join(sql), params
+
+
+def _like_pattern(value):
+    return re.sub(r'([\\%_])', r'\\\1', value).replace('*', '%')
+
+
+def _nest(record):
+    nested = {}
+    for path, value in record.iteritems():
+        parts = path.split('.')
+        target = nested
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        target[parts[-1]] = value
+    return nested
@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+"""ovirt_query.py - Helpers for querying oVirt that do not need the oVirt SDK
+"""
+import re
+from itertools import count, islice
+from multiprocessing.pool import ThreadPool
+from urlparse import urlparse
+
+#: How many objects to ask the engine for at a time
+PAGE_SIZE = 100
+
+#: The width of table columns of nested fields like 'status.state'
+NESTED_FIELD_WIDTH = 20
+
+#: What to sort paged results by when the query does not say, without it
+#: the engine may return objects in a different order for every page
+SORT_BY = 'name'
+
+PAGE_RE = re.compile(r'(^|\s)page\s+\d+\s*$', re.IGNORECASE)
+SORTBY_RE = re.compile(r'(^|\s)sortby\s', re.IGNORECASE)
+
+
+def iter_query(list_func, oquery='', page_size=PAGE_SIZE, limit=None,
+               sort_by=SORT_BY):
+    """
+    Generate the results of an oVirt search, fetching them a page at a time
+
+    :param callable list_func: The list method of an oVirt API collection
+    :param str oquery:         The oVirt engine query to run, if it already
+                               selects a page with 'page N' only that page is
+                               fetched
+    :param int page_size:      How many objects to fetch at a time
+    :param int limit:          The most objects to fetch, all if None
+    :param str sort_by:        What to sort by if the query has no 'sortby',
+                               so pages do not overlap or skip objects
+
+    :returns: generator of the found objects
+    """
+    oquery = (oquery or '').strip()
+    if sort_by and not SORTBY_RE.search(oquery):
+        page_match = PAGE_RE.search(oquery)
+        at = page_match.start() if page_match else len(oquery)
+        oquery = ' '.join(part for part in (
+            oquery[:at].strip(), 'sortby ' + sort_by, oquery[at:].strip()
+        ) if part)
+    page_size = int(page_size)
+    if limit is not None:
+        limit = int(limit)
+        if limit <= 0:
+            return
+        page_size = min(page_size, limit)
+    if PAGE_RE.search(oquery):
+        pages = [list_func(query=oquery, max=page_size)]
+    else:
+        pages = (
+            list_func(
+                query='{0} page {1}'.format(oquery, page).lstrip(),
+                max=page_size,
+            )
+            for page in count(1)
+        )
+    fetched = 0
+    for objs in pages:
+        for obj in objs:
+            yield obj
+            fetched += 1
+            if fetched == limit:
+                return
+        if len(objs) < page_size:
+            return
+
+
+def get_obj_attr(obj, field):
+    """
+    Get an attribute of an oVirt object
+
+    :param object obj: The oVirt object
+    :param str field:  The attribute name, if the object has no such attribute
+                       its 'get_<field>' method is called instead
+
+    :returns: The attribute value or None if the object has no such attribute
+    """
+    if hasattr(obj, field):
+        return getattr(obj, field)
+    elif hasattr(obj, 'get_' + field):
+        return getattr(obj, 'get_' + field)()
+
+
+def get_field(obj, path, memo):
+    """
+    Get a possibly nested field of an oVirt object, like 'status.state'
+
+    :param object obj: The oVirt object
+    :param str path:   A dot (.) separated path of attributes
+    :param dict memo:  Already resolved paths of the same object, resolved
+                       paths are added to it so fields with a common prefix
+                       only resolve the prefix once
+
+    :returns: The field value or None if any attribute along the path is
+              missing
+    """
+    if path in memo:
+        return memo[path]
+    parent_path, _, name = path.rpartition('.')
+    parent = get_field(obj, parent_path, memo) if parent_path else obj
+    value = None if parent is None else get_obj_attr(parent, name)
+    memo[path] = value
+    return value
+
+
+def table_format(fields, show, nested_width=NESTED_FIELD_WIDTH):
+    """
+    Get the row format of a table of oVirt objects
+
+    :param dict fields:      A mapping of known field names to the cell width
+                             their values need
+    :param str show:         A colon (:) separated list of fields to show,
+                             unknown fields are skipped unless they are nested
+                             paths like 'status.state'
+    :param int nested_width: The cell width of nested fields that are not in
+                             'fields'
+
+    :returns: The format string, taking the field values as positional
+              arguments, and the list of fields it shows
+    :rtype: tuple
+    """
+    columns = [
+        field for field in show.split(':')
+        if field in fields or '.' in field
+    ]
+    format_str = ' '.join(
+        '{{{0}:{1}}}'.format(
+            i, max(fields.get(field, nested_width), len(field))
+        )
+        for i, field in enumerate(columns)
+    )
+    return format_str, columns
+
+
+def table_rows(obj_list, format_str, columns):
+    """
+    Format table rows of oVirt objects, resolving only the shown fields
+
+    :param Iterable obj_list: The objects
+    :param str format_str:    The row format, see table_format
+    :param list columns:      The fields shown, see table_format
+
+    :returns: generator of the formatted rows
+    """
+    for obj in obj_list:
+        memo = {}
+        yield format_str.format(
+            *(get_field(obj, field, memo) for field in columns)
+        ).rstrip()
+
+
+class EngineObject(object):
+    """An oVirt object along with the name of the engine it came from, all
+    other attributes are the ones of the object
+    """
+    def __init__(self, obj, engine):
+        """
+        :param object obj: The oVirt object
+        :param str engine: The engine name
+        """
+        self.__dict__['_obj'] = obj
+        self.__dict__['engine'] = engine
+
+    def __getattr__(self, name):
+        return getattr(self._obj, name)
+
+
+def engine_name(url):
+    """
+    Get a short name for an oVirt engine to show with objects it returned
+
+    The name includes the port and path of the URL, so engines sharing a host
+    get different names.
+
+    :param str url: The engine URL
+    :rtype: str
+    """
+    parsed = urlparse(url)
+    name = parsed.netloc.rpartition('@')[2] + parsed.path.rstrip('/')
+    return name or url
+
+
+def iter_federated(engines, query_func, limit=None):
+    """
+    Run a query on many oVirt engines at the same time and generate the
+    results of all of them, the results of each engine are generated as soon
+    as the engine and the ones before it are done
+
+    :param list engines:        Pairs of an engine name and a connected oVirt
+                                API object
+    :param callable query_func: Called with an API object to run the query,
+                                returns the found objects
+    :param int limit:           The most objects to generate, all if None
+
+    :returns: generator of EngineObject objects
+    """
+    engines = list(engines)
+    if not engines:
+        return iter(())
+
+    def run_query(engine):
+        name, api = engine
+        return [EngineObject(obj, name) for obj in query_func(api)]
+
+    def results():
+        pool = ThreadPool(len(engines))
+        try:
+            for objs in pool.imap(run_query, engines):
+                for obj in objs:
+                    yield obj
+        finally:
+            pool.terminate()
+
+    return islice(results(), None if limit is None else int(limit))
@@ -14,12 +14,19 @@ import sys
 
 from fabric.network import ssh
 from fabric.context_managers import settings
+from fabric.state import env
 
+from fabric_ovirt.lib.output_mux import OutputMux
+from fabric_ovirt.lib.host_logs import RunLogDir
+from fabric_ovirt.lib.timing import TIMINGS, timing_enabled
+from fabric_ovirt.lib.fingerprints import FAILED_HOSTS
+from fabric_ovirt.lib.host_groups import GroupScheduler
 from fabric_ovirt.lib.utils import (
     red,
     green,
     yellow,
     white,
+    is_true,
 )
 
 
@@ -55,16 +62,30 @@ def run(self):
         job = self._queued.pop()
         if self._debug:
             print("Popping '%s' off the queue and starting it", job.name)
+        if timing_enabled():
+            _send_timings(job, self._comms_queue)
         with settings(clean_revert=True, host_string=job.name, host=job.name):
-            job.start()
+            if self._logs is not None:
+                self._logs.start(job)
+            elif self._output is not None:
+                self._output.start(job)
+            else:
+                job.start()
         self._running.append(job)
         self._status()
 
     self._time_start = time.time()
+    self._output = self._logs = None
+    if env.get('host_logs'):
+        self._logs = RunLogDir(env.host_logs, _jobs_command(self._queued))
+    elif is_true(str(env.get('output_mux', True))):
+        self._output = OutputMux()
     # Prep return value so we can start filling it during main loop
     results = {}
     for job in self._queued:
         results[job.name] = dict.fromkeys(('exit_code', 'results'))
+    # Only hand out jobs of host groups that are below their limits
+    self._queued = GroupScheduler(self._queued, env.get('host_groups'))
 
     if not self._closed:
         raise Exception("Need to close() before starting.")
@@ -72,13 +93,13 @@ def run(self):
     if self._debug:
         print("Job queue starting.")
 
-    while len(self._running) < self._max:
+    while len(self._running) < self._max and self._queued.ready():
         _advance_the_queue(self)
     self._status()
 
     # Main loop!
     while not self._finished:
-        while len(self._running) < self._max and self._queued:
+        while len(self._running) < self._max and self._queued.ready():
             _advance_the_queue(self)
 
         if not self._all_alive():
@@ -90,6 +111,7 @@ def run(self):
                             job.name
                         )
                     done = self._running.pop(job_id)
+                    self._queued.done(done)
                     self._completed.append(done)
 
             if self._debug:
@@ -106,11 +128,20 @@ def run(self):
 
         # Each loop pass, try pulling results off the queue to keep its
         # size down.
-        self._fill_results(results)
+        if self._output is not None:
+            # Don't block on the queue while the jobs may be blocked on
+            # writing their output, polling the output pipes does the sleeping
+            self._fill_results(results, timeout=0)
+            self._output.poll(ssh.io_sleep)
+            self._output.flush()
+        else:
+            self._fill_results(results)
+            time.sleep(ssh.io_sleep)
 
         self._status()
-        time.sleep(ssh.io_sleep)
 
+    if self._output is not None:
+        self._output.close()
     self._status()
     # Consume anything left in the results queue
     self._fill_results(results)
@@ -124,11 +155,39 @@ def run(self):
             or isinstance(results[job.name]['results'], Exception)
         ):
             self._errors += 1
+            FAILED_HOSTS.add(job.name)
 
+    if self._logs is not None:
+        self._logs.write_index(results)
     self._status(results, final=True)
     return results
 
 
+def _send_timings(job, queue):
+    """
+    Make a job send the timing records it collects back over the comms queue
+    """
+    target = job._target
+
+    def new_target(*args, **kwargs):
+        # Drop records inherited from the parent process
+        TIMINGS.clear()
+        try:
+            return target(*args, **kwargs)
+        finally:
+            queue.put({'name': job.name, 'timings': TIMINGS.records})
+
+    job._target = new_target
+
+
+def _jobs_command(jobs):
+    """
+    Get the name of the task the given fabric-created jobs are running
+    """
+    for job in jobs:
+        return getattr(job, '_kwargs', {}).get('env', {}).get('command')
+
+
 def _status(self, results=None, final=False):
     if not final:
         new = (
@@ -164,17 +223,28 @@ def _status(self, results=None, final=False):
                     or isinstance(results[job.name]['results'], Exception)
                 ):
                     print(red(job.name))
+        if self._logs is not None:
+            print("Host logs written to: %s" % self._logs.path)
     sys.stdout.flush()
 
 
-def _fill_results(self, results):
+def _fill_results(self, results, timeout=1):
     """
     Attempt to pull data off self._comms_queue and add to 'results' dict.
+
+    :param int timeout: How long to wait for data to show up, 0 to stop as
+                        soon as the queue is empty
     """
     while True:
         try:
-            datum = self._comms_queue.get(timeout=1)
-            results[datum['name']]['results'] = datum['result']
+            if timeout:
+                datum = self._comms_queue.get(timeout=timeout)
+            else:
+                datum = self._comms_queue.get_nowait()
+            if 'timings' in datum:
+                TIMINGS.extend(datum['timings'])
+            else:
+                results[datum['name']]['results'] = datum['result']
         except Queue.Empty:
             break
 
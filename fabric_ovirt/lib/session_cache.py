@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""session_cache.py - Keep login sessions on disk so they can be reused by
+other processes
+
+Session tokens are as good as passwords while they are valid, so the cache
+files are only readable by their owner. Sessions are cached per password too,
+so a session is not handed out to someone who got the password wrong.
+"""
+import os
+import json
+import stat
+import time
+from hashlib import sha1
+
+from fabric_ovirt.lib.utils import cache_path
+
+#: How long (in seconds) a cached session is used for since it was last used
+DEFAULT_TTL = 20 * 60
+
+
+class SessionCache(object):
+    """The cached session of a user on a server
+    """
+    def __init__(self, url, username, password, ttl=DEFAULT_TTL):
+        """
+        :param str url:      The server URL
+        :param str username: The user name
+        :param str password: The password the user logs in with
+        :param int ttl:      How long (in seconds) a session is used for since
+                             it was last used, should be shorter then the
+                             server session timeout
+        """
+        key = sha1(u'{0}\0{1}\0{2}'.format(
+            url, username, password
+        ).encode('utf-8'))
+        self._path = cache_path('sessions', key.hexdigest() + '.json')
+        self._ttl = ttl
+        _restrict(os.path.dirname(self._path), stat.S_IRWXU)
+
+    def load(self):
+        """Get the cached session
+
+        :returns: The session token or None if there is no valid session
+        :rtype: str
+        """
+        try:
+            with open(self._path) as cache_file:
+                entry = json.load(cache_file)
+        except (IOError, ValueError):
+            return None
+        if entry.get('expires', 0) < time.time():
+            return None
+        return entry.get('token')
+
+    def save(self, token):
+        """Cache a session, or extend its expiry time if it is cached already
+
+        :param str token: The session token
+        """
+        entry = dict(token=token, expires=time.time() + self._ttl)
+        tmp_path = '{0}.{1}.tmp'.format(self._path, os.getpid())
+        fd = os.open(
+            tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+            stat.S_IRUSR | stat.S_IWUSR,
+        )
+        with os.fdopen(fd, 'w') as cache_file:
+            json.dump(entry, cache_file)
+        os.rename(tmp_path, self._path)
+
+    def forget(self):
+        """Remove the cached session, for example if the server rejected it
+        """
+        try:
+            os.unlink(self._path)
+        except OSError:
+            pass
+
+
+def _restrict(path, mode):
+    if stat.S_IMODE(os.stat(path).st_mode) != mode:
+        os.chmod(path, mode)
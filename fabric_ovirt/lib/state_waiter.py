@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+"""state_waiter.py - Wait for many objects to reach some states at once
+
+Instead of polling every object on its own, the states of all the objects
+being waited for are polled together, so every poll costs about the same no
+matter how many objects there are. Polls are made often while things change
+and less often when nothing does. Given an EventTracker, states are only
+polled when events are logged for the objects (or every max_delay seconds
+just in case), and polling falls back to the usual way if events turn out to
+be unavailable:
+
+    waiter = StateWaiter(poll_vm_states)
+    for vm in vms:
+        waiter.add(vm.id, 'down', callback=delete_vm)
+    not_done = waiter.wait(timeout=600)
+"""
+import time
+from threading import Lock
+
+
+class WaitHandle(object):
+    """Something StateWaiter waits for, tells if it is done yet
+    """
+    def __init__(self, key, target, callback):
+        self.key = key
+        self.target = target
+        self.callback = callback
+        #: The last state seen, None if the object was not found
+        self.state = None
+        #: True once the object reached its target state
+        self.done = False
+
+    def reached(self, state):
+        """Check if a state is the target state
+
+        :param state: The state
+        :rtype: bool
+        """
+        if callable(self.target):
+            return bool(self.target(state))
+        if isinstance(self.target, (list, tuple, set, frozenset)):
+            return state in self.target
+        return state == self.target
+
+
+class StateWaiter(object):
+    """Wait for many objects to reach target states
+    """
+    def __init__(
+        self, poll, min_delay=1, max_delay=30, backoff=2, tracker=None,
+        sleep=time.sleep, clock=time.time
+    ):
+        """
+        :param callable poll:    Called with a list of object keys, returns a
+                                 dict mapping the keys to the current states
+                                 of the objects. Objects that are not found
+                                 should be left out, their state is None
+        :param float min_delay:  The time to wait between polls while states
+                                 change
+        :param float max_delay:  The most time to wait between polls
+        :param float backoff:    What to multiply the time between polls by
+                                 when no state changed
+        :param EventTracker tracker: Tells which objects events were logged
+                                     for, checked as often as states would
+                                     be polled without it
+        :param callable sleep:   Called to wait between polls
+        :param callable clock:   Called to get the current time
+        """
+        self._poll = poll
+        self._min_delay = min_delay
+        self._max_delay = max(min_delay, max_delay)
+        self._backoff = backoff
+        self._sleep = sleep
+        self._clock = clock
+        self._tracker = tracker
+        self._pending = []
+        self._states = {}
+        self._lock = Lock()
+
+    def add(self, key, target, callback=None):
+        """Start waiting for an object, can be called from callbacks
+
+        :param key:             The object key, as passed to poll
+        :param target:          The target state, a collection of states, or
+                                a function returning True for target states
+        :param callable callback: Called with the WaitHandle once the object
+                                  reaches its target state
+        :rtype: WaitHandle
+        """
+        handle = WaitHandle(key, target, callback)
+        with self._lock:
+            self._pending.append(handle)
+        return handle
+
+    def wait(self, timeout=None):
+        """Wait until all the objects reached their target states
+
+        :param float timeout: The most time to wait, forever if None
+        :returns: The handles of the objects that did not reach their target
+                  states in time
+        :rtype: list
+        """
+        deadline = None if timeout is None else self._clock() + timeout
+        delay = None
+        if self._tracker is not None:
+            # Follow events from before the first poll so none are missed
+            self._tracker.start()
+        while True:
+            changed = self.poll()
+            with self._lock:
+                pending = list(self._pending)
+            if not pending:
+                return []
+            if deadline is not None and self._clock() >= deadline:
+                return pending
+            if self._tracker is not None and self._tracker.available:
+                delay = self._wait_for_events(deadline, delay)
+                continue
+            if changed or delay is None:
+                delay = self._min_delay
+            else:
+                delay = min(delay * self._backoff, self._max_delay)
+            if deadline is not None:
+                delay = min(delay, max(0, deadline - self._clock()))
+            self._sleep(delay)
+
+    def _wait_for_events(self, deadline, delay):
+        """Wait until events are logged for any of the pending objects, up to
+        max_delay seconds or until events turn out to be unavailable
+
+        The events feed is checked with the same backoff as states are polled
+        without it, so it costs no more requests than polling.
+
+        :param float delay: The last time waited between checks, None at first
+        :returns: The time to wait between the next checks
+        :rtype: float
+        """
+        delay = self._min_delay if delay is None else delay
+        waited = 0
+        while waited < self._max_delay:
+            wait = min(delay, self._max_delay - waited)
+            if deadline is not None:
+                wait = min(wait, deadline - self._clock())
+                if wait <= 0:
+                    return delay
+            self._sleep(wait)
+            waited += wait
+            changed = self._tracker.changed()
+            if changed is None:
+                return delay
+            with self._lock:
+                if any(handle.key in changed for handle in self._pending):
+                    return self._min_delay
+            delay = min(delay * self._backoff, self._max_delay)
+        return delay
+
+    def poll(self):
+        """Poll the states of the objects once and fire the callbacks of the
+        ones that reached their target states
+
+        :returns: True if the state of any object changed since the last poll
+        :rtype: bool
+        """
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return False
+        keys = list(set(handle.key for handle in pending))
+        states = self._poll(keys)
+        changed = False
+        for key in keys:
+            state = states.get(key)
+            if key in self._states and self._states[key] != state:
+                changed = True
+            self._states[key] = state
+        for handle in pending:
+            handle.state = states.get(handle.key)
+            if handle.reached(handle.state):
+                handle.done = True
+                if handle.callback is not None:
+                    handle.callback(handle)
+            else:
+                with self._lock:
+                    self._pending.append(handle)
+        return changed
@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+"""timing.py - Measure where the time of remote operations goes
+
+When 'timing' is set in the fabric env, the time spent connecting to hosts,
+opening channels and running remote commands is recorded per host and task,
+and a summary is printed when the run ends.
+"""
+import time
+import atexit
+import threading
+from functools import wraps
+from collections import defaultdict
+from contextlib import contextmanager
+from heapq import nlargest
+
+import paramiko
+import fabric.operations
+import fabric.sftp
+from fabric.state import env
+
+from fabric_ovirt.lib.utils import puts, is_true
+
+#: The phases we time, in the order they happen
+PHASES = (
+    'connect', 'handshake', 'auth', 'channel', 'sftp', 'exec', 'put', 'get',
+)
+
+
+def timing_enabled():
+    """Check if timing was requested in the fabric env"""
+    return is_true(str(env.get('timing', False)))
+
+
+class Timings(object):
+    """Collect timing records of (possibly nested) phases
+
+    Every record holds the exclusive time of a phase, so when a phase happens
+    inside another (like connecting to a host when the first command is run),
+    its time is not counted twice.
+    """
+    def __init__(self):
+        self.records = []
+        self._local = threading.local()
+
+    @contextmanager
+    def phase(self, name):
+        """Context manager for timing a phase
+
+        :param str name: The name of the phase, one of PHASES
+        """
+        stack = self._local.__dict__.setdefault('stack', [])
+        stack.append(0.0)
+        start = time.time()
+        try:
+            yield
+        finally:
+            elapsed = time.time() - start
+            nested = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            self.records.append(
+                (env.get('host_string'), env.get('command'), name,
+                 elapsed - nested)
+            )
+
+    def clear(self):
+        """Drop all collected records"""
+        self.records = []
+
+    def extend(self, records):
+        """Add records collected elsewhere (e.g. in a parallel job)"""
+        self.records.extend(records)
+
+    def report(self, top=20):
+        """Print per-task and per-host timing tables
+
+        :param int top: How many of the slowest hosts to show
+        """
+        by_task = _aggregate(self.records, key=lambda rec: rec[1])
+        by_host = _aggregate(self.records, key=lambda rec: rec[0])
+        puts('Timing per task (total seconds):')
+        _print_table('TASK', by_task, len(by_task))
+        puts('Timing of the {0} slowest hosts (total seconds):'.format(
+            min(top, len(by_host))
+        ))
+        _print_table('HOST', by_host, top)
+
+
+def _aggregate(records, key):
+    """Sum up phase times of records grouped by the given key function
+
+    :rtype: dict
+    :returns: A dict mapping group keys to dicts mapping phases to totals
+    """
+    totals = defaultdict(lambda: defaultdict(float))
+    for record in records:
+        totals[key(record)][record[2]] += record[3]
+    return totals
+
+
+def _print_table(title, totals, top):
+    rows = nlargest(top, totals.iteritems(), key=lambda i: sum(i[1].values()))
+    width = max([len(title)] + [len(str(name)) for name, _ in rows])
+    format_str = '{0:{1}} ' + ' '.join(
+        '{{{0}:>9}}'.format(i) for i in xrange(2, len(PHASES) + 3)
+    )
+    puts(format_str.format(
+        title, width, *(tuple(p.upper() for p in PHASES) + ('TOTAL',))
+    ))
+    for name, phases in rows:
+        puts(format_str.format(name, width, *tuple(
+            '{0:.2f}'.format(phases[p]) for p in PHASES
+        ) + ('{0:.2f}'.format(sum(phases.values())),)))
+
+
+#: The records of the current process
+TIMINGS = Timings()
+
+
+def _timed(phase, func):
+    """Wrap a function so calls to it are timed as the given phase
+
+    :param str phase:     The phase name
+    :param Callable func: The function to wrap
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if not timing_enabled():
+            return func(*args, **kwargs)
+        with TIMINGS.phase(phase):
+            return func(*args, **kwargs)
+    wrapper.timed = True
+    return wrapper
+
+
+def _patch(owner, attr, phase):
+    func = getattr(owner, attr)
+    if not getattr(func, 'timed', False):
+        setattr(owner, attr, _timed(phase, func))
+
+
+def _print_report():
+    if TIMINGS.records:
+        TIMINGS.report(top=int(env.get('timing_top', 20)))
+
+
+def instrument():
+    """Instrument paramiko and fabric to time remote operations
+
+    Nothing is recorded unless 'timing' is set in the fabric env, calling this
+    more then once does no harm
+    """
+    _patch(paramiko.SSHClient, 'connect', 'connect')
+    _patch(paramiko.SSHClient, '_auth', 'auth')
+    _patch(paramiko.Transport, 'start_client', 'handshake')
+    _patch(paramiko.Transport, 'open_session', 'channel')
+    _patch(fabric.sftp.SFTP, '__init__', 'sftp')
+    for attr in ('put', 'put_dir'):
+        _patch(fabric.sftp.SFTP, attr, 'put')
+    for attr in ('get', 'get_dir'):
+        _patch(fabric.sftp.SFTP, attr, 'get')
+    _patch(fabric.operations, '_run_command', 'exec')
+    if not getattr(instrument, 'registered', False):
+        atexit.register(_print_report)
+        instrument.registered = True
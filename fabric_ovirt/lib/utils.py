@@ -2,6 +2,7 @@
 # encoding: utf-8
 
 import datetime
+import os
 import sys
 import re
 import socket
@@ -28,6 +29,14 @@ import htmlentitydefs
 
 TTY = sys.stdout.isatty()
 TRUE = '(y.*|true|1)'
+#: Where cached data is kept unless 'cache_dir' is set in the env
+CACHE_DIR = '~/.cache/fabric-ovirt'
+#: Characters that make a glob pattern more then a literal string
+GLOB_MAGIC = re.compile(r'[*?[]')
+#: How many GlobMatcher objects glob_matcher keeps
+GLOB_CACHE_SIZE = 100
+
+_GLOB_MATCHERS = {}
 
 
 class CmdResponse():
@@ -248,20 +257,96 @@ def run_match(command, regexp, hide_out=True):
         return CmdResponse(out, False)
 
 
+class GlobMatcher(object):
+    """
+    Match strings against many glob patterns at once
+
+    Patterns without wildcards are looked up in a set, and all the others are
+    merged into a single compiled regex, so matcher objects should be kept
+    and reused when filtering many strings.
+    """
+    def __init__(self, patterns):
+        """
+        :param Iterable patterns: The glob patterns, a string matches if it
+                                  matches any of them
+        """
+        self.patterns = tuple(patterns)
+        self._literals = frozenset(
+            pattern for pattern in self.patterns
+            if not GLOB_MAGIC.search(pattern)
+        )
+        globs = [
+            pattern for pattern in self.patterns
+            if GLOB_MAGIC.search(pattern)
+        ]
+        self._regex = None
+        if globs:
+            self._regex = re.compile('|'.join(
+                '(?:%s)' % translate(pattern) for pattern in globs
+            ))
+
+    def match(self, what):
+        """
+        Check if a string matches any of the patterns
+
+        :param str what: The string to check
+        :rtype: bool
+        """
+        return what in self._literals or (
+            self._regex is not None and self._regex.match(what) is not None
+        )
+
+    __call__ = match
+
+    def ifilter(self, what_list):
+        """
+        Generate the strings that match any of the patterns
+
+        :param Iterable what_list: The strings to filter
+        """
+        literals = self._literals
+        regex_match = self._regex.match if self._regex else lambda what: None
+        for what in what_list:
+            if what in literals or regex_match(what) is not None:
+                yield what
+
+    def filter(self, what_list):
+        """
+        Get a list of the strings that match any of the patterns
+
+        :param Iterable what_list: The strings to filter
+        :rtype: list
+        """
+        return list(self.ifilter(what_list))
+
+
 def matches_glob(what, pattern):
-    return re.match(translate(pattern), what)
+    return glob_matcher((pattern,)).match(what)
 
 
 def ifilter_glob(what_list, patterns):
-    for what in what_list:
-        for pattern in patterns:
-            if matches_glob(what, pattern):
-                yield what
-                break
+    return glob_matcher(patterns).ifilter(what_list)
 
 
 def filter_glob(what_list, patterns):
-    return list(ifilter_glob(what_list, patterns))
+    return glob_matcher(patterns).filter(what_list)
+
+
+def glob_matcher(patterns):
+    """
+    Get a GlobMatcher for the given patterns, matchers are kept and reused
+    for the same patterns
+
+    :param Iterable patterns: The glob patterns
+    :rtype: GlobMatcher
+    """
+    patterns = tuple(patterns)
+    matcher = _GLOB_MATCHERS.get(patterns)
+    if matcher is None:
+        if len(_GLOB_MATCHERS) >= GLOB_CACHE_SIZE:
+            _GLOB_MATCHERS.clear()
+        matcher = _GLOB_MATCHERS[patterns] = GlobMatcher(patterns)
+    return matcher
 
 
 def assign_param(env_name, param_name=None, params=None, input_func=raw_input):
@@ -340,6 +425,24 @@ def split_host(host_str):
     return user, passwd, host
 
 
+def cache_path(*parts):
+    """
+    Get the path of a file under the cache directory, creating the directory
+    holding it if needed
+
+    :param parts: Path components relative to the cache directory
+    :return: The full path of the file
+    :rtype: str
+    """
+    path = os.path.join(
+        os.path.expanduser(env.get('cache_dir') or CACHE_DIR), *parts
+    )
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    return path
+
+
 def is_true(my_str):
     """
     Matches a string response (user restponse) with a boolean
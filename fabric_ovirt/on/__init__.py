@@ -6,17 +6,34 @@ from fabric.api import (
     serial,
     task,
     runs_once,
-    env,
 )
 
 from . import (  # noqa
+    changed,
     foreman,
+    group,
+    inventory,
+    ovirt,
     range,
 )
+from fabric_ovirt.lib.host_set import target_hosts
+from fabric_ovirt.lib.inventory import inventory as host_sets
 
 
 @task(default=True)
 @runs_once
 @serial
-def hosts(*args):
-    env.hosts.extend(args)
+def hosts(*args, **kwargs):
+    r"""
+    Use the given hosts as target hosts
+
+    :param \*args:
+        The hosts
+    :param into:
+        If given, put the hosts in a host set with this name instead of the
+        target hosts, see on.inventory
+    """
+    if kwargs.get('into'):
+        host_sets().define(kwargs['into'], lambda: args)
+    else:
+        target_hosts().extend(args)
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""
+This module allows running tasks only on the hosts that changed since the
+same tasks last ran on them successfully, like this:
+    on.foreman:hostgroup=web on.foreman.facts on.changed do.something
+"""
+from fabric.api import (
+    task,
+    runs_once,
+    serial,
+    env,
+    execute,
+)
+
+from fabric_ovirt.lib.facts import facts_of
+from fabric_ovirt.lib.fingerprints import (
+    facts_fingerprint,
+    remote_mtimes,
+    combine,
+    run_key,
+    FingerprintStore,
+    changed_hosts,
+    set_pending,
+)
+from fabric_ovirt.lib.host_set import HostSet
+from fabric_ovirt.lib.utils import yellow
+
+
+@task(default=True)
+@runs_once
+@serial
+def select(facts=None, files=None):
+    """
+    Keep only the target hosts that changed since the tasks that follow on
+    the command line (with the same arguments) last ran successfully on them
+
+    :param facts:
+        Semicolon separated names of the host facts to check, see
+        on.foreman.facts for loading them. All the loaded facts are checked
+        by default
+    :param files:
+        Semicolon separated paths of files to check the modification times
+        of on the hosts, not checked by default
+
+    Hosts that there is nothing known about are always kept. The
+    fingerprints of the hosts are recorded once all the tasks end
+    successfully, except for the hosts the tasks failed on (when running
+    with skip_bad_hosts or in parallel with warn_only).
+    """
+    fact_names = facts.split(';') if facts else None
+    hosts = list(env.hosts)
+    parts = dict((host, []) for host in hosts)
+    for host in hosts:
+        parts[host].append(facts_fingerprint(facts_of(host), fact_names))
+    if files and hosts:
+        mtimes = execute(remote_mtimes, files.split(';'), hosts=hosts)
+        for host in hosts:
+            mtime = mtimes.get(host)
+            parts[host].append(
+                mtime if isinstance(mtime, basestring) else None
+            )
+    fingerprints = dict(
+        (host, combine(host_parts)) for host, host_parts in parts.iteritems()
+    )
+    key = run_key(_following_tasks())
+    changed = set(changed_hosts(
+        fingerprints, FingerprintStore(key).load()
+    ))
+    set_pending(key, fingerprints)
+    env.hosts = HostSet(host for host in hosts if host in changed)
+    print(yellow("%d of %d hosts changed since the last run" % (
+        len(env.hosts), len(hosts)
+    )))
+
+
+def _following_tasks():
+    tasks = list(env.get('tasks') or [])
+    for i, name in enumerate(tasks):
+        if name.split(':', 1)[0] in ('on.changed', 'on.changed.select'):
+            return tasks[i + 1:]
+    return tasks
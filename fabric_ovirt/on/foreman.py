@@ -12,20 +12,18 @@ from fabric.api import (
     prompt,
 )
 
-from fabric_ovirt.lib.foreman import foreman_defaults
-from fabric_ovirt.lib.utils import (
-    yellow,
-    absolute_import,
+from fabric_ovirt.lib.foreman import (
+    foreman_defaults,
+    foreman_client,
+    iter_search,
+    get_facts,
 )
-
-
-# To avoid collisions with local module
-frm_cli = absolute_import('foreman.client', ['Foreman'])
-try:
-    # Hide ugly warning about no ssl cert verification
-    frm_cli.requests.packages.urllib3.disable_warnings()
-except AttributeError:
-    pass
+from fabric_ovirt.lib.facts import add_facts
+from fabric_ovirt.lib.foreman_cache import ForemanCache, DEFAULT_TTL
+from fabric_ovirt.lib.host_groups import host_groups
+from fabric_ovirt.lib.host_set import target_hosts
+from fabric_ovirt.lib.inventory import inventory
+from fabric_ovirt.lib.utils import yellow
 
 
 @task(default=True)
@@ -46,29 +44,134 @@ def search(firstcond='', sure='no', foreman=None, user=None, passwd=None,
         authenticate)
     :param password:
         Password to use when logging into foreman
+    :param group_by:
+        A field of the foreman host records to group the hosts by, for
+        example 'hostgroup_title', see on.group for what groups are for
+    :param group_limit:
+        How many hosts of each group can be worked on at the same time
+    :param cache:
+        How to use the local cache of search results, 'yes' to use results
+        that are younger then env.foreman_cache_ttl seconds (300 by default),
+        'refresh' to always update them from foreman, 'offline' to use them
+        without asking foreman at all and 'no' to not use the cache. Defaults
+        to env.foreman_cache or 'no'
+    :param into:
+        If given, put the hosts in a host set with this name instead of the
+        target hosts, the search only runs once the set is used, see
+        on.inventory
 
     You can specify multiple condition like strings or parameters, that means
     that passing *fab on.foreman:'name=cinteg'* as a not named parameter or
     setting *fab on.foreman:name=cinteg* are the same. Any foreman searchstr
-    string can be used. All the conditions will be agreggated with 'or'.
+    string can be used. All the conditions will be agreggated with 'or', many
+    conditions are split into smaller queries that run concurrently. The
+    group_by, group_limit, cache and into parameters can only be given by
+    name.
     """
+    group_by = kwconds.pop('group_by', None)
+    group_limit = kwconds.pop('group_limit', None)
+    cache = kwconds.pop('cache', None) or env.get('foreman_cache', 'no')
+    into = kwconds.pop('into', None)
     conds = list(conds)
     if sure not in ('yes', 'no'):
         conds.append(sure)
     if firstcond:
         conds.append(firstcond)
-    searchstr = ' or '.join(conds)
-    searchstr += ' or '.join('%s=%s' % item for item in kwconds.iteritems())
+    conds.extend('%s=%s' % item for item in kwconds.iteritems())
     if user:
         auth = (user, passwd)
     else:
         auth = None
-    frm = frm_cli.Foreman(foreman, auth, api_version=2)
-    for host in frm.index_hosts(search=searchstr, per_page=999).get('results'):
-        env.hosts.append(host['name'])
-    print(yellow("Query used: \n\t\"%s\"" % searchstr))
+
+    def fetch():
+        return _search_hosts(conds, foreman, auth, cache, group_by,
+                             group_limit)
+
+    if into:
+        inventory().define(into, fetch)
+        return
+    try:
+        hosts = fetch()
+    except (LookupError, ValueError) as e:
+        abort(str(e))
+    target_hosts().extend(hosts)
+    print(yellow("Query used: \n\t\"%s\"" % ' or '.join(conds)))
     print(yellow("Got %d hosts: \n\t" % len(env.hosts)
                  + '\n\t'.join(env.hosts)))
     if sure != 'yes' and not env.parallel:
         if prompt('Is what you expected? y|n', default='y').lower() == 'n':
             abort('Ended by user request.')
+
+
+def _search_hosts(conds, foreman, auth, cache, group_by, group_limit):
+    if cache == 'no':
+        records = iter_search(
+            foreman_client(foreman, auth).index_hosts, conds
+        )
+    else:
+        records = ForemanCache(
+            foreman, auth and auth[0],
+            int(env.get('foreman_cache_ttl', DEFAULT_TTL)),
+        ).search(
+            conds,
+            lambda: foreman_client(foreman, auth),
+            cache,
+        )
+    hosts = []
+    groups = {}
+    for host in records:
+        hosts.append(host['name'])
+        if group_by and host.get(group_by):
+            groups.setdefault(host[group_by], []).append(host['name'])
+    for group, group_hosts in groups.iteritems():
+        host_groups().add_hosts(group, group_hosts, group_limit)
+    return hosts
+
+
+#: The facts on.foreman.facts gets when not told which
+DEFAULT_FACTS = (
+    'operatingsystem',
+    'operatingsystemrelease',
+    'osfamily',
+    'interfaces',
+    'ipaddress',
+)
+
+
+@task
+@runs_once
+@serial
+@foreman_defaults
+def facts(*names, **kwargs):
+    r"""
+    Load the facts foreman has about the target hosts, so tasks can use them
+    instead of checking on the hosts themselves (see do.system.distro.get)
+
+    :param \*names:
+        The names of the facts to load, 'all' to load all of them. By default
+        the distro and network facts are loaded
+    :param foreman:
+        The foreman server url, like 'http://localhost:3000'
+    :param user:
+        Username to use when logging into foreman, default None (do not
+        authenticate)
+    :param password:
+        Password to use when logging into foreman
+
+    Use it after selecting the hosts, like *fab on.foreman:name~web
+    on.foreman.facts do.system.hostname:...*
+    """
+    if not names:
+        names = DEFAULT_FACTS
+    elif 'all' in names:
+        names = None
+    if kwargs['user']:
+        auth = (kwargs['user'], kwargs['passwd'])
+    else:
+        auth = None
+    frm = foreman_client(kwargs['foreman'], auth)
+    host_facts = get_facts(frm.index_fact_values, env.hosts, names)
+    add_facts(host_facts)
+    print(yellow("Got facts for %d of %d hosts" % (
+        len(host_facts), len(env.hosts)
+    )))
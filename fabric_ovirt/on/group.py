@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+"""
+This module allows limiting how many hosts of a group are worked on at the
+same time when running in parallel, for example:
+    on.group:web,web*.mydomain.com,www*.mydomain.com,limit=2
+"""
+from fabric.api import (
+    task,
+    runs_once,
+    serial,
+)
+
+from fabric_ovirt.lib.host_groups import host_groups
+
+
+@task(default=True)
+@runs_once
+@serial
+def pattern(name, *patterns, **kwargs):
+    r"""
+    Define a group of hosts by host name patterns
+
+    :param name:
+        The name of the group
+    :param \*patterns:
+        Glob patterns of host names that belong to the group
+    :param limit:
+        How many hosts of the group can be worked on at the same time, not
+        limited by default. The overall limit is still set by the -z option
+
+    Groups can also be created by the host selection tasks, see for example
+    the 'group_by' parameter of on.foreman.search
+    """
+    host_groups().add_patterns(name, patterns, kwargs.get('limit'))
+
+
+@task
+@runs_once
+@serial
+def limit(name, limit):
+    """
+    Set how many hosts of a group can be worked on at the same time
+
+    :param name:
+        The name of the group
+    :param limit:
+        The concurrency limit of the group
+    """
+    host_groups().set_limit(name, limit)
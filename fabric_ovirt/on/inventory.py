@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+"""
+This module allows combining named host sets, that were created by giving
+the 'into' parameter to other host selection tasks, like this:
+    on.foreman:hostgroup=web,into=web
+    on.ovirt.host:status=maintenance,into=maint
+    on.inventory:'web - maint'
+"""
+from fabric.api import (
+    task,
+    runs_once,
+    serial,
+    abort,
+)
+
+from fabric_ovirt.lib.inventory import inventory
+from fabric_ovirt.lib.host_set import target_hosts
+from fabric_ovirt.lib.utils import yellow
+
+
+@task(default=True)
+@runs_once
+@serial
+def select(expression):
+    """
+    Add the hosts resulting from a host set expression to the target hosts
+
+    :param expression:
+        The names of host sets combined with '|' (union), '&' (intersection)
+        and '-' (difference), evaluated from left to right unless parenthesis
+        are used. All the sets needed are fetched concurrently
+    """
+    try:
+        hosts = inventory().evaluate(expression)
+    except (LookupError, ValueError) as e:
+        abort(str(e))
+    target_hosts().extend(hosts)
+    print(yellow("Got %d hosts from: %s" % (len(hosts), expression)))
+
+
+@task
+@runs_once
+@serial
+def define(name, expression):
+    """
+    Define a host set as a combination of other host sets
+
+    :param name:
+        The name of the new set
+    :param expression:
+        The set expression, see on.inventory.select
+    """
+    try:
+        inventory().define_expression(name, expression)
+    except ValueError as e:
+        abort(str(e))
@@ -1,26 +1,53 @@
 #!/usr/bin/env python
 # encoding: utf-8
 #
+from collections import OrderedDict
+
 from fabric.api import task, env, prompt, abort, puts
 
-from fabric_ci.lib.utils import yellow
-from fabric_ci.lib.ovirt import ovirt_task, oVirtObjectType
+from fabric_ovirt.lib.utils import yellow
+from fabric_ovirt.lib.ovirt import ovirt_engines_task, oVirtObjectType
+from fabric_ovirt.lib.ovirt_query import engine_name, iter_federated
+from fabric_ovirt.lib.host_groups import host_groups
+from fabric_ovirt.lib.host_set import HostSet
+from fabric_ovirt.lib.inventory import inventory
 
 
 @task
-@ovirt_task
-def query(oquery='', sure='no', ovirt=None):
+@ovirt_engines_task
+def query(oquery='', sure='no', group_by=None, group_limit=None, into=None,
+          ovirts=None):
     """
     Query oVirt for hosts and place them in env.hosts
 
-    :param str oquery: The oVirt engine query to run. Engine wildards can be
-                       used. Make sure the escape equel signs (=) with
-                       backslash (\) when passing query from the command line.
-    :param str sure:   If set to `yes`, it will not ask for confirmation before
-                       running.
+    :param str oquery:      The oVirt engine query to run. Engine wildards can
+                            be used. Make sure the escape equel signs (=) with
+                            backslash (\) when passing query from the command
+                            line.
+    :param str sure:        If set to `yes`, it will not ask for confirmation
+                            before running.
+    :param str group_by:    Set to 'cluster' to group the hosts by their oVirt
+                            cluster, see on.group for what groups are for
+    :param str group_limit: How many hosts of each group can be worked on at
+                            the same time
+    :param str into:        If given, put the hosts in a host set with this
+                            name instead of the target hosts, the query only
+                            runs once the set is used, see on.inventory
+
+    To select hosts from many engines at the same time, pass a pipe (|)
+    separated list of engine URLs as 'ovirt_engine'. Clusters with the same
+    name on different engines make one group.
     """
-    hosts = oVirtObjectType.all_types['host'].query(ovirt, oquery)
-    env.hosts = [host.address for host in hosts]
+    if group_by not in (None, 'cluster'):
+        abort("Hosts can only be grouped by 'cluster'")
+    if into:
+        inventory().define(into, lambda: [
+            host.address
+            for host in _query_hosts(ovirts, oquery, group_by, group_limit)
+        ])
+        return
+    hosts = _query_hosts(ovirts, oquery, group_by, group_limit)
+    env.hosts = HostSet(host.address for host in hosts)
     puts(yellow(
         "Got %d hosts: \n\t" % len(env.hosts)
         + '\n\t'.join(env.hosts)
@@ -29,3 +56,28 @@ def query(oquery='', sure='no', ovirt=None):
         if prompt('Is what you expected? y|n', default='y').lower() == 'n':
             abort('Ended by user request.')
     return hosts
+
+
+def _query_hosts(ovirts, oquery, group_by, group_limit):
+    engines = OrderedDict(
+        (engine_name(url), api) for url, api in ovirts.iteritems()
+    )
+    host_type = oVirtObjectType.all_types['host']
+    hosts = list(iter_federated(
+        engines.iteritems(), lambda api: host_type.iter_query(api, oquery)
+    ))
+    if group_by == 'cluster':
+        cluster_names = {}
+        groups = {}
+        for host in hosts:
+            cluster_key = (host.engine, host.cluster.id)
+            if cluster_key not in cluster_names:
+                cluster_names[cluster_key] = engines[host.engine].clusters.get(
+                    id=host.cluster.id
+                ).name
+            groups.setdefault(cluster_names[cluster_key], []).append(
+                host.address
+            )
+        for group, addresses in groups.iteritems():
+            host_groups().add_hosts(group, addresses, group_limit)
+    return hosts
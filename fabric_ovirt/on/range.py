@@ -3,66 +3,104 @@
 This task allows you to define a range of hosts like this:
     myhost01:10.mydomain.com
     myhostA:Z.mydomain.com
+    rack01:40-node001:200.mydomain.com
 """
 
 from fabric.api import (
     serial,
     task,
     runs_once,
-    env,
 )
 import re
 
+from fabric_ovirt.lib.host_set import target_hosts
+from fabric_ovirt.lib.inventory import inventory
+
+
+RANGE_RE = re.compile(r'(?P<digit>\d+:\d+)|(?P<char>[a-zA-Z]:[a-zA-Z])')
+
+
+def _range_values(match):
+    if match.group('digit'):
+        first, last = match.group('digit').split(':')
+        padding = len(first)
+        first, last = int(first), int(last)
+        step = 1 if last >= first else -1
+        for i in xrange(first, last + step, step):
+            yield str(i).zfill(padding)
+        return
+    first, last = (ord(c) for c in match.group('char').split(':'))
+    step = 1 if last >= first else -1
+    for i in xrange(first, last + step, step):
+        yield chr(i)
+
+
+def _expand_matches(spec, matches, pos):
+    if not matches:
+        yield spec[pos:]
+        return
+    match = matches[0]
+    prefix = spec[pos:match.start()]
+    for value in _range_values(match):
+        for rest in _expand_matches(spec, matches[1:], match.end()):
+            yield prefix + value + rest
+
+
+def _expand_spec(spec):
+    return _expand_matches(spec, list(RANGE_RE.finditer(spec)), 0)
+
 
 def range_expand(range_def):
     """
     :param range_def:
-        Range definition
+        Range definition, a comma separated list of host specs. Specs
+        starting with '!' are excluded from the result
+
+    Generates the strings resulting from expanding every letter:letter or
+    int:int range on each of the given specs, for specs with more then one
+    range all the combinations are generated.
 
-    Generates a list of strings expanding the first match of the range
-    letter:letter or int:int on the given string.
+    The strings are generated lazily, so huge ranges can be consumed without
+    building them in memory first, only the excluded specs get expanded in
+    advance.
     """
-    res = []
-    range_exp = r'((?P<digit>\d+:\d+)|(?P<char>[a-zA-Z]:[a-zA-Z]))'
-    comp_reg = re.compile(range_exp)
-    match = comp_reg.search(range_def)
-    if not match:
-        return [range_def]
-    for mtype, val in match.groupdict().iteritems():
-        if val is None:
+    specs = [spec.strip() for spec in range_def.split(',') if spec.strip()]
+    excluded = set()
+    for spec in specs:
+        if spec.startswith('!'):
+            excluded.update(_expand_spec(spec[1:]))
+    for spec in specs:
+        if spec.startswith('!'):
             continue
-        prestr = range_def[:match.start()]
-        poststr = range_def[match.end():]
-        prechar, postchar = val.split(':')
-        if mtype == 'char':
-            for i in range(ord(prechar), ord(postchar) + 1):
-                res.append(prestr + chr(i) + poststr)
-        elif mtype == 'digit':
-            padding = len(prechar)
-            for i in range(int(prechar), int(postchar) + 1):
-                res.append(
-                    "{0}{1}{2}".format(
-                        prestr,
-                        str(i).zfill(padding),
-                        poststr)
-                )
-    return res
+        for host in _expand_spec(spec):
+            if host not in excluded:
+                yield host
 
 
 @task(default=True)
 @runs_once
 @serial
-def hostrange(*args):
+def hostrange(*args, **kwargs):
     r"""
     :param \*args:
         List of hosts/host ranges
+    :param into:
+        If given, put the hosts in a host set with this name instead of the
+        target hosts, the ranges are only expanded once the set is used, see
+        on.inventory
 
     Use the given host range as target hosts.
-    A range is defined by a ':'  between chars or numbers.
+    A range is defined by a ':'  between chars or numbers, a host can have
+    more then one range and hosts prefixed with '!' are excluded.
     example::
 
         host1:10  -> host1, host2, ..., host10
-        hostA-Z -> hostA, hostB, ..., hostZ
+        hostA:Z -> hostA, hostB, ..., hostZ
+        rack1:2-node1:3 -> rack1-node1, rack1-node2, ..., rack2-node3
+        host1:10,!host3:4 -> host1, host2, host5, ..., host10
     """
-    for host_range in args:
-        env.hosts.extend(range_expand(host_range))
+    range_def = ','.join(args)
+    if kwargs.get('into'):
+        inventory().define(kwargs['into'], lambda: range_expand(range_def))
+    else:
+        target_hosts().extend(range_expand(range_def))
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+"""conftest.py - Fixtures shared by the tests
+"""
+import sys
+import time
+from types import ModuleType
+
+import pytest
+from fabric.state import env
+
+
+@pytest.fixture
+def cache_dir(tmpdir):
+    """Keep the cache files of the test in a temporary directory"""
+    saved = env.get('cache_dir')
+    env.cache_dir = str(tmpdir)
+    yield tmpdir
+    env.cache_dir = saved
+
+
+@pytest.fixture
+def clean_env():
+    """Undo the changes the test makes to the Fabric environment"""
+    saved = dict(env)
+    yield env
+    env.clear()
+    env.update(saved)
+
+
+class FakeCurl(object):
+    def __init__(self):
+        self.cookie = None
+
+    def setopt(self, option, value):
+        if option == 'COOKIELIST':
+            self.cookie = value
+
+
+class FakeConnectionsPool(object):
+    def __init__(self, **kwargs):
+        setattr(self, '_ConnectionsPool__curl', FakeCurl())
+
+
+class FakeRequestError(Exception):
+    status = None
+
+
+class FakeAPI(object):
+    """Creates its connections pool the way the SDK does, by looking up the
+    pool class in its module, and rejects the 'expired' session cookie
+    """
+    def __init__(self, url, username, password, **kwargs):
+        self.url = url
+        # Give other threads a chance to swap the pool class
+        time.sleep(0.01)
+        pool = sys.modules['ovirtsdk.api'].ConnectionsPool(url=url)
+        self.cookie = pool._ConnectionsPool__curl.cookie
+        if self.cookie == 'expired':
+            error = FakeRequestError('Unauthorized')
+            error.status = 401
+            raise error
+
+
+@pytest.fixture
+def fake_ovirt_sdk(monkeypatch):
+    """Stand in for the oVirt SDK modules"""
+    modules = dict(
+        (name, ModuleType(name)) for name in (
+            'pycurl',
+            'ovirtsdk',
+            'ovirtsdk.api',
+            'ovirtsdk.infrastructure',
+            'ovirtsdk.infrastructure.connectionspool',
+            'ovirtsdk.infrastructure.context',
+            'ovirtsdk.infrastructure.errors',
+        )
+    )
+    modules['pycurl'].COOKIELIST = 'COOKIELIST'
+    modules['pycurl'].INFO_COOKIELIST = 'INFO_COOKIELIST'
+    modules['ovirtsdk'].api = modules['ovirtsdk.api']
+    modules['ovirtsdk.api'].API = FakeAPI
+    modules['ovirtsdk.api'].ConnectionsPool = FakeConnectionsPool
+    modules['ovirtsdk.infrastructure.connectionspool'].ConnectionsPool = \
+        FakeConnectionsPool
+    modules['ovirtsdk.infrastructure.context'].context = \
+        type('context', (object,), dict(manager={}))
+    modules['ovirtsdk.infrastructure.errors'].RequestError = \
+        FakeRequestError
+    for name, module in modules.iteritems():
+        monkeypatch.setitem(sys.modules, name, module)
+    return modules
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+"""test_batch_loader.py - Tests for batch_loader.py
+"""
+from collections import namedtuple
+
+from fabric_ovirt.lib.batch_loader import BatchLoader
+
+Obj = namedtuple('Obj', ('id', 'name'))
+
+
+class FakeSearch(object):
+    def __init__(self, objs, searchable):
+        self.objs = dict((obj.id, obj) for obj in objs)
+        self.searchable = searchable
+        self.searches = []
+        self.gets = []
+
+    def search(self, ids):
+        self.searches.append(ids)
+        return [
+            self.objs[id] for id in reversed(ids)
+            if id in self.objs and id in self.searchable
+        ]
+
+    def get(self, id):
+        self.gets.append(id)
+        return self.objs.get(id)
+
+
+def test_batch_loader():
+    fake = FakeSearch([Obj(i, 'vm%d' % i) for i in xrange(5)], xrange(5))
+    loader = BatchLoader(fake.search, batch_size=2)
+    pending = [loader.load(i) for i in (3, 1, 3, 4, 7)]
+    assert fake.searches == []
+    assert pending[0].get() == Obj(3, 'vm3')
+    assert fake.searches == [[3, 1], [4, 7]]
+    assert [p.get() for p in pending] == [
+        Obj(3, 'vm3'), Obj(1, 'vm1'), Obj(3, 'vm3'), Obj(4, 'vm4'), None
+    ]
+    assert len(fake.searches) == 2
+    assert loader.load_many([1, 2]) == [Obj(1, 'vm1'), Obj(2, 'vm2')]
+    assert fake.searches[2:] == [[2]]
+
+
+def test_batch_loader_fallback():
+    fake = FakeSearch([Obj(i, 'vm%d' % i) for i in xrange(3)], [0])
+    loader = BatchLoader(fake.search, fallback=fake.get)
+    assert loader.load_many([0, 1, 5]) == [Obj(0, 'vm0'), Obj(1, 'vm1'), None]
+    assert fake.searches == [[0, 1, 5]]
+    assert fake.gets == [1, 5]
+
+
+def test_batch_loader_clear():
+    fake = FakeSearch([Obj(0, 'vm0')], [0])
+    loader = BatchLoader(fake.search)
+    pending = loader.load(0)
+    assert loader.load_many([0]) == [Obj(0, 'vm0')]
+    loader.clear()
+    assert pending.get() == Obj(0, 'vm0')
+    assert fake.searches == [[0], [0]]
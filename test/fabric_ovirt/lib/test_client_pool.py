@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+"""test_client_pool.py - Tests for client_pool.py
+"""
+import threading
+from itertools import count
+
+import pytest
+
+from fabric_ovirt.lib.client_pool import ClientPool
+
+
+def test_client_pool_reuses_clients():
+    pool = ClientPool(count().next, 3)
+    with pool.client() as client:
+        assert client == 0
+    with pool.client() as client:
+        assert client == 0
+    assert pool.clients() == [0]
+
+
+def test_client_pool_map():
+    lock = threading.Condition()
+    in_use = set()
+    most_in_use = []
+
+    def call(client, item):
+        with lock:
+            assert client not in in_use
+            in_use.add(client)
+            most_in_use.append(len(in_use))
+            lock.notify_all()
+            # Give the other threads a chance to take the other clients
+            if len(in_use) < 3:
+                lock.wait(1)
+            in_use.discard(client)
+        return item * 2
+
+    pool = ClientPool(count().next, 3)
+    assert pool.map(call, xrange(9)) == [i * 2 for i in xrange(9)]
+    assert sorted(pool.clients()) == [0, 1, 2]
+    assert max(most_in_use) == 3
+
+
+def test_client_pool_map_creates_clients_first():
+    threads = []
+
+    def factory():
+        threads.append(threading.current_thread())
+        return len(threads)
+
+    pool = ClientPool(factory, 3)
+    assert pool.map(lambda client, item: item, xrange(9)) == range(9)
+    assert threads == [threading.current_thread()] * 3
+    pool.map(lambda client, item: item, xrange(2))
+    assert len(threads) == 3
+
+
+def test_client_pool_map_raises():
+    def call(client, item):
+        if item == 2:
+            raise ValueError(item)
+        return item
+
+    with pytest.raises(ValueError):
+        ClientPool(count().next, 2).map(call, xrange(4))
+
+
+def test_client_pool_factory_fails():
+    def factory():
+        raise IOError()
+
+    pool = ClientPool(factory, 1)
+    for i in xrange(2):
+        with pytest.raises(IOError):
+            with pool.client():
+                pass
+    assert pool.clients() == []
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+"""test_event_tracker.py - Tests for event_tracker.py
+"""
+from collections import namedtuple
+
+from fabric_ovirt.lib.event_tracker import EventTracker
+
+Event = namedtuple('Event', ('id', 'vm'))
+
+
+class FakeFeed(object):
+    def __init__(self, events=()):
+        self.events = list(events)
+        self.broken = False
+
+    def fetch(self, last_event_id):
+        if self.broken:
+            raise IOError('no events for you')
+        if last_event_id is None:
+            return self.events[-1:]
+        return [e for e in self.events if int(e.id) > last_event_id]
+
+    def tracker(self):
+        return EventTracker(self.fetch, lambda event: [event.vm])
+
+
+def test_event_tracker():
+    feed = FakeFeed([Event('1', 'a'), Event('2', 'b')])
+    tracker = feed.tracker()
+    assert tracker.start()
+    assert tracker.changed() == set()
+    feed.events.extend([Event('3', 'c'), Event('4', 'a')])
+    assert tracker.changed() == set(['a', 'c'])
+    assert tracker.changed() == set()
+
+
+def test_event_tracker_empty_feed():
+    feed = FakeFeed()
+    tracker = feed.tracker()
+    assert tracker.changed() == set()
+    feed.events.append(Event('1', 'a'))
+    assert tracker.changed() == set(['a'])
+
+
+def test_event_tracker_unavailable():
+    feed = FakeFeed([Event('1', 'a')])
+    tracker = feed.tracker()
+    assert tracker.start()
+    feed.broken = True
+    assert tracker.changed() is None
+    assert not tracker.available
+    feed.broken = False
+    assert tracker.changed() is None
@@ -0,0 +1,15 @@
+#!/usr/bin/env python
+"""test_facts.py - Tests for facts.py
+"""
+from fabric_ovirt.lib.facts import add_facts, facts_of
+
+
+def test_facts_of(clean_env):
+    clean_env.host_string = None
+    assert facts_of() == {}
+    add_facts({'h1': {'os': 'Fedora'}, 'h2': {'os': 'CentOS'}})
+    add_facts({'h1': {'release': '23'}})
+    assert facts_of('h1') == {'os': 'Fedora', 'release': '23'}
+    assert facts_of('h3') == {}
+    clean_env.host_string = 'root@h2:22'
+    assert facts_of() == {'os': 'CentOS'}
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+"""test_fingerprints.py - Tests for fingerprints.py
+"""
+from types import ModuleType
+
+import pytest
+from fabric.exceptions import NetworkError
+
+from fabric_ovirt.lib.fingerprints import (
+    FAILED_HOSTS,
+    monkey_patch,
+    facts_fingerprint,
+    remote_mtimes,
+    combine,
+    run_key,
+    FingerprintStore,
+    changed_hosts,
+    set_pending,
+    commit_pending,
+)
+
+
+def test_facts_fingerprint():
+    facts = {'os': 'Fedora', 'release': '23', 'uptime': '5 days'}
+    fingerprint = facts_fingerprint(facts)
+    assert fingerprint == facts_fingerprint(dict(reversed(facts.items())))
+    assert fingerprint != facts_fingerprint(dict(facts, release='24'))
+    assert facts_fingerprint(facts, ['os', 'release']) == \
+        facts_fingerprint(dict(facts, uptime='6 days'), ['os', 'release'])
+    assert facts_fingerprint({}) is None
+    assert facts_fingerprint(facts, ['nosuchfact']) is None
+
+
+def test_combine():
+    assert combine([None, None]) is None
+    assert combine(['a', None]) == combine(['a'])
+    assert combine(['a', 'b']) != combine(['b', 'a'])
+
+
+def test_changed_hosts():
+    fingerprints = {'h1': 'a', 'h2': 'b', 'h3': None, 'h4': 'd'}
+    recorded = {'h1': 'a', 'h2': 'x', 'h3': 'c'}
+    assert sorted(changed_hosts(fingerprints, recorded)) == ['h2', 'h3', 'h4']
+
+
+def test_commit_pending(cache_dir):
+    key = run_key(['do.something:x=1'])
+    assert key != run_key(['do.something:x=2'])
+    FingerprintStore(key).save({'h1': 'a', 'h2': 'b'})
+    set_pending(key, {'h2': 'c', 'h3': None})
+    assert FingerprintStore(key).load() == {'h1': 'a', 'h2': 'b'}
+    commit_pending()
+    assert FingerprintStore(key).load() == {'h1': 'a', 'h2': 'c'}
+    assert FingerprintStore(run_key([])).load() == {}
+
+
+@pytest.fixture
+def failed_hosts():
+    yield FAILED_HOSTS
+    FAILED_HOSTS.clear()
+
+
+def test_commit_pending_skips_failed_hosts(cache_dir, failed_hosts):
+    key = run_key(['do.something'])
+    FingerprintStore(key).save({'h1': 'a', 'h2': 'b'})
+    set_pending(key, {'h1': 'c', 'h2': 'd', 'h3': 'e'})
+    failed_hosts.update(['h2', 'h3'])
+    commit_pending()
+    assert FingerprintStore(key).load() == {'h1': 'c', 'h2': 'b'}
+
+
+def test_monkey_patch(failed_hosts):
+    def execute(task, host):
+        if host == 'bad':
+            raise NetworkError('Timed out')
+        return task()
+
+    mod = ModuleType('fabric')
+    mod.tasks = ModuleType('fabric.tasks')
+    mod.tasks._execute = execute
+    monkey_patch(mod)
+    monkey_patch(mod)
+    assert mod.tasks._execute(lambda: 'done', 'good') == 'done'
+    with pytest.raises(NetworkError):
+        mod.tasks._execute(lambda: 'done', 'bad')
+    assert failed_hosts == set(['bad'])
+
+
+def test_remote_mtimes(monkeypatch):
+    commands = []
+    monkeypatch.setattr(
+        'fabric_ovirt.lib.fingerprints.run',
+        lambda command, **kwargs: commands.append(command) or '',
+    )
+    remote_mtimes(['/etc/ntp.conf', '/tmp/my file', '/tmp/$(reboot)'])
+    assert commands == [
+        "stat -c '%n %Y' /etc/ntp.conf '/tmp/my file' '/tmp/$(reboot)'"
+        " 2>/dev/null; true"
+    ]
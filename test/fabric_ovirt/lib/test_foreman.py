@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+"""test_foreman.py - Tests for foreman.py
+"""
+import re
+from hashlib import sha1
+import pytest
+from fabric.state import env
+
+from fabric_ovirt.lib import foreman as foreman_lib
+from fabric_ovirt.lib.foreman import (
+    iter_pages,
+    iter_results,
+    iter_search,
+    split_or_query,
+    get_facts,
+    get_hg_by_name,
+    get_host_by_name,
+    NameLookup,
+)
+
+
+class FakeIndex(object):
+    def __init__(self, total, max_per_page=None):
+        self.records = [{'name': 'host%d' % i} for i in xrange(total)]
+        self.max_per_page = max_per_page
+        self.calls = []
+
+    def __call__(self, search=None, page=1, per_page=20):
+        self.calls.append((search, page))
+        if self.max_per_page:
+            per_page = min(per_page, self.max_per_page)
+        records = self.records
+        names = re.findall(r'name=(\w+)', search or '')
+        if names:
+            records = [r for r in records if r['name'] in names]
+        start = (page - 1) * per_page
+        return {
+            'total': len(self.records) + 100,
+            'subtotal': len(records),
+            'page': page,
+            'per_page': per_page,
+            'search': search,
+            'results': records[start:start + per_page],
+        }
+
+
+@pytest.mark.parametrize(
+    ('total', 'per_page', 'max_per_page', 'pages'),
+    [
+        (0, 10, None, 1),
+        (5, 10, None, 1),
+        (10, 10, None, 1),
+        (11, 10, None, 2),
+        (95, 10, None, 10),
+        (95, 50, 10, 10),
+    ]
+)
+def test_iter_pages(total, per_page, max_per_page, pages):
+    index = FakeIndex(total, max_per_page)
+    result = list(iter_pages(index, per_page=per_page, workers=3,
+                             search='name ~ host'))
+    assert [page['page'] for page in result] == range(1, pages + 1)
+    assert sorted(index.calls) == [('name ~ host', i)
+                                   for i in xrange(1, pages + 1)]
+
+
+def test_iter_results():
+    index = FakeIndex(57)
+    results = list(iter_results(index, per_page=5, search='all'))
+    assert results == index.records
+
+
+@pytest.mark.parametrize(
+    ('conds', 'base', 'expected'),
+    [
+        ([], '', ['']),
+        ([], 'os=a', ['os=a']),
+        (['c1', 'c2'], '', ['c1 or c2']),
+        (['c1', 'c2', 'c3'], 'os=a',
+         ['os=a and ( c1 or c2 )', 'os=a and ( c3 )']),
+        (['c%d' % i for i in xrange(1, 7)], '',
+         ['c1 or c2', 'c3 or c4', 'c5 or c6']),
+    ]
+)
+def test_split_or_query(conds, base, expected):
+    assert split_or_query(conds, base, chunk_size=2) == expected
+
+
+def test_iter_search():
+    index = FakeIndex(30)
+    names = ['host%d' % i for i in (3, 1, 3, 7, 12, 29, 1, 5)]
+    results = list(iter_search(
+        index, ('name=%s' % name for name in names), chunk_size=3, workers=2,
+    ))
+    assert [r['name'] for r in results] == [
+        'host1', 'host3', 'host7', 'host12', 'host29', 'host5',
+    ]
+    assert len(index.calls) == 3
+
+
+def test_get_facts():
+    facts = {
+        'h%d' % i: {'operatingsystem': 'Fedora', 'fqdn': 'h%d.x' % i}
+        for i in xrange(5)
+    }
+    searches = []
+
+    def index_fact_values(search=None, page=1, per_page=20):
+        searches.append(search)
+        hosts = re.findall(r'host = (\w+)', search)
+        values = [
+            (host, fact, value)
+            for host in hosts for fact, value in sorted(facts[host].items())
+            if 'fact = %s' % fact in search or 'fact = ' not in search
+        ]
+        results = {}
+        for host, fact, value in values[(page - 1) * per_page:
+                                        page * per_page]:
+            results.setdefault(host, {})[fact] = value
+        return {'subtotal': len(values), 'per_page': per_page,
+                'results': results}
+
+    assert get_facts(
+        index_fact_values, ['h1', 'h3', 'h4'], chunk_size=2, per_page=3
+    ) == {'h1': facts['h1'], 'h3': facts['h3'], 'h4': facts['h4']}
+    assert get_facts(index_fact_values, ['h0'], ['fqdn']) == {
+        'h0': {'fqdn': 'h0.x'}
+    }
+    assert searches[-1] == '( fact = fqdn ) and ( host = h0 )'
+
+
+class FakeForeman(object):
+    def __init__(self):
+        self.url = 'http://foreman'
+        self.hostgroups = [
+            {'id': 1, 'name': 'web', 'title': 'prod/web'},
+            {'id': 2, 'name': 'db', 'title': 'prod/db'},
+            {'id': 3, 'name': 'db', 'title': 'test/db'},
+        ]
+        self.hosts = [{'id': i, 'name': 'h%d' % i} for i in xrange(10)]
+        self.hosts.append({'id': 10, 'name': 'odd"name\\'})
+        self.searches = []
+
+    def _index(self, records, search, page, per_page):
+        self.searches.append(search)
+        names = [
+            re.sub(r'\\(.)', r'\1', name).lower()
+            for name in re.findall(r'name = "((?:[^"\\]|\\.)+)"', search)
+        ]
+        found = [r for r in records if r['name'].lower() in names]
+        return {'subtotal': len(found), 'per_page': per_page,
+                'results': found[(page - 1) * per_page:page * per_page]}
+
+    def index_hostgroups(self, search=None, page=1, per_page=20):
+        return self._index(self.hostgroups, search, page, per_page)
+
+    def index_hosts(self, search=None, page=1, per_page=20):
+        return self._index(self.hosts, search, page, per_page)
+
+
+def test_get_by_name():
+    frm = FakeForeman()
+    assert get_hg_by_name(frm, 'web')['id'] == 1
+    with pytest.raises(LookupError):
+        get_hg_by_name(frm, 'db')
+    with pytest.raises(LookupError):
+        get_host_by_name(frm, 'nosuchhost')
+    assert get_host_by_name(frm, 'h3')['id'] == 3
+    searches = len(frm.searches)
+    # Found records are remembered
+    assert get_hg_by_name(frm, 'web')['id'] == 1
+    assert get_host_by_name(frm, 'h3')['id'] == 3
+    assert len(frm.searches) == searches
+
+
+def test_get_many_by_name():
+    frm = FakeForeman()
+    names = ['h%d' % i for i in (5, 2, 7)]
+    hosts = NameLookup(frm.index_hosts, 'host').get_many(names)
+    assert hosts.keys() == names
+    assert [host['id'] for host in hosts.values()] == [5, 2, 7]
+    assert len(frm.searches) == 1
+    with pytest.raises(LookupError):
+        NameLookup(frm.index_hostgroups, 'hostgroup').get_many(['web', 'db'])
+
+
+def test_get_many_by_name_any_case():
+    frm = FakeForeman()
+    lookup = NameLookup(frm.index_hosts, 'host')
+    hosts = lookup.get_many(['H5', 'h2'])
+    assert [host['id'] for host in hosts.values()] == [5, 2]
+    assert len(frm.searches) == 1
+    assert lookup.get('h5')['id'] == 5
+    assert len(frm.searches) == 1
+
+
+def test_get_by_name_quoted():
+    frm = FakeForeman()
+    assert get_host_by_name(frm, 'odd"name\\')['id'] == 10
+    assert frm.searches == ['name = "odd\\"name\\\\"']
+
+
+def test_name_lookup_cache(tmpdir):
+    frm = FakeForeman()
+    cache_file = str(tmpdir.join('lookup.json'))
+    lookup = NameLookup(frm.index_hosts, 'host', 60, cache_file)
+    lookup.get_many(['h1', 'h2'])
+    frm.searches = []
+    lookup = NameLookup(frm.index_hosts, 'host', 60, cache_file)
+    assert lookup.get('h2')['id'] == 2
+    assert frm.searches == []
+    lookup = NameLookup(frm.index_hosts, 'host', 0, cache_file)
+    assert lookup.get('h2')['id'] == 2
+    assert len(frm.searches) == 1
+
+
+def test_foreman_client(monkeypatch, tmpdir):
+    created = []
+
+    class Foreman(object):
+        def __init__(self, url, auth, version=None, api_version=None):
+            created.append((url, auth, version, api_version))
+            self.version = version or '1.11.0'
+
+    monkeypatch.setattr(foreman_lib, '_foreman_class', lambda: Foreman)
+    monkeypatch.setattr(foreman_lib, '_CLIENTS', {})
+    monkeypatch.setitem(env, 'cache_dir', str(tmpdir))
+    client = foreman_lib.foreman_client('http://foreman', ('u', 'p'))
+    assert foreman_lib.foreman_client('http://foreman', ('u', 'p')) is client
+    assert foreman_lib.foreman_client('http://foreman') is not client
+    assert created == [
+        ('http://foreman', ('u', 'p'), None, 2),
+        ('http://foreman', None, '1.11.0', 2),
+    ]
+    assert [path.basename for path in tmpdir.join('foreman').listdir()] == [
+        'version-{0}.json'.format(sha1('http://foreman').hexdigest())
+    ]
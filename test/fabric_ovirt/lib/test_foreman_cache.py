@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+"""test_foreman_cache.py - Tests for foreman_cache.py
+"""
+import os
+import re
+import stat
+import time
+import pytest
+
+from fabric_ovirt.lib.foreman_cache import ForemanCache
+
+
+class FakeForeman(object):
+    def __init__(self, names):
+        self.hosts = [
+            {'name': name, 'updated_at': '2016-01-01 00:00:00 UTC'}
+            for name in names
+        ]
+        self.searches = []
+
+    def update(self, name, updated_at='2016-02-01 00:00:00 UTC'):
+        for host in self.hosts:
+            if host['name'] == name:
+                host['updated_at'] = updated_at
+                return
+        self.hosts.append({'name': name, 'updated_at': updated_at})
+
+    def index_hosts(self, search=None, page=1, per_page=20, thin=False):
+        self.searches.append((search, thin))
+        results = self.hosts
+        match = re.search(r'updated_at >= "([^"]+)"', search)
+        if match:
+            results = [h for h in results if h['updated_at'] >= match.group(1)]
+        if thin:
+            results = [{'name': h['name']} for h in results]
+        return {
+            'subtotal': len(results),
+            'per_page': per_page,
+            'results': results[(page - 1) * per_page:page * per_page],
+        }
+
+
+@pytest.fixture
+def client():
+    return FakeForeman(['h1', 'h2', 'h3'])
+
+
+def test_search_uses_fresh_cache(cache_dir, client):
+    cache = ForemanCache('http://foreman', ttl=60)
+    hosts = cache.search('name ~ h', lambda: client)
+    assert [host['name'] for host in hosts] == ['h1', 'h2', 'h3']
+    assert client.searches == [('name ~ h', False)]
+    # Any call to the client factory would fail
+    assert cache.search('name ~ h', lambda: None) == hosts
+    assert ForemanCache('http://foreman').search(
+        'name ~ h', lambda: None, 'offline'
+    ) == hosts
+
+
+def test_search_offline_not_cached(cache_dir):
+    with pytest.raises(LookupError):
+        ForemanCache('http://foreman').search('x', lambda: None, 'offline')
+
+
+def test_search_refresh(cache_dir, client):
+    cache = ForemanCache('http://foreman', ttl=0)
+    cache.search('name ~ h', lambda: client)
+    client.update('h2')
+    client.update('h4')
+    client.hosts = [host for host in client.hosts if host['name'] != 'h3']
+    client.searches = []
+    time.sleep(0.01)
+    hosts = cache.search('name ~ h', lambda: client)
+    assert [host['name'] for host in hosts] == ['h1', 'h2', 'h4']
+    assert hosts[1]['updated_at'] == '2016-02-01 00:00:00 UTC'
+    assert client.searches == [
+        ('name ~ h', True),
+        ('updated_at >= "2016-01-01 00:00:00 UTC" and ( name ~ h )', False),
+    ]
+
+
+def test_search_refresh_falls_back_to_fetch(cache_dir, client):
+    cache = ForemanCache('http://foreman', ttl=0)
+    cache.search('', lambda: client)
+    # A host that matches now but was not updated can't be found cheaply
+    client.hosts.append(
+        {'name': 'h0', 'updated_at': '2015-01-01 00:00:00 UTC'}
+    )
+    client.searches = []
+    hosts = cache.search('', lambda: client, 'refresh')
+    assert [host['name'] for host in hosts] == ['h1', 'h2', 'h3', 'h0']
+    assert client.searches[-1] == ('', False)
+
+
+def test_search_bad_mode(cache_dir):
+    with pytest.raises(ValueError):
+        ForemanCache('http://foreman').search('', lambda: None, 'maybe')
+
+
+def test_search_per_user(cache_dir, client):
+    ForemanCache('http://foreman', 'admin').search('name ~ h', lambda: client)
+    assert ForemanCache('http://foreman', 'admin').search(
+        'name ~ h', lambda: None, 'offline'
+    )
+    for user in ('viewer', None):
+        with pytest.raises(LookupError):
+            ForemanCache('http://foreman', user).search(
+                'name ~ h', lambda: None, 'offline'
+            )
+
+
+def test_cache_file_permissions(cache_dir, client):
+    cache = ForemanCache('http://foreman', 'admin')
+    cache.search('name ~ h', lambda: client)
+    assert stat.S_IMODE(os.stat(cache.path('name ~ h')).st_mode) == \
+        stat.S_IRUSR | stat.S_IWUSR
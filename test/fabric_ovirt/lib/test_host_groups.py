@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+"""test_host_groups.py - Tests for host_groups.py
+"""
+import pytest
+from collections import namedtuple
+
+from fabric_ovirt.lib.host_groups import HostGroups, GroupScheduler
+
+
+FakeJob = namedtuple('FakeJob', ('name',))
+
+
+@pytest.fixture
+def groups():
+    groups = HostGroups()
+    groups.add_hosts('cluster1', ['hv1.example.com', 'hv2.example.com'], 1)
+    groups.add_patterns('web', ['web*', 'www*'], 2)
+    groups.add_patterns('all', ['*'])
+    return groups
+
+
+@pytest.mark.parametrize(
+    ('host_string', 'expected'),
+    [
+        ('hv1.example.com', 'cluster1'),
+        ('root@hv2.example.com:22', 'cluster1'),
+        ('web1.example.com', 'web'),
+        ('www1.example.com', 'web'),
+        ('db1.example.com', 'all'),
+    ]
+)
+def test_group_of(groups, host_string, expected):
+    assert groups.group_of(host_string) == expected
+
+
+def test_limit_of(groups):
+    assert groups.limit_of('cluster1') == 1
+    assert groups.limit_of('web') == 2
+    assert groups.limit_of('all') is None
+    groups.set_limit('all', '5')
+    assert groups.limit_of('all') == 5
+
+
+def test_scheduler_without_groups():
+    jobs = [FakeJob(name) for name in 'abc']
+    scheduler = GroupScheduler(jobs)
+    assert len(scheduler) == 3
+    assert sorted(scheduler) == sorted(jobs)
+    # Jobs are handed out in the same order fabric pops them
+    assert [scheduler.pop() for _ in jobs] == jobs[::-1]
+    assert not scheduler
+    assert not scheduler.ready()
+    with pytest.raises(IndexError):
+        scheduler.pop()
+
+
+def test_scheduler_limits(groups):
+    names = ('hv1.example.com', 'hv2.example.com', 'web1', 'web2', 'web3')
+    jobs = [FakeJob(name) for name in reversed(names)]
+    scheduler = GroupScheduler(jobs, groups)
+    started = []
+    while scheduler.ready():
+        started.append(scheduler.pop())
+    assert sorted(job.name for job in started) == [
+        'hv1.example.com', 'web1', 'web2'
+    ]
+    assert len(scheduler) == 2
+    scheduler.done(FakeJob('web1'))
+    assert scheduler.pop().name == 'web3'
+    assert not scheduler.ready()
+    scheduler.done(FakeJob('hv1.example.com'))
+    assert scheduler.pop().name == 'hv2.example.com'
+    assert not scheduler
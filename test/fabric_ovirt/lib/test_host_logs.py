@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+"""test_host_logs.py - Tests for host_logs.py
+"""
+from __future__ import print_function
+import os
+import sys
+import json
+import pytest
+from multiprocessing import Process
+
+from fabric_ovirt.lib.host_logs import RunLogDir, log_file_name, INDEX_FILE
+
+
+@pytest.mark.parametrize(
+    ('name', 'expected'),
+    [
+        ('host.example.com', 'host.example.com.log'),
+        ('root@host:2222', 'root@host:2222.log'),
+        ('we/ird host', 'we_ird_host-a43b7aeb.log'),
+        (u'we/ird host', 'we_ird_host-a43b7aeb.log'),
+    ]
+)
+def test_log_file_name(name, expected):
+    assert log_file_name(name) == expected
+
+
+def test_log_file_name_unique():
+    names = ['a_b', 'a/b', 'a b', 'a\\b', 'a:b', 'a-b']
+    assert len(set(log_file_name(name) for name in names)) == len(names)
+
+
+def logging_job(lines):
+    for i in xrange(lines):
+        print('line', i)
+    print('to stderr', file=sys.stderr)
+
+
+def test_run_log_dir(tmpdir):
+    base_dir = str(tmpdir.join('logs'))
+    logs = RunLogDir(base_dir, 'do.some_task')
+    assert os.path.dirname(logs.path) == base_dir
+    assert os.path.basename(logs.path).startswith('do.some_task-')
+    jobs = [
+        Process(target=logging_job, args=(50,), name='host{0}'.format(i))
+        for i in xrange(2)
+    ]
+    for job in jobs:
+        logs.start(job)
+    for job in jobs:
+        job.join()
+    for job in jobs:
+        with open(logs.log_path(job.name)) as log:
+            assert log.read().splitlines() == [
+                'line {0}'.format(i) for i in xrange(50)
+            ] + ['to stderr']
+    index_path = logs.write_index({
+        'host0': dict(exit_code=0, results=None),
+        'host1': dict(exit_code=1, results=Exception('boom')),
+    })
+    assert index_path == os.path.join(logs.path, INDEX_FILE)
+    with open(index_path) as index_file:
+        index = json.load(index_file)
+    assert index['command'] == 'do.some_task'
+    assert index['hosts'] == {
+        'host0': dict(log='host0.log', exit_code=0, status='ok'),
+        'host1': dict(
+            log='host1.log', exit_code=1, status='failed',
+            error="Exception('boom',)",
+        ),
+    }
+
+
+def mixed_output_job():
+    print('from python')
+    os.system('echo from a subprocess')
+    print('from python again')
+
+
+def test_run_log_dir_output_order(tmpdir):
+    logs = RunLogDir(str(tmpdir))
+    job = Process(target=mixed_output_job, name='host0')
+    logs.start(job)
+    job.join()
+    with open(logs.log_path(job.name)) as log:
+        assert log.read().splitlines() == [
+            'from python', 'from a subprocess', 'from python again',
+        ]
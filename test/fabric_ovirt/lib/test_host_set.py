@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+"""test_host_set.py - Tests for host_set.py
+"""
+import copy
+import pickle
+
+import pytest
+
+from fabric_ovirt.lib.host_set import HostSet, target_hosts, merge
+
+
+def test_host_set_dedupes_in_order():
+    hosts = HostSet(['h2', 'h1', ' h2 '])
+    hosts.append('h3')
+    hosts.append('h1')
+    hosts.extend(host for host in ('h4', 'h3', 'h5'))
+    hosts += ['h5', 'h6']
+    hosts.insert(0, 'h6')
+    hosts.insert(0, 'h0')
+    assert hosts == ['h0', 'h2', 'h1', 'h3', 'h4', 'h5', 'h6']
+    assert 'h4' in hosts
+    assert 'h7' not in hosts
+
+
+def test_host_set_interns():
+    name = ''.join(['myhost', '.example.com'])
+    hosts = HostSet([name, u'other.example.com'])
+    assert hosts[0] is intern('myhost.example.com')
+    assert hosts[1] is intern('other.example.com')
+
+
+def test_host_set_removal():
+    hosts = HostSet(['h1', 'h2', 'h3', 'h4'])
+    hosts.remove('h1')
+    assert hosts.pop() == 'h4'
+    del hosts[0]
+    assert hosts == ['h3']
+    hosts.extend(['h1', 'h2', 'h4'])
+    assert hosts == ['h3', 'h1', 'h2', 'h4']
+    del hosts[1:3]
+    assert 'h1' not in hosts
+    hosts[0:1] = ['h4', 'h5']
+    assert hosts == ['h4', 'h5']
+
+
+@pytest.mark.parametrize('clone', [
+    copy.copy,
+    copy.deepcopy,
+    lambda hosts: pickle.loads(pickle.dumps(hosts)),
+    lambda hosts: pickle.loads(pickle.dumps(hosts, 2)),
+])
+def test_host_set_clone(clone):
+    hosts = HostSet(['h1', 'h2'])
+    cloned = clone(hosts)
+    assert isinstance(cloned, HostSet)
+    assert cloned == ['h1', 'h2']
+    cloned.append('h1')
+    cloned.append('h3')
+    assert cloned == ['h1', 'h2', 'h3']
+    assert hosts == ['h1', 'h2']
+
+
+def test_host_set_add():
+    hosts = HostSet(['h1', 'h2'])
+    added = hosts + ['h2', 'h3']
+    assert isinstance(added, HostSet)
+    assert added == ['h1', 'h2', 'h3']
+    assert hosts == ['h1', 'h2']
+
+
+def test_target_hosts(clean_env):
+    clean_env.hosts = ['h1', 'h1', 'h2']
+    hosts = target_hosts()
+    assert isinstance(hosts, HostSet)
+    assert clean_env.hosts is hosts
+    assert hosts == ['h1', 'h2']
+    assert target_hosts() is hosts
+
+
+def test_target_hosts_no_dedupe(clean_env):
+    clean_env.dedupe_hosts = False
+    clean_env.hosts = ['h1', 'h1']
+    hosts = target_hosts()
+    hosts.extend(['h2', 'h1'])
+    assert not isinstance(hosts, HostSet)
+    assert clean_env.hosts == ['h1', 'h1', 'h2', 'h1']
+
+
+@pytest.mark.parametrize(
+    ('hosts', 'roles', 'exclude', 'expected'),
+    [
+        (HostSet(['h1', 'h2']), [], [], ['h1', 'h2']),
+        (['h1 ', 'h2', 'h1'], [], [], ['h1', 'h2']),
+        ('h1', [], [], ['h1']),
+        (HostSet(['h1', 'h2']), ['r1'], ['h2'], ['h1', 'h3']),
+        (['h1'], ['r1', 'r2'], [], ['h1', 'h3', 'h2', 'h4']),
+    ]
+)
+def test_merge(clean_env, hosts, roles, exclude, expected):
+    clean_env.dedupe_hosts = True
+    roledefs = {'r1': ['h3', 'h2'], 'r2': {'hosts': lambda: ['h4']}}
+    assert merge(hosts, roles, exclude, roledefs) == expected
+
+
+def test_merge_no_dedupe(clean_env):
+    clean_env.dedupe_hosts = False
+    assert merge(HostSet(['h1', 'h2']), ['r1'], [], {'r1': ['h1']}) == \
+        ['h1', 'h2', 'h1']
+    assert merge(['h1', 'h1'], [], [], {}) == ['h1', 'h1']
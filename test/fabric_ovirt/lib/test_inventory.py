@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+"""test_inventory.py - Tests for inventory.py
+"""
+import pytest
+
+from fabric_ovirt.lib.inventory import Inventory, parse_expression
+
+
+@pytest.mark.parametrize(
+    ('expression', 'expected'),
+    [
+        ('a', 'a'),
+        ('a | b', ('|', 'a', 'b')),
+        ('a&b-c', ('-', ('&', 'a', 'b'), 'c')),
+        ('a - (b | c)', ('-', 'a', ('|', 'b', 'c'))),
+        ('((a))', 'a'),
+        ('(a & (b - c)) | d', ('|', ('&', 'a', ('-', 'b', 'c')), 'd')),
+    ]
+)
+def test_parse_expression(expression, expected):
+    assert parse_expression(expression) == expected
+
+
+@pytest.mark.parametrize(
+    'expression', ['', 'a |', '| a', 'a b', '(a | b', 'a )', 'a + b', '()']
+)
+def test_parse_bad_expression(expression):
+    with pytest.raises(ValueError):
+        parse_expression(expression)
+
+
+@pytest.fixture
+def inv():
+    inv = Inventory()
+    inv.fetched = []
+
+    def source(name, hosts):
+        def fetch():
+            inv.fetched.append(name)
+            return (host for host in hosts)
+        return fetch
+
+    inv.define('web', source('web', ['w1', 'w2', 'w3', 'x1']))
+    inv.define('prod', source('prod', ['w2', 'x1', 'w3', 'd1']))
+    inv.define('maint', source('maint', ['w3', 'd1']))
+    return inv
+
+
+@pytest.mark.parametrize(
+    ('expression', 'expected'),
+    [
+        ('web', ['w1', 'w2', 'w3', 'x1']),
+        ('web | maint', ['w1', 'w2', 'w3', 'x1', 'd1']),
+        ('web & prod', ['w2', 'w3', 'x1']),
+        ('web & prod - maint', ['w2', 'x1']),
+        ('prod - (web & maint)', ['w2', 'x1', 'd1']),
+    ]
+)
+def test_evaluate(inv, expression, expected):
+    assert inv.evaluate(expression) == expected
+
+
+def test_sets_are_fetched_once_when_needed(inv):
+    inv.define_expression('web_up', 'web - maint')
+    assert inv.fetched == []
+    assert inv.evaluate('web_up & prod') == ['w2', 'x1']
+    assert sorted(inv.fetched) == ['maint', 'prod', 'web']
+    inv.evaluate('web | prod')
+    assert len(inv.fetched) == 3
+
+
+def test_undefined_set(inv):
+    with pytest.raises(LookupError):
+        inv.evaluate('web - nosuchset')
+    assert inv.fetched == []
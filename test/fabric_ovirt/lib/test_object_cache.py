@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+"""test_object_cache.py - Tests for object_cache.py
+"""
+from collections import namedtuple
+
+from fabric_ovirt.lib.object_cache import ObjectCache
+
+Obj = namedtuple('Obj', ('id', 'name'))
+
+
+class FakeCollection(object):
+    def __init__(self, *objs):
+        self.objs = list(objs)
+        self.calls = []
+
+    def list(self, query=None, max=None):
+        self.calls.append(('list', query))
+        return [obj for obj in self.objs if query in (None, obj.name)]
+
+    def get(self, id=None, name=None):
+        self.calls.append(('get', id or name))
+        for obj in self.objs:
+            if id in (None, obj.id) and name in (None, obj.name):
+                return obj
+
+
+def test_object_cache_list():
+    cache = ObjectCache()
+    clusters = FakeCollection(Obj(1, 'c1'), Obj(2, 'c2'))
+    assert cache.list('clusters', clusters, query='c1') == [Obj(1, 'c1')]
+    assert cache.list('clusters', clusters, query='c1') == [Obj(1, 'c1')]
+    assert cache.get('clusters', clusters, id=1) == Obj(1, 'c1')
+    assert cache.list('clusters', clusters) == [Obj(1, 'c1'), Obj(2, 'c2')]
+    assert clusters.calls == [('list', 'c1'), ('list', None)]
+
+
+def test_object_cache_get():
+    cache = ObjectCache()
+    networks = FakeCollection(Obj(1, 'ovirtmgmt'))
+    other_networks = FakeCollection()
+    for i in xrange(2):
+        assert cache.get(
+            'networks', networks, scope='c1', name='ovirtmgmt'
+        ) == Obj(1, 'ovirtmgmt')
+        assert cache.get(
+            'networks', other_networks, scope='c2', name='ovirtmgmt'
+        ) is None
+    assert networks.calls == [('get', 'ovirtmgmt')]
+    assert other_networks.calls == [('get', 'ovirtmgmt')]
+
+
+def test_object_cache_invalidate():
+    cache = ObjectCache()
+    templates = FakeCollection(Obj(1, 't1'))
+    clusters = FakeCollection(Obj(2, 'c1'))
+    cache.list('templates', templates)
+    cache.list('clusters', clusters)
+    templates.objs.append(Obj(3, 't2'))
+    cache.invalidate('templates')
+    assert cache.list('templates', templates) == [Obj(1, 't1'), Obj(3, 't2')]
+    cache.list('clusters', clusters)
+    assert len(clusters.calls) == 1
+    cache.invalidate()
+    cache.list('clusters', clusters)
+    assert len(clusters.calls) == 2
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""test_output_mux.py - Tests for output_mux.py
+"""
+from __future__ import print_function
+import sys
+import pytest
+from StringIO import StringIO
+from multiprocessing import Process
+
+from fabric_ovirt.lib.output_mux import OutputMux
+
+
+@pytest.fixture
+def stream():
+    return StringIO()
+
+
+@pytest.mark.parametrize(
+    ('chunks', 'expected'),
+    [
+        (
+            (('h1', 'one\ntw'), ('h2', 'three\n'), ('h1', 'o\n')),
+            '[h1] one\n[h2] three\n[h1] two\n',
+        ),
+        (
+            (('h1', '[h1] out: already prefixed\n'),),
+            '[h1] out: already prefixed\n',
+        ),
+        (
+            (('h1', 'no newline'),),
+            '',
+        ),
+    ]
+)
+def test_feed(stream, chunks, expected):
+    mux = OutputMux(stream=stream)
+    for name, data in chunks:
+        mux.feed(name, data)
+    assert stream.getvalue() == ''
+    mux.flush()
+    assert stream.getvalue() == expected
+
+
+def test_feed_flushes_full_batch(stream):
+    mux = OutputMux(stream=stream, batch_size=20)
+    mux.feed('h1', 'short\n')
+    assert stream.getvalue() == ''
+    mux.feed('h1', 'long enough line\n')
+    assert stream.getvalue() == '[h1] short\n[h1] long enough line\n'
+
+
+def chatty_job(lines):
+    for i in xrange(lines):
+        print('line', i)
+    print('to stderr', file=sys.stderr)
+    sys.stdout.write('partial')
+
+
+def test_start_and_close(stream):
+    mux = OutputMux(stream=stream)
+    jobs = [
+        Process(target=chatty_job, args=(100,), name='host{0}'.format(i))
+        for i in xrange(3)
+    ]
+    for job in jobs:
+        mux.start(job)
+    assert mux.active
+    while any(job.is_alive() for job in jobs):
+        mux.poll(0.1)
+    mux.close()
+    for job in jobs:
+        job.join()
+    assert not mux.active
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 3 * 102
+    for job in jobs:
+        prefix = '[{0}] '.format(job.name)
+        job_lines = [line for line in lines if line.startswith(prefix)]
+        assert job_lines == [
+            prefix + 'line {0}'.format(i) for i in xrange(100)
+        ] + [prefix + 'to stderr', prefix + 'partial']
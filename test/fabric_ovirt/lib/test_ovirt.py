@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+"""test_ovirt.py - Tests for ovirt/__init__.py, with a stand-in oVirt SDK
+"""
+import sys
+from multiprocessing.pool import ThreadPool
+
+import pytest
+
+import fabric_ovirt.lib
+from fabric_ovirt.lib.session_cache import SessionCache
+
+
+@pytest.fixture
+def ovirt_lib(fake_ovirt_sdk, monkeypatch):
+    # Import the module afresh with the fake SDK, and forget it afterwards
+    monkeypatch.setitem(sys.modules, 'fabric_ovirt.lib.ovirt', None)
+    monkeypatch.setattr(fabric_ovirt.lib, 'ovirt', None, raising=False)
+    del sys.modules['fabric_ovirt.lib.ovirt']
+    import fabric_ovirt.lib.ovirt as ovirt_lib
+    return ovirt_lib
+
+
+def test_connect_concurrently(ovirt_lib, fake_ovirt_sdk, cache_dir):
+    urls = ['https://engine{0}/ovirt-engine/api'.format(i) for i in xrange(8)]
+    for url in urls:
+        SessionCache(url, 'admin', 'secret').save('cookie of ' + url)
+    pool = ThreadPool(len(urls))
+    try:
+        apis = pool.map(
+            lambda url: ovirt_lib.connect(url, 'admin', 'secret'), urls
+        )
+    finally:
+        pool.terminate()
+    assert [api.cookie for api in apis] == ['cookie of ' + url for url in urls]
+    sdk_pool = fake_ovirt_sdk['ovirtsdk.infrastructure.connectionspool']
+    assert fake_ovirt_sdk['ovirtsdk.api'].ConnectionsPool is \
+        sdk_pool.ConnectionsPool
+
+
+def test_engine_connections(ovirt_lib, cache_dir, clean_env):
+    urls = [
+        'https://engine/ovirt-engine/api',
+        'https://engine:8443/ovirt-engine/api',
+    ]
+    apis = ovirt_lib.engine_connections(
+        urls, username='admin', password='secret'
+    )
+    assert apis.keys() == urls
+    assert [api.url for api in apis.values()] == urls
+    again = ovirt_lib.engine_connections(
+        urls[1:], username='admin', password='secret'
+    )
+    assert again.values() == apis.values()[1:]
+
+
+def test_connect_expired_session(ovirt_lib, cache_dir):
+    url = 'https://engine/ovirt-engine/api'
+    cache = SessionCache(url, 'admin', 'secret')
+    cache.save('expired')
+    api = ovirt_lib.connect(url, 'admin', 'secret')
+    assert api.cookie is None
+    assert cache.load() is None
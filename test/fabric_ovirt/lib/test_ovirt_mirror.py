@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+"""test_ovirt_mirror.py - Tests for ovirt_mirror.py
+"""
+import pytest
+
+from fabric_ovirt.lib.ovirt_mirror import Mirror, parse_query
+
+
+@pytest.fixture
+def mirror(cache_dir):
+    mirror = Mirror('https://engine/ovirt-engine/api')
+    mirror.store('vm', [
+        {'id': 'a', 'name': 'web1', 'memory': 1024, 'status.state': 'up'},
+        {'id': 'b', 'name': 'web2', 'memory': 2048, 'status.state': 'down'},
+        {'id': 'c', 'name': 'db_1', 'memory': 2048, 'status.state': 'up'},
+    ])
+    mirror.store('template', [{'id': 't', 'name': 'web1'}])
+    yield mirror
+    mirror.close()
+
+
+def names(objs):
+    return [obj.name for obj in objs]
+
+
+@pytest.mark.parametrize(
+    ('oquery', 'expected'),
+    [
+        ('', ['db_1', 'web1', 'web2']),
+        ('name=web*', ['web1', 'web2']),
+        ('name=WEB1', ['web1']),
+        ('name=db%', []),
+        ('name=db_*', ['db_1']),
+        ('name!=web*', ['db_1']),
+        ('status=up', ['db_1', 'web1']),
+        ('memory=2048 and status=up', ['db_1']),
+        ('name=web1 or memory=2048 and status=down', ['web1', 'web2']),
+        ('name = "web2"', ['web2']),
+        ('nosuchfield=*', []),
+    ]
+)
+def test_mirror_search(mirror, oquery, expected):
+    assert names(mirror.search('vm', oquery)) == expected
+
+
+def test_mirror_objects(mirror):
+    vm = list(mirror.search('vm', 'name=web2'))[0]
+    assert (vm.id, vm.memory, vm.status.state) == ('b', 2048, 'down')
+    assert names(mirror.search('vm', limit=1)) == ['db_1']
+
+
+def test_mirror_store(mirror):
+    mirror.store('vm', [{'id': 'a', 'name': 'web3', 'memory': 1024}])
+    assert names(mirror.search('vm', 'name=web*')) == ['web2', 'web3']
+    assert names(mirror.search('vm', 'status=up')) == ['db_1']
+    mirror.delete('vm', ['b'])
+    assert names(mirror.search('vm')) == ['db_1', 'web3']
+    assert mirror.store('vm', [{'id': 'd', 'name': 'new'}], replace=True) == 1
+    assert names(mirror.search('vm')) == ['new']
+    assert names(mirror.search('vm', 'memory=*')) == []
+    assert names(mirror.search('template')) == ['web1']
+
+
+def test_mirror_state(mirror):
+    assert mirror.get_state('event_id.vm') is None
+    mirror.set_state('event_id.vm', 17)
+    assert Mirror('https://engine/ovirt-engine/api').get_state(
+        'event_id.vm'
+    ) == 17
+
+
+@pytest.mark.parametrize(
+    'oquery', ['name', 'name=a and and name=b', 'sortby name']
+)
+def test_parse_query_errors(oquery):
+    with pytest.raises(ValueError):
+        parse_query('vm', oquery)
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+"""test_ovirt_query.py - Tests for ovirt_query.py
+"""
+import pytest
+
+from fabric_ovirt.lib.ovirt_query import (
+    iter_query,
+    engine_name,
+    iter_federated,
+    get_field,
+    table_format,
+    table_rows,
+)
+
+
+class FakeCollection(object):
+    def __init__(self, objs):
+        self.objs = objs
+        self.calls = []
+
+    def list(self, query=None, max=None):
+        self.calls.append((query, max))
+        page = int(query.rsplit(' ', 1)[-1])
+        return self.objs[(page - 1) * max:page * max]
+
+
+@pytest.mark.parametrize(
+    ('total', 'limit', 'expected', 'expected_calls'),
+    [
+        (0, None, 0, [('page 1', 3)]),
+        (5, None, 5, [('page 1', 3), ('page 2', 3)]),
+        (6, None, 6, [('page 1', 3), ('page 2', 3), ('page 3', 3)]),
+        (10, 4, 4, [('page 1', 3), ('page 2', 3)]),
+        (10, 2, 2, [('page 1', 2)]),
+        (10, 0, 0, []),
+    ]
+)
+def test_iter_query(total, limit, expected, expected_calls):
+    collection = FakeCollection(range(total))
+    objs = iter_query(collection.list, page_size=3, limit=limit)
+    assert list(objs) == range(expected)
+    assert collection.calls == [
+        ('sortby name ' + query, max) for query, max in expected_calls
+    ]
+
+
+def test_iter_query_streams():
+    collection = FakeCollection(range(10))
+    objs = iter_query(collection.list, 'name=vm*', page_size=3)
+    assert next(objs) == 0
+    assert collection.calls == [('name=vm* sortby name page 1', 3)]
+
+
+def test_iter_query_given_page():
+    collection = FakeCollection(range(10))
+    objs = iter_query(collection.list, 'name=vm* page 2', page_size=3)
+    assert list(objs) == [3, 4, 5]
+    assert collection.calls == [('name=vm* sortby name page 2', 3)]
+
+
+@pytest.mark.parametrize(
+    ('oquery', 'sort_by', 'expected'),
+    [
+        ('name=vm*', 'id', 'name=vm* sortby id page 1'),
+        ('name=vm* sortby memory desc', 'name',
+         'name=vm* sortby memory desc page 1'),
+        ('name=vm* SortBy memory', 'name', 'name=vm* SortBy memory page 1'),
+        ('name=vm*', None, 'name=vm* page 1'),
+    ]
+)
+def test_iter_query_sortby(oquery, sort_by, expected):
+    collection = FakeCollection([])
+    list(iter_query(collection.list, oquery, page_size=3, sort_by=sort_by))
+    assert collection.calls == [(expected, 3)]
+
+
+class FakeObject(object):
+    def __init__(self, **attrs):
+        self.__dict__.update(attrs)
+        self.gets = []
+
+    def get_status(self):
+        self.gets.append('get_status')
+        return FakeObject(state='up')
+
+
+def test_get_field():
+    obj = FakeObject(name='vm1', cluster=FakeObject(name='c1'))
+    memo = {}
+    assert get_field(obj, 'cluster.name', memo) == 'c1'
+    assert get_field(obj, 'status.state', memo) == 'up'
+    assert get_field(obj, 'status.state', memo) == 'up'
+    assert get_field(obj, 'status.nosuchfield.x', memo) is None
+    assert obj.gets == ['get_status']
+
+
+def test_table_format():
+    format_str, columns = table_format(
+        dict(id=4, name=6), 'name:nosuchfield:status.state:id'
+    )
+    assert columns == ['name', 'status.state', 'id']
+    assert format_str == '{0:6} {1:20} {2:4}'
+
+
+def test_table_rows():
+    objs = [
+        FakeObject(id=1, name='vm1', memory=1024),
+        FakeObject(id=2, name='vm2', memory=2048),
+    ]
+    format_str, columns = table_format(dict(id=2, name=4), 'id:status.state')
+    assert list(table_rows(objs, format_str, columns)) == [
+        ' 1 up', ' 2 up',
+    ]
+    assert [obj.gets for obj in objs] == [['get_status'], ['get_status']]
+
+
+def test_engine_name():
+    assert engine_name('https://engine1/ovirt-engine/api/') == \
+        'engine1/ovirt-engine/api'
+    assert engine_name('https://admin@engine1:8443/ovirt-engine/api') == \
+        'engine1:8443/ovirt-engine/api'
+    assert engine_name('engine2') == 'engine2'
+
+
+def test_iter_federated():
+    engines = [('e1', range(3)), ('e2', []), ('e3', range(10, 12))]
+    objs = list(iter_federated(engines, lambda api: iter(api)))
+    assert [(obj.engine, obj.real) for obj in objs] == [
+        ('e1', 0), ('e1', 1), ('e1', 2), ('e3', 10), ('e3', 11),
+    ]
+    objs = list(iter_federated(engines, lambda api: iter(api), limit=4))
+    assert [(obj.engine, obj.real) for obj in objs] == [
+        ('e1', 0), ('e1', 1), ('e1', 2), ('e3', 10),
+    ]
+    assert list(iter_federated([], lambda api: api)) == []
+
+
+def test_iter_federated_raises():
+    def query_func(api):
+        raise ValueError(api)
+
+    with pytest.raises(ValueError):
+        list(iter_federated([('e1', 1), ('e2', 2)], query_func))
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+"""test_session_cache.py - Tests for session_cache.py
+"""
+import os
+import stat
+
+from fabric_ovirt.lib.session_cache import SessionCache
+
+
+def test_session_cache(cache_dir):
+    cache = SessionCache(
+        'https://engine/ovirt-engine/api', 'admin@internal', 'secret'
+    )
+    assert cache.load() is None
+    cache.save('JSESSIONID\tabc')
+    assert SessionCache(
+        'https://engine/ovirt-engine/api', 'admin@internal', 'secret'
+    ).load() == 'JSESSIONID\tabc'
+    assert SessionCache(
+        'https://engine/ovirt-engine/api', 'user@internal', 'secret'
+    ).load() is None
+    assert SessionCache(
+        'https://engine/ovirt-engine/api', 'admin@internal', 'wrong'
+    ).load() is None
+    cache.forget()
+    assert cache.load() is None
+    cache.forget()
+
+
+def test_session_cache_expires(cache_dir):
+    SessionCache('https://engine', 'admin', 'secret', ttl=-1).save('token')
+    assert SessionCache('https://engine', 'admin', 'secret').load() is None
+
+
+def test_session_cache_permissions(cache_dir):
+    SessionCache('https://engine', 'admin', 'secret').save('token')
+    sessions_dir = cache_dir.join('sessions')
+    assert stat.S_IMODE(os.stat(str(sessions_dir)).st_mode) == stat.S_IRWXU
+    for cache_file in sessions_dir.listdir():
+        assert stat.S_IMODE(os.stat(str(cache_file)).st_mode) == \
+            stat.S_IRUSR | stat.S_IWUSR
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+"""test_state_waiter.py - Tests for state_waiter.py
+"""
+from fabric_ovirt.lib.state_waiter import StateWaiter
+
+
+class FakeWorld(object):
+    """Objects whose states change over (fake) time"""
+    def __init__(self, timelines):
+        self.timelines = timelines
+        self.now = 0
+        self.polls = []
+        self.sleeps = []
+
+    def state(self, key):
+        state = None
+        for at, timeline_state in self.timelines[key]:
+            if at <= self.now:
+                state = timeline_state
+        return state
+
+    def poll(self, keys):
+        self.polls.append((self.now, sorted(keys)))
+        states = dict((key, self.state(key)) for key in keys)
+        return dict((k, s) for k, s in states.iteritems() if s is not None)
+
+    def sleep(self, delay):
+        self.sleeps.append(delay)
+        self.now += delay
+
+    def waiter(self, **kwargs):
+        return StateWaiter(
+            self.poll, sleep=self.sleep, clock=lambda: self.now, **kwargs
+        )
+
+
+def test_state_waiter():
+    world = FakeWorld({
+        'vm1': [(0, 'up'), (3, 'down')],
+        'vm2': [(0, 'down')],
+        'vm3': [(0, 'up'), (6, None)],
+    })
+    waiter = world.waiter(min_delay=1, max_delay=4)
+    done = []
+    handles = [
+        waiter.add('vm1', 'down', callback=done.append),
+        waiter.add('vm2', 'down', callback=done.append),
+        waiter.add('vm3', lambda state: state is None, callback=done.append),
+    ]
+    assert waiter.wait() == []
+    assert [(h.key, h.state) for h in done] == [
+        ('vm2', 'down'), ('vm1', 'down'), ('vm3', None)
+    ]
+    assert all(handle.done for handle in handles)
+    # All objects are polled together, less often while nothing changes
+    assert world.polls == [
+        (0, ['vm1', 'vm2', 'vm3']), (1, ['vm1', 'vm3']), (3, ['vm1', 'vm3']),
+        (4, ['vm3']), (6, ['vm3']),
+    ]
+    assert world.sleeps == [1, 2, 1, 2]
+
+
+def test_state_waiter_timeout():
+    world = FakeWorld({'vm1': [(0, 'up')], 'vm2': [(0, 'down')]})
+    waiter = world.waiter(min_delay=1, max_delay=10)
+    waiter.add('vm1', ('down', None))
+    waiter.add('vm2', ('down', None))
+    not_done = waiter.wait(timeout=5)
+    assert [(handle.key, handle.state) for handle in not_done] == [
+        ('vm1', 'up')
+    ]
+    assert world.now == 5
+
+
+def test_state_waiter_add_from_callback():
+    world = FakeWorld({'vm1': [(0, 'down'), (5, None)]})
+    waiter = world.waiter(min_delay=1, max_delay=2)
+    attempts = []
+
+    def delete(handle):
+        attempts.append(world.now)
+        if world.now < 3:
+            waiter.add(handle.key, 'down', callback=delete)
+
+    waiter.add('vm1', 'down', callback=delete)
+    assert waiter.wait() == []
+    assert attempts == [0, 1, 3]
+
+
+class FakeTracker(object):
+    def __init__(self, world, events, fails_at=10):
+        self.world = world
+        self.events = events
+        self.fails_at = fails_at
+        self.available = True
+        self.checks = []
+
+    def start(self):
+        return self.available
+
+    def changed(self):
+        last = self.checks[-1] if self.checks else 0
+        self.checks.append(self.world.now)
+        if self.world.now >= self.fails_at:
+            self.available = False
+            return None
+        return set(
+            key for at, key in self.events if last < at <= self.world.now
+        )
+
+
+def test_state_waiter_events():
+    world = FakeWorld({'vm1': [(0, 'up'), (3, 'down')]})
+    tracker = FakeTracker(world, [(2, 'vm2'), (3, 'vm1')])
+    waiter = world.waiter(min_delay=1, max_delay=30, tracker=tracker)
+    waiter.add('vm1', 'down')
+    assert waiter.wait() == []
+    # Only polled when an event refers to vm1
+    assert world.polls == [(0, ['vm1']), (3, ['vm1'])]
+    assert tracker.checks == [1, 3]
+
+
+def test_state_waiter_events_safety_poll():
+    world = FakeWorld({'vm1': [(0, 'up'), (5, 'down')]})
+    tracker = FakeTracker(world, [])
+    waiter = world.waiter(min_delay=1, max_delay=3, tracker=tracker)
+    waiter.add('vm1', 'down')
+    assert waiter.wait() == []
+    assert world.polls == [(0, ['vm1']), (3, ['vm1']), (6, ['vm1'])]
+
+
+def test_state_waiter_events_unavailable():
+    world = FakeWorld({'vm1': [(0, 'up'), (20, 'down')]})
+    tracker = FakeTracker(world, [])
+    waiter = world.waiter(min_delay=1, max_delay=10, tracker=tracker)
+    waiter.add('vm1', 'down')
+    assert waiter.wait() == []
+    # Back to polling once events stopped working at 10, keeping the backoff
+    assert tracker.checks == [1, 3, 7, 10]
+    assert world.polls == [(0, ['vm1']), (10, ['vm1']), (20, ['vm1'])]
+
+
+def test_state_waiter_events_backoff():
+    world = FakeWorld({'vm1': [(0, 'up'), (200, 'down')]})
+    tracker = FakeTracker(world, [(200, 'vm1')], fails_at=1000)
+    waiter = world.waiter(min_delay=1, max_delay=30, tracker=tracker)
+    waiter.add('vm1', 'down')
+    assert waiter.wait() == []
+    # The feed is checked less often while nothing happens, about as often as
+    # states are polled without events
+    assert tracker.checks == [1, 3, 7, 15, 30] + range(60, 211, 30)
+    assert world.polls == [(0, ['vm1'])] + [
+        (at, ['vm1']) for at in range(30, 211, 30)
+    ]
+    plain = FakeWorld({'vm1': [(0, 'up'), (200, 'down')]})
+    waiter = plain.waiter(min_delay=1, max_delay=30)
+    waiter.add('vm1', 'down')
+    waiter.wait()
+    assert len(tracker.checks) <= len(plain.polls)
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+"""test_timing.py - Tests for timing.py
+"""
+import pytest
+from mock import patch
+from fabric.context_managers import settings
+
+from fabric_ovirt.lib import timing
+
+
+@pytest.fixture
+def fake_clock(request):
+    clock = dict(now=100.0)
+    patcher = patch(
+        'fabric_ovirt.lib.timing.time.time', side_effect=lambda: clock['now']
+    )
+    patcher.start()
+    request.addfinalizer(patcher.stop)
+    return clock
+
+
+def test_nested_phases_are_exclusive(fake_clock):
+    timings = timing.Timings()
+    with settings(host_string='host1', command='some_task'):
+        with timings.phase('exec'):
+            fake_clock['now'] += 1
+            with timings.phase('connect'):
+                fake_clock['now'] += 2
+                with timings.phase('auth'):
+                    fake_clock['now'] += 4
+            fake_clock['now'] += 8
+    assert sorted(timings.records) == sorted([
+        ('host1', 'some_task', 'auth', 4.0),
+        ('host1', 'some_task', 'connect', 2.0),
+        ('host1', 'some_task', 'exec', 9.0),
+    ])
+
+
+def test_aggregate():
+    records = [
+        ('host1', 'task1', 'exec', 1.0),
+        ('host1', 'task1', 'exec', 2.0),
+        ('host1', 'task2', 'auth', 4.0),
+        ('host2', 'task1', 'exec', 8.0),
+    ]
+    by_host = timing._aggregate(records, key=lambda rec: rec[0])
+    assert by_host == {
+        'host1': {'exec': 3.0, 'auth': 4.0},
+        'host2': {'exec': 8.0},
+    }
+    by_task = timing._aggregate(records, key=lambda rec: rec[1])
+    assert by_task == {
+        'task1': {'exec': 11.0},
+        'task2': {'auth': 4.0},
+    }
+
+
+def test_report_shows_slowest_hosts():
+    timings = timing.Timings()
+    timings.extend([
+        ('host1', 'task1', 'exec', 1.0),
+        ('host2', 'task1', 'exec', 3.0),
+        ('host3', 'task1', 'connect', 2.0),
+    ])
+    with patch('fabric_ovirt.lib.timing.puts') as fake_puts:
+        timings.report(top=2)
+    lines = [args[0][0] for args in fake_puts.call_args_list]
+    assert lines[1].split() == ['TASK'] + [
+        p.upper() for p in timing.PHASES
+    ] + ['TOTAL']
+    assert lines[2].split()[0] == 'task1'
+    assert lines[2].split()[-1] == '6.00'
+    assert [line.split()[0] for line in lines[5:]] == ['host2', 'host3']
+
+
+@pytest.mark.parametrize(
+    ('enabled', 'expected_records'), [(True, 1), ('yes', 1), (False, 0)]
+)
+def test_timed(enabled, expected_records):
+    timing.TIMINGS.clear()
+    func = timing._timed('exec', lambda x: x * 2)
+    with settings(timing=enabled):
+        assert func(21) == 42
+    assert len(timing.TIMINGS.records) == expected_records
+    timing.TIMINGS.clear()
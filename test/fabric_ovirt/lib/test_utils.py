@@ -1,3 +1,5 @@
+import pytest
+
 import fabric_ovirt.lib.utils
 
 
@@ -45,3 +47,37 @@ def test_html_to_text_bad():
     ])
     actual = fabric_ovirt.lib.utils.html_to_text(html)
     assert expected == actual
+
+
+@pytest.mark.parametrize(
+    ('patterns', 'what', 'expected'),
+    [
+        (['host1'], 'host1', True),
+        (['host1'], 'host10', False),
+        (['host*'], 'host10', True),
+        (['host?.example.com'], 'host1.example.com', True),
+        (['host?.example.com'], 'host10.example.com', False),
+        (['web*', 'db[0-9]', 'mail'], 'db7', True),
+        (['web*', 'db[0-9]', 'mail'], 'dba', False),
+        (['web*', 'db[0-9]', 'mail'], 'mail', True),
+        (['web*', 'db[0-9]', 'mail'], 'xweb', False),
+        (['*.com'], 'a.com\nb', False),
+        ([], 'anything', False),
+    ]
+)
+def test_glob_matcher(patterns, what, expected):
+    matcher = fabric_ovirt.lib.utils.GlobMatcher(patterns)
+    assert matcher.match(what) is expected
+    assert bool(fabric_ovirt.lib.utils.filter_glob([what], patterns)) \
+        is expected
+
+
+def test_filter_glob():
+    names = ['web%d' % i for i in xrange(5)] + ['db1', 'db22', 'mail']
+    patterns = ['web[13]', 'db?', 'mail']
+    expected = ['web1', 'web3', 'db1', 'mail']
+    assert fabric_ovirt.lib.utils.filter_glob(names, patterns) == expected
+    assert list(fabric_ovirt.lib.utils.ifilter_glob(names, patterns)) == \
+        expected
+    assert fabric_ovirt.lib.utils.glob_matcher(patterns) is \
+        fabric_ovirt.lib.utils.glob_matcher(patterns)
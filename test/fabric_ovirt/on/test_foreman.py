@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+"""test_foreman.py - Tests for on/foreman.py
+"""
+import mock
+import pytest
+
+from fabric_ovirt.on.foreman import search
+
+
+@pytest.fixture
+def search_hosts(clean_env, monkeypatch):
+    clean_env.update(
+        FOREMAN_URL='http://foreman', FOREMAN_USER='admin',
+        FOREMAN_PASSWORD='secret', hosts=[], parallel=False,
+    )
+    clean_env.pop('foreman_cache', None)
+    # runs_once remembers the first run, let the task run again
+    search.wrapped.__dict__.pop('return_value', None)
+    search_hosts = mock.Mock(return_value=['host1'])
+    monkeypatch.setattr(
+        'fabric_ovirt.on.foreman._search_hosts', search_hosts
+    )
+    return search_hosts
+
+
+def test_search_positional_conds(search_hosts):
+    search('name=a', 'yes', 'http://foreman', 'admin', 'secret', 'name=b',
+           'name=c', hostgroup='web')
+    search_hosts.assert_called_once_with(
+        ['name=b', 'name=c', 'name=a', 'hostgroup=web'], 'http://foreman',
+        ('admin', 'secret'), 'no', None, None,
+    )
+
+
+def test_search_options(search_hosts):
+    search('name=a', sure='yes', group_by='hostgroup_title', group_limit='2',
+           cache='yes')
+    search_hosts.assert_called_once_with(
+        ['name=a'], 'http://foreman', ('admin', 'secret'), 'yes',
+        'hostgroup_title', '2',
+    )
+
+
+def test_search_cache_from_env(search_hosts, clean_env):
+    clean_env.foreman_cache = 'refresh'
+    search('name=a', sure='yes')
+    assert search_hosts.call_args[0][3] == 'refresh'
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+"""test_range.py - Tests for on/range.py
+"""
+from itertools import islice
+
+import pytest
+
+from fabric_ovirt.on.range import RANGE_RE, _expand_spec, range_expand
+
+
+@pytest.mark.parametrize(('spec', 'expected'), [
+    ('host1:3', ['1:3']),
+    ('hostA:C', ['A:C']),
+    ('rack01:02-node1:3.example.com', ['01:02', '1:3']),
+    ('host', []),
+    ('host1:a', []),
+    ('hostA:1', []),
+    ('host1:', []),
+])
+def test_range_re(spec, expected):
+    assert [match.group() for match in RANGE_RE.finditer(spec)] == expected
+
+
+@pytest.mark.parametrize(('spec', 'expected'), [
+    ('host', ['host']),
+    ('host1:3', ['host1', 'host2', 'host3']),
+    ('host1:1', ['host1']),
+    ('hostA:C.example.com', [
+        'hostA.example.com', 'hostB.example.com', 'hostC.example.com',
+    ]),
+    ('rack1:2-node1:2', ['rack1-node1', 'rack1-node2', 'rack2-node1',
+                         'rack2-node2']),
+    ('rack1:2-nodeA:B', ['rack1-nodeA', 'rack1-nodeB', 'rack2-nodeA',
+                         'rack2-nodeB']),
+    # Numbers are padded to the width of the first one
+    ('host08:10', ['host08', 'host09', 'host10']),
+    ('host009:011', ['host009', 'host010', 'host011']),
+    ('host1:010', ['host1', 'host2', 'host3', 'host4', 'host5', 'host6',
+                   'host7', 'host8', 'host9', 'host10']),
+    # Descending ranges
+    ('host3:1', ['host3', 'host2', 'host1']),
+    ('host10:08', ['host10', 'host09', 'host08']),
+    ('hostC:A', ['hostC', 'hostB', 'hostA']),
+])
+def test_expand_spec(spec, expected):
+    assert list(_expand_spec(spec)) == expected
+
+
+@pytest.mark.parametrize(('range_def', 'expected'), [
+    ('', []),
+    ('host1:3,other', ['host1', 'host2', 'host3', 'other']),
+    (' host1:2 , ,hostA:B,', ['host1', 'host2', 'hostA', 'hostB']),
+    # Exclusions apply to all the specs, wherever they are
+    ('host1:5,!host2:3', ['host1', 'host4', 'host5']),
+    ('!host2,host1:3,!host3', ['host1']),
+    ('rack1:2-node1:2,!rack2-node1', ['rack1-node1', 'rack1-node2',
+                                      'rack2-node2']),
+    ('!host1:3', []),
+    ('host1:2,!other', ['host1', 'host2']),
+    # Malformed ranges are taken as plain host names
+    ('host1:', ['host1:']),
+    ('host1:a', ['host1:a']),
+    ('hostA:1,host:', ['hostA:1', 'host:']),
+    ('host!1:2', ['host!1', 'host!2']),
+])
+def test_range_expand(range_def, expected):
+    assert list(range_expand(range_def)) == expected
+
+
+def test_range_expand_is_lazy():
+    hosts = range_expand('host000000001:999999999')
+    assert list(islice(hosts, 3)) == [
+        'host000000001', 'host000000002', 'host000000003',
+    ]
@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+"""test_fabfile.py - Tests for the tasks fabfile.py makes available
+"""
+import sys
+from importlib import import_module
+
+import pytest
+from fabric.main import load_tasks_from_module, _seen
+
+import fabric_ovirt
+import fabric_ovirt.do  # noqa
+import fabric_ovirt.lib
+
+
+@pytest.fixture
+def fabfile(fake_ovirt_sdk, monkeypatch):
+    """Import the fabfile afresh with the fake oVirt SDK, without patching
+    Fabric
+    """
+    for name in ('parallel', 'host_set', 'fingerprints'):
+        monkeypatch.setattr(
+            'fabric_ovirt.lib.{0}.monkey_patch'.format(name), lambda mod: None
+        )
+    monkeypatch.setattr(
+        'fabric_ovirt.lib.timing.instrument', lambda: None
+    )
+    for package, name in (
+        (fabric_ovirt, 'fabfile'),
+        (fabric_ovirt, 'on'),
+        (fabric_ovirt.lib, 'ovirt'),
+    ):
+        monkeypatch.delattr(package, name, raising=False)
+    for name in list(sys.modules):
+        if name in ('fabric_ovirt.fabfile', 'fabric_ovirt.lib.ovirt') or \
+                name.split('.')[:2] == ['fabric_ovirt', 'on']:
+            monkeypatch.delitem(sys.modules, name)
+    return import_module('fabric_ovirt.fabfile')
+
+
+def test_ovirt_host_query_task(fabfile):
+    try:
+        _, tasks, _, _ = load_tasks_from_module(fabfile)
+    finally:
+        # Like fabric.main.load_fabfile, forget the modules it went through
+        _seen.clear()
+    assert 'query' in tasks['on']['ovirt']['host']